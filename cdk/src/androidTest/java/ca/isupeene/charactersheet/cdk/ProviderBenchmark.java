@@ -0,0 +1,468 @@
+package ca.isupeene.charactersheet.cdk;
+
+import android.content.Context;
+import android.os.Bundle;
+import android.os.Debug;
+import android.os.Parcel;
+
+import androidx.annotation.NonNull;
+import androidx.annotation.Nullable;
+
+import org.json.JSONArray;
+import org.json.JSONException;
+import org.json.JSONObject;
+
+import java.io.ByteArrayInputStream;
+import java.io.File;
+import java.io.FileInputStream;
+import java.io.FileOutputStream;
+import java.io.IOException;
+import java.io.InputStream;
+import java.io.OutputStreamWriter;
+import java.io.Writer;
+import java.nio.charset.StandardCharsets;
+import java.util.ArrayList;
+import java.util.Arrays;
+import java.util.Collections;
+import java.util.HashMap;
+import java.util.List;
+import java.util.Locale;
+import java.util.Map;
+import java.util.function.Supplier;
+
+import com.google.protobuf.MessageLite;
+
+import ca.isupeene.charactersheet.cdk.Model.Query;
+
+/**
+ * Measures what {@link ContentProviderBase#call ContentProviderBase.call} costs for each kind of request:
+ * cold and warm latency, the bytes allocated per call, and the size of the returned Bundle once parcelled,
+ * which is what the call costs to send to the app.
+ *
+ * A cold call is the first call made to a newly created provider, so it includes reading the content. As in
+ * a new provider process, only the first cold call parses it, and later ones read it from the parse cache.
+ * Warm calls are repeated calls to the same provider, after one call to warm it up.
+ *
+ * Run the benchmark from an instrumented test, and save the {@link Report Report} as a baseline to compare
+ * later runs against. Latencies depend on the device, so keep a baseline per device:
+ * <pre>
+ * List&lt;ProviderBenchmark.Call&gt; calls = ProviderBenchmark.DefaultCalls("info/wizard", "images/wizard.png", "fireball");
+ * ProviderBenchmark.Report report = ProviderBenchmark.Run(context, MyContentProvider::new, calls, 5, 50);
+ * List&lt;String&gt; regressions = report.Regressions(ProviderBenchmark.Report.Load(baselineFile), 0.2);
+ * </pre>
+ * The benchmark is part of the cdk's instrumented tests rather than the library, so it isn't published.
+ * {@link ProviderBenchmarkTest} runs it against {@link SyntheticContentProvider SyntheticContentProviders}
+ * serving packs of several sizes generated by synthetic-pack.py.
+ */
+public abstract class ProviderBenchmark {
+    /**
+     * A call to benchmark.
+     */
+    public static final class Call {
+        final String label;
+        final String method;
+        final String arg;
+        final Bundle extras;
+
+        /**
+         * @param label
+         * A name for the call that's unique within a benchmark, e.g. "spells (gzip)".
+         * @param method
+         * The method passed to {@link ContentProviderBase#call ContentProviderBase.call}.
+         * @param arg
+         * The arg passed to call.
+         * @param extras
+         * The extras passed to call.
+         */
+        public Call(@NonNull String label, @NonNull String method, @Nullable String arg, @Nullable Bundle extras) {
+            this.label = label;
+            this.method = method;
+            this.arg = arg;
+            this.extras = extras;
+        }
+    }
+
+    /**
+     * @param infoPath
+     * The content path of an info directory to request, or null to skip "info" calls.
+     * @param imagePath
+     * The content path of an image to request, or null to skip "image" calls.
+     * @param searchText
+     * The text to search for, or null to skip "search" calls.
+     * @return
+     * A call for each {@link DlcType}, with and without compression for the content lists.
+     */
+    public static @NonNull List<Call> DefaultCalls(@Nullable String infoPath, @Nullable String imagePath, @Nullable String searchText) {
+        List<Call> calls = new ArrayList<>();
+        List<String> contentTags = new ArrayList<>();
+        for (DlcType type : Arrays.asList(
+                DlcType.BACKGROUND, DlcType.CLASS_SPELLS, DlcType.CLASS, DlcType.FEAT,
+                DlcType.ITEM, DlcType.RACE, DlcType.SPELL, DlcType.TALENT)) {
+            contentTags.add(type.Tag());
+            calls.add(new Call(type.Tag(), type.Tag(), null, null));
+            calls.add(new Call(type.Tag() + " (gzip)", type.Tag(), null, ResponseEncoding.RequestExtras(ResponseEncoding.GZIP, -1)));
+        }
+        calls.add(new Call(DlcType.MANIFEST.Tag(), DlcType.MANIFEST.Tag(), null, null));
+
+        Bundle batchExtras = new Bundle();
+        batchExtras.putStringArray(ContentProviderBase.BATCH_TAGS_KEY, contentTags.toArray(new String[0]));
+        calls.add(new Call(DlcType.BATCH.Tag(), DlcType.BATCH.Tag(), null, batchExtras));
+
+        if (infoPath != null) {
+            calls.add(new Call(DlcType.INFO.Tag(), DlcType.INFO.Tag(), infoPath, null));
+        }
+        if (imagePath != null) {
+            calls.add(new Call(DlcType.IMAGE.Tag() + " (bitmap)", DlcType.IMAGE.Tag(), imagePath, null));
+            calls.add(new Call(DlcType.IMAGE.Tag() + " (bytes)", DlcType.IMAGE.Tag(), imagePath,
+                    ImageDelivery.RequestExtras(ImageDelivery.BYTES, ImageDelivery.ORIGINAL_SIZE)));
+            calls.add(new Call(DlcType.IMAGE.Tag() + " (bytes, 128px)", DlcType.IMAGE.Tag(), imagePath,
+                    ImageDelivery.RequestExtras(ImageDelivery.BYTES, 128)));
+        }
+        if (searchText != null) {
+            calls.add(new Call(DlcType.SEARCH.Tag(), DlcType.SEARCH.Tag(), searchText, null));
+        }
+
+        Bundle spellQuery = new Bundle();
+        spellQuery.putByteArray(ContentProviderBase.QUERY_KEY,
+                Query.newBuilder().setTarget(Query.Target.SPELLS).addLevel(3).build().toByteArray());
+        calls.add(new Call(DlcType.QUERY.Tag() + " (spells)", DlcType.QUERY.Tag(), null, spellQuery));
+        Bundle itemQuery = new Bundle();
+        itemQuery.putByteArray(ContentProviderBase.QUERY_KEY,
+                Query.newBuilder().setTarget(Query.Target.ITEMS).addItemType(Model.Item.Type.WEAPON).build().toByteArray());
+        calls.add(new Call(DlcType.QUERY.Tag() + " (items)", DlcType.QUERY.Tag(), null, itemQuery));
+        return calls;
+    }
+
+    /**
+     * Latency percentiles, in microseconds.
+     */
+    public static final class Latency {
+        public final long p50;
+        public final long p90;
+        public final long p99;
+        public final long max;
+
+        Latency(long p50, long p90, long p99, long max) {
+            this.p50 = p50;
+            this.p90 = p90;
+            this.p99 = p99;
+            this.max = max;
+        }
+
+        static Latency FromNanos(long[] nanos) {
+            long[] sorted = nanos.clone();
+            Arrays.sort(sorted);
+            return new Latency(Percentile(sorted, 50), Percentile(sorted, 90), Percentile(sorted, 99), Percentile(sorted, 100));
+        }
+
+        // The nearest-rank percentile of the sorted samples, in microseconds.
+        private static long Percentile(long[] sorted, int percentile) {
+            if (sorted.length == 0) return 0;
+            int rank = (int)Math.ceil(percentile / 100.0 * sorted.length);
+            return sorted[Math.max(0, rank - 1)] / 1000;
+        }
+
+        JSONObject ToJson() throws JSONException {
+            return new JSONObject().put("p50", p50).put("p90", p90).put("p99", p99).put("max", max);
+        }
+
+        static Latency FromJson(JSONObject json) {
+            return new Latency(json.optLong("p50"), json.optLong("p90"), json.optLong("p99"), json.optLong("max"));
+        }
+    }
+
+    /**
+     * The measurements of one {@link Call Call}.
+     */
+    public static final class Result {
+        public final String label;
+        public final String method;
+        public final Latency cold;
+        public final Latency warm;
+        /**
+         * The size of the parcelled result Bundle.
+         */
+        public final long payloadBytes;
+        /**
+         * The mean number of bytes allocated by each warm call, on any thread, or -1 if the runtime doesn't report it.
+         */
+        public final long allocatedBytes;
+        /**
+         * The error returned by the call, "unsupported" if the call returned an empty Bundle, or null.
+         */
+        public final @Nullable String error;
+
+        Result(String label, String method, Latency cold, Latency warm, long payloadBytes, long allocatedBytes, @Nullable String error) {
+            this.label = label;
+            this.method = method;
+            this.cold = cold;
+            this.warm = warm;
+            this.payloadBytes = payloadBytes;
+            this.allocatedBytes = allocatedBytes;
+            this.error = error;
+        }
+
+        JSONObject ToJson() throws JSONException {
+            JSONObject json = new JSONObject()
+                    .put("label", label)
+                    .put("method", method)
+                    .put("cold_us", cold.ToJson())
+                    .put("warm_us", warm.ToJson())
+                    .put("payload_bytes", payloadBytes)
+                    .put("allocated_bytes", allocatedBytes);
+            if (error != null) json.put("error", error);
+            return json;
+        }
+
+        static Result FromJson(JSONObject json) throws JSONException {
+            return new Result(
+                    json.getString("label"),
+                    json.getString("method"),
+                    Latency.FromJson(json.getJSONObject("cold_us")),
+                    Latency.FromJson(json.getJSONObject("warm_us")),
+                    json.optLong("payload_bytes"),
+                    json.optLong("allocated_bytes", -1),
+                    json.has("error") ? json.getString("error") : null);
+        }
+    }
+
+    /**
+     * The results of a benchmark run, which can be saved as a baseline for later runs.
+     */
+    public static final class Report {
+        public final List<Result> results;
+
+        Report(List<Result> results) {
+            this.results = Collections.unmodifiableList(results);
+        }
+
+        /**
+         * @return
+         * The report as JSON, in the format read by {@link #Load Load}.
+         */
+        public @NonNull String ToJson() {
+            try {
+                JSONArray array = new JSONArray();
+                for (Result result : results) {
+                    array.put(result.ToJson());
+                }
+                return new JSONObject().put("results", array).toString(2);
+            }
+            catch (JSONException ex) {
+                // Only thrown for non-finite numbers, and all of these are integers.
+                throw new IllegalStateException(ex);
+            }
+        }
+
+        public void Save(@NonNull File file) throws IOException {
+            WriteAtomically(file, ToJson());
+        }
+
+        public static @NonNull Report Load(@NonNull File file) throws IOException {
+            try (InputStream input = new FileInputStream(file)) {
+                JSONArray array = new JSONObject(Utils.ReadAll(input)).getJSONArray("results");
+                List<Result> results = new ArrayList<>(array.length());
+                for (int i = 0; i < array.length(); ++i) {
+                    results.add(Result.FromJson(array.getJSONObject(i)));
+                }
+                return new Report(results);
+            }
+            catch (JSONException ex) {
+                throw new IOException("Malformed benchmark report " + file, ex);
+            }
+        }
+
+        /**
+         * @param baseline
+         * An earlier report for the same content pack.
+         * @param tolerance
+         * The fraction by which a measurement may grow before it's reported, e.g. 0.2 for 20%.
+         * Latencies are noisy, so anything under 0.1 will report a lot of false positives.
+         * @return
+         * A description of each cold or warm median latency, payload size or allocation that grew by more
+         * than the tolerance since the baseline, and of each call that failed but didn't in the baseline.
+         */
+        public @NonNull List<String> Regressions(@NonNull Report baseline, double tolerance) {
+            Map<String, Result> baselineResults = new HashMap<>();
+            for (Result result : baseline.results) {
+                baselineResults.put(result.label, result);
+            }
+            List<String> regressions = new ArrayList<>();
+            for (Result result : results) {
+                Result before = baselineResults.get(result.label);
+                if (before == null) continue;
+                if (result.error != null && before.error == null) {
+                    regressions.add(result.label + " failed: " + result.error);
+                    continue;
+                }
+                CheckGrowth(regressions, result.label, "cold p50 us", before.cold.p50, result.cold.p50, tolerance);
+                CheckGrowth(regressions, result.label, "warm p50 us", before.warm.p50, result.warm.p50, tolerance);
+                CheckGrowth(regressions, result.label, "payload bytes", before.payloadBytes, result.payloadBytes, tolerance);
+                if (before.allocatedBytes >= 0 && result.allocatedBytes >= 0) {
+                    CheckGrowth(regressions, result.label, "allocated bytes", before.allocatedBytes, result.allocatedBytes, tolerance);
+                }
+            }
+            return regressions;
+        }
+
+        private static void CheckGrowth(List<String> regressions, String label, String measurement, long before, long after, double tolerance) {
+            if (after > before * (1 + tolerance)) {
+                regressions.add(String.format(Locale.ROOT, "%s %s: %d -> %d (%+.0f%%)",
+                        label, measurement, before, after, before == 0 ? 100.0 : (after - before) * 100.0 / before));
+            }
+        }
+    }
+
+    /**
+     * What the first parse of a type of content costs a process, which includes loading the classes that parse it.
+     */
+    public static final class FirstParse {
+        /**
+         * The number of classes the process loaded during the parse.
+         */
+        public final int classesLoaded;
+        /**
+         * The latency of the parse, in microseconds.
+         */
+        public final long micros;
+
+        FirstParse(int classesLoaded, long micros) {
+            this.classesLoaded = classesLoaded;
+            this.micros = micros;
+        }
+
+        /**
+         * @return
+         * The measurements as JSON.
+         */
+        public @NonNull String ToJson() {
+            try {
+                return new JSONObject().put("classes_loaded", classesLoaded).put("us", micros).toString(2);
+            }
+            catch (JSONException ex) {
+                // Only thrown for non-finite numbers, and these are integers.
+                throw new IllegalStateException(ex);
+            }
+        }
+
+        public void Save(@NonNull File file) throws IOException {
+            WriteAtomically(file, ToJson());
+        }
+    }
+
+    /**
+     * Parses a text proto, counting the classes loaded and timing the parse. Parser classes are loaded once per
+     * process, so measure the first parse of a type before anything else in the process parses it, e.g.
+     * {@code MeasureFirstParse(Parser::ParseTalentList, talents)} first thing in a test.
+     * @param parser
+     * The parser to measure, e.g. Parser::ParseTalentList.
+     * @param textProto
+     * The text proto to parse. It's read into memory beforehand, so that reading it isn't measured.
+     */
+    public static @NonNull FirstParse MeasureFirstParse(
+            @NonNull FunctionX<InputStream, MessageLite.Builder, IOException> parser,
+            @NonNull byte[] textProto) throws IOException {
+        InputStream input = new ByteArrayInputStream(textProto);
+        int classesBefore = Debug.getLoadedClassCount();
+        long start = System.nanoTime();
+        parser.apply(input);
+        long nanos = System.nanoTime() - start;
+        return new FirstParse(Debug.getLoadedClassCount() - classesBefore, nanos / 1000);
+    }
+
+    /**
+     * Benchmarks each call in turn. This takes a while, so don't run it on the main thread.
+     * @param context
+     * The context to attach the providers to, e.g. the instrumentation's target context.
+     * @param newProvider
+     * Creates a new instance of the provider to benchmark, e.g. MyContentProvider::new.
+     * @param calls
+     * The calls to benchmark, e.g. the {@link #DefaultCalls DefaultCalls}.
+     * @param coldRuns
+     * The number of cold calls to time for each call. Each is made to a new provider.
+     * @param warmRuns
+     * The number of warm calls to time for each call.
+     * @return
+     * The results, in the order of the calls.
+     */
+    public static @NonNull Report Run(
+            @NonNull Context context,
+            @NonNull Supplier<? extends ContentProviderBase> newProvider,
+            @NonNull List<Call> calls,
+            int coldRuns,
+            int warmRuns) {
+        List<Result> results = new ArrayList<>(calls.size());
+        for (Call call : calls) {
+            long[] coldNanos = new long[coldRuns];
+            for (int i = 0; i < coldRuns; ++i) {
+                ContentProviderBase provider = NewProvider(context, newProvider);
+                long start = System.nanoTime();
+                provider.call(call.method, call.arg, Copy(call.extras));
+                coldNanos[i] = System.nanoTime() - start;
+            }
+
+            ContentProviderBase provider = NewProvider(context, newProvider);
+            Bundle result = provider.call(call.method, call.arg, Copy(call.extras));
+            long[] warmNanos = new long[warmRuns];
+            long allocatedBefore = AllocatedBytes();
+            for (int i = 0; i < warmRuns; ++i) {
+                Bundle extras = Copy(call.extras);
+                long start = System.nanoTime();
+                provider.call(call.method, call.arg, extras);
+                warmNanos[i] = System.nanoTime() - start;
+            }
+            long allocatedAfter = AllocatedBytes();
+            long allocatedBytes = allocatedBefore < 0 || allocatedAfter < 0 || warmRuns == 0
+                    ? -1 : (allocatedAfter - allocatedBefore) / warmRuns;
+
+            String error = result.getString(DlcType.EXCEPTION.Tag());
+            if (error == null && result.isEmpty()) error = "unsupported";
+            results.add(new Result(call.label, call.method, Latency.FromNanos(coldNanos), Latency.FromNanos(warmNanos),
+                    ParcelledSize(result), allocatedBytes, error));
+        }
+        return new Report(results);
+    }
+
+    private static void WriteAtomically(File file, String json) throws IOException {
+        File temporaryFile = new File(file.getPath() + ".tmp");
+        try (Writer writer = new OutputStreamWriter(new FileOutputStream(temporaryFile), StandardCharsets.UTF_8)) {
+            writer.write(json);
+        }
+        if (!temporaryFile.renameTo(file)) {
+            throw new IOException("Failed to save the benchmark results to " + file);
+        }
+    }
+
+    private static ContentProviderBase NewProvider(Context context, Supplier<? extends ContentProviderBase> newProvider) {
+        ContentProviderBase provider = newProvider.get();
+        provider.attachInfo(context, null);
+        return provider;
+    }
+
+    // Providers may modify the extras they're passed, so each call gets its own copy.
+    private static @Nullable Bundle Copy(@Nullable Bundle extras) {
+        return extras == null ? null : new Bundle(extras);
+    }
+
+    private static long ParcelledSize(Bundle bundle) {
+        Parcel parcel = Parcel.obtain();
+        try {
+            parcel.writeBundle(bundle);
+            return parcel.dataSize();
+        }
+        finally {
+            parcel.recycle();
+        }
+    }
+
+    // The total number of bytes allocated by the process so far, or -1 if the runtime doesn't report it.
+    private static long AllocatedBytes() {
+        String allocated = Debug.getRuntimeStat("art.gc.bytes-allocated");
+        try {
+            return allocated == null || allocated.isEmpty() ? -1 : Long.parseLong(allocated);
+        }
+        catch (NumberFormatException ex) {
+            return -1;
+        }
+    }
+}
@@ -0,0 +1,91 @@
+package ca.isupeene.charactersheet.cdk;
+
+import android.content.Context;
+import android.os.Bundle;
+import android.util.Log;
+
+import androidx.test.ext.junit.runners.AndroidJUnit4;
+import androidx.test.platform.app.InstrumentationRegistry;
+
+import org.junit.Test;
+import org.junit.runner.RunWith;
+
+import java.io.File;
+import java.io.IOException;
+import java.util.ArrayList;
+import java.util.List;
+import java.util.Objects;
+
+import static org.junit.Assert.assertTrue;
+
+/**
+ * Benchmarks {@link SyntheticContentProvider} over each of the synthetic packs, and fails if any call
+ * regressed since the device's baseline. Run it with {@code gradlew :cdk:connectedAndroidTest}.
+ *
+ * Each run saves a {@link ProviderBenchmark.Report Report} per pack to the test APK's external files directory,
+ * e.g. /sdcard/Android/data/ca.isupeene.charactersheet.cdk.test/files/benchmark/500.json for the pack with
+ * 500 elements per list. Latencies depend on the device, so the baselines are kept on the device too, in
+ * benchmark/baseline/. The first run on a device saves its reports as the baselines, and so does any run
+ * with the instrumentation argument updateBaseline=true, e.g.
+ * <pre>
+ * gradlew :cdk:connectedAndroidTest -Pandroid.testInstrumentationRunnerArguments.updateBaseline=true
+ * </pre>
+ * The tolerance argument sets the fraction by which a measurement may grow, 0.25 by default.
+ *
+ * Before benchmarking, the test measures the first {@link Parser#ParseTalentList ParseTalentList} in the process,
+ * to show how many parser classes a first parse loads, and saves it to benchmark/first-parse.json. This is only
+ * the first parse of talents if nothing else in the instrumentation process parsed them before, so keep the
+ * benchmark in its own test class.
+ */
+@RunWith(AndroidJUnit4.class)
+public class ProviderBenchmarkTest {
+    private static final String TAG = "ProviderBenchmarkTest";
+    private static final int COLD_RUNS = 5;
+    private static final int WARM_RUNS = 50;
+    private static final double DEFAULT_TOLERANCE = 0.25;
+
+    @Test
+    public void NoRegressions() throws IOException {
+        Context context = InstrumentationRegistry.getInstrumentation().getContext();
+        Bundle arguments = InstrumentationRegistry.getArguments();
+        boolean updateBaseline = Boolean.parseBoolean(arguments.getString("updateBaseline"));
+        double tolerance = Double.parseDouble(arguments.getString("tolerance", String.valueOf(DEFAULT_TOLERANCE)));
+
+        File reportDirectory = new File(context.getExternalFilesDir(null), "benchmark");
+        File baselineDirectory = new File(reportDirectory, "baseline");
+        if (!baselineDirectory.isDirectory() && !baselineDirectory.mkdirs()) {
+            throw new IOException("Couldn't create " + baselineDirectory);
+        }
+
+        DlcContainer container = SyntheticContentProvider.OpenContainer(context, SyntheticContentProvider.PACK_SIZES[0]);
+        byte[] talents = container.ReadBytes(Objects.requireNonNull(container.Find(DlcContainer.Kind.DLC_TYPE, DlcType.TALENT.Tag())));
+        ProviderBenchmark.FirstParse firstParse = ProviderBenchmark.MeasureFirstParse(Parser::ParseTalentList, talents);
+        firstParse.Save(new File(reportDirectory, "first-parse.json"));
+        Log.i(TAG, "The first ParseTalentList loaded " + firstParse.classesLoaded + " classes and took " + firstParse.micros + "us");
+
+        List<String> regressions = new ArrayList<>();
+        for (int elements : SyntheticContentProvider.PACK_SIZES) {
+            ProviderBenchmark.Report report = ProviderBenchmark.Run(
+                    context,
+                    () -> new SyntheticContentProvider(elements),
+                    SyntheticContentProvider.DefaultCalls(context, elements),
+                    COLD_RUNS,
+                    WARM_RUNS);
+            String fileName = elements + ".json";
+            File reportFile = new File(reportDirectory, fileName);
+            report.Save(reportFile);
+            Log.i(TAG, "Saved the report for " + elements + " elements to " + reportFile);
+
+            File baselineFile = new File(baselineDirectory, fileName);
+            if (updateBaseline || !baselineFile.isFile()) {
+                report.Save(baselineFile);
+                Log.i(TAG, "Saved the baseline for " + elements + " elements to " + baselineFile);
+                continue;
+            }
+            for (String regression : report.Regressions(ProviderBenchmark.Report.Load(baselineFile), tolerance)) {
+                regressions.add(elements + " elements: " + regression);
+            }
+        }
+        assertTrue("Regressed since the baseline:\n" + String.join("\n", regressions), regressions.isEmpty());
+    }
+}
@@ -0,0 +1,84 @@
+package ca.isupeene.charactersheet.cdk;
+
+import android.content.Context;
+import android.content.res.AssetFileDescriptor;
+
+import androidx.annotation.NonNull;
+import androidx.annotation.Nullable;
+
+import java.io.IOException;
+import java.util.List;
+
+/**
+ * Serves one of the synthetic content packs that build.gradle's generateSyntheticPacks task generates
+ * with synthetic-pack.py, for {@link ProviderBenchmark}. Each pack is packed into a container, with a
+ * search index over its info pages, under the instrumented tests' assets/synthetic/&lt;elements&gt;/.
+ * <pre>
+ * Context context = InstrumentationRegistry.getInstrumentation().getContext();
+ * ProviderBenchmark.Report report = ProviderBenchmark.Run(
+ *         context, () -&gt; new SyntheticContentProvider(500), SyntheticContentProvider.DefaultCalls(context, 500), 5, 50);
+ * </pre>
+ */
+public class SyntheticContentProvider extends ContentProviderBase {
+    /**
+     * The number of elements per list in each of the generated packs. Keep these in sync with syntheticPackSizes in build.gradle.
+     */
+    static final int[] PACK_SIZES = {100, 500, 2000};
+
+    // One of the words synthetic-pack.py writes, so that searches find something.
+    private static final String SEARCH_TEXT = "arcane";
+
+    private final int elements;
+
+    /**
+     * @param elements
+     * The number of elements per list in the pack to serve, one of the {@link #PACK_SIZES PACK_SIZES}.
+     */
+    SyntheticContentProvider(int elements) {
+        this.elements = elements;
+    }
+
+    private static String PackDirectory(int elements) {
+        return "synthetic/" + elements + "/";
+    }
+
+    @Override
+    protected int ResourceForContentType(DlcType type) throws ContentNotSupportedException {
+        // All of the content is in the container.
+        throw new ContentNotSupportedException();
+    }
+
+    @Override
+    protected @Nullable String ContainerAssetPath() {
+        return PackDirectory(elements) + "content.dlc";
+    }
+
+    @Override
+    protected @Nullable String SearchIndexAssetPath() {
+        return PackDirectory(elements) + "search.idx";
+    }
+
+    /**
+     * @return
+     * The container of the pack with the given number of elements per list.
+     */
+    static @NonNull DlcContainer OpenContainer(@NonNull Context context, int elements) throws IOException {
+        try (AssetFileDescriptor fileDescriptor = context.getAssets().openFd(PackDirectory(elements) + "content.dlc")) {
+            return DlcContainer.Open(fileDescriptor);
+        }
+    }
+
+    /**
+     * @return
+     * {@link ProviderBenchmark#DefaultCalls ProviderBenchmark.DefaultCalls} for the first info directory and image in a pack.
+     */
+    static @NonNull List<ProviderBenchmark.Call> DefaultCalls(@NonNull Context context, int elements) throws IOException {
+        DlcContainer container = OpenContainer(context, elements);
+        List<DlcContainer.Entry> info = container.Entries(DlcContainer.Kind.INFO);
+        List<DlcContainer.Entry> images = container.Entries(DlcContainer.Kind.IMAGE);
+        return ProviderBenchmark.DefaultCalls(
+                info.isEmpty() ? null : info.get(0).Key(),
+                images.isEmpty() ? null : images.get(0).Key(),
+                SEARCH_TEXT);
+    }
+}
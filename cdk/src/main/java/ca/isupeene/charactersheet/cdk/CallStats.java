@@ -0,0 +1,232 @@
+package ca.isupeene.charactersheet.cdk;
+
+import android.os.SystemClock;
+import android.os.Trace;
+
+import androidx.annotation.NonNull;
+
+import java.util.Arrays;
+import java.util.Locale;
+import java.util.concurrent.atomic.AtomicLong;
+import java.util.concurrent.atomic.AtomicLongArray;
+import java.util.concurrent.atomic.LongAdder;
+
+import ca.isupeene.charactersheet.cdk.Model.ProviderStats;
+
+/**
+ * Counters and latency histograms for the calls a {@link ContentProviderBase} serves, kept per method
+ * and per {@link Stage} of serving each {@link DlcType}, along with matching {@link Trace} sections.
+ *
+ * Recording is lock-free and allocates nothing: every histogram and section name exists up front, and
+ * a sample is a handful of atomic increments. Trace sections are close to free while no trace is being
+ * captured, so the stats can stay enabled in production builds.
+ */
+final class CallStats {
+    /**
+     * A step in serving a DlcType, each of which gets its own trace section and histogram.
+     */
+    enum Stage {
+        // Opening the raw resource, asset or container entry.
+        OPEN,
+        // Parsing text-format content into a builder, or decoding an image.
+        PARSE,
+        // Building the parsed message.
+        BUILD,
+        // Serializing the message to a byte[].
+        SERIALIZE,
+        // Compressing the serialized message.
+        ENCODE;
+
+        String Name() { return name().toLowerCase(Locale.ROOT); }
+    }
+
+    // The upper bounds of the histogram buckets, in microseconds. Samples above the last bound go in an extra bucket.
+    private static final long[] BUCKET_UPPER_BOUNDS_MICROS = {
+            50, 100, 250, 500, 1_000, 2_500, 5_000, 10_000, 25_000, 50_000,
+            100_000, 250_000, 500_000, 1_000_000, 2_500_000, 5_000_000};
+
+    private static final class Histogram {
+        private final LongAdder count = new LongAdder();
+        private final LongAdder totalMicros = new LongAdder();
+        private final AtomicLong maxMicros = new AtomicLong();
+        private final AtomicLongArray bucketCounts = new AtomicLongArray(BUCKET_UPPER_BOUNDS_MICROS.length + 1);
+
+        void Record(long nanos) {
+            long micros = nanos / 1000;
+            int bucket = Arrays.binarySearch(BUCKET_UPPER_BOUNDS_MICROS, micros);
+            bucketCounts.incrementAndGet(bucket < 0 ? -bucket - 1 : bucket);
+            count.increment();
+            totalMicros.add(micros);
+            long max;
+            while (micros > (max = maxMicros.get()) && !maxMicros.compareAndSet(max, micros)) {}
+        }
+
+        long Count() { return count.sum(); }
+
+        ProviderStats.Histogram ToProto() {
+            ProviderStats.Histogram.Builder result = ProviderStats.Histogram.newBuilder()
+                    .setCount(count.sum())
+                    .setTotalMicros(totalMicros.sum())
+                    .setMaxMicros(maxMicros.get());
+            for (int i = 0; i < bucketCounts.length(); ++i) {
+                result.addBucketCount(bucketCounts.get(i));
+            }
+            return result.build();
+        }
+    }
+
+    private static final class MethodStats {
+        private final Histogram latency = new Histogram();
+        private final LongAdder errors = new LongAdder();
+        private final LongAdder notModified = new LongAdder();
+        private final LongAdder notSupported = new LongAdder();
+        private final LongAdder payloadBytes = new LongAdder();
+    }
+
+    /**
+     * The outcome of a call, for counting.
+     */
+    enum Outcome { CONTENT, NOT_MODIFIED, NOT_SUPPORTED, ERROR }
+
+    // The methods are DlcType tags, indexed by ordinal, and calls for unknown methods share an extra slot.
+    private static final int METHOD_COUNT = DlcType.values().length + 1;
+    private static final String UNKNOWN_METHOD = "unknown";
+    private static final String[] METHOD_TRACE_SECTIONS = new String[METHOD_COUNT];
+    private static final String[][] STAGE_TRACE_SECTIONS = new String[Stage.values().length][DlcType.values().length];
+
+    static {
+        for (DlcType type : DlcType.values()) {
+            METHOD_TRACE_SECTIONS[type.ordinal()] = "ContentProviderBase.call " + type.Tag();
+            for (Stage stage : Stage.values()) {
+                STAGE_TRACE_SECTIONS[stage.ordinal()][type.ordinal()] = "ContentProviderBase." + stage.Name() + ' ' + type.Tag();
+            }
+        }
+        METHOD_TRACE_SECTIONS[METHOD_COUNT - 1] = "ContentProviderBase.call " + UNKNOWN_METHOD;
+    }
+
+    // Everything recorded since the stats were created or reset. Resetting swaps in a new instance,
+    // so recording never needs a lock.
+    private static final class Counters {
+        private final long startMillis = SystemClock.elapsedRealtime();
+        private final MethodStats[] methods = new MethodStats[METHOD_COUNT];
+        private final Histogram[][] stages = new Histogram[Stage.values().length][DlcType.values().length];
+
+        Counters() {
+            for (int i = 0; i < methods.length; ++i) {
+                methods[i] = new MethodStats();
+            }
+            for (Histogram[] histograms : stages) {
+                for (int i = 0; i < histograms.length; ++i) {
+                    histograms[i] = new Histogram();
+                }
+            }
+        }
+    }
+
+    private volatile Counters counters = new Counters();
+
+    private static int MethodIndex(@NonNull String method) {
+        try {
+            return DlcType.ForTag(method).ordinal();
+        }
+        catch (EnumConstantNotPresentException ex) {
+            return METHOD_COUNT - 1;
+        }
+    }
+
+    private static String MethodName(int index) {
+        return index < DlcType.values().length ? DlcType.values()[index].Tag() : UNKNOWN_METHOD;
+    }
+
+    /**
+     * Starts timing a call, and its trace section. Every call to BeginCall must be followed by a call to
+     * {@link #EndCall EndCall} on the same thread.
+     * @return
+     * The start time, to pass to EndCall.
+     */
+    long BeginCall(@NonNull String method) {
+        Trace.beginSection(METHOD_TRACE_SECTIONS[MethodIndex(method)]);
+        return System.nanoTime();
+    }
+
+    /**
+     * Ends the trace section started by {@link #BeginCall BeginCall}, and records the call.
+     * @param payloadBytes
+     * The size of the byte[] result, or 0 if there isn't one.
+     */
+    void EndCall(@NonNull String method, long startNanos, @NonNull Outcome outcome, long payloadBytes) {
+        long nanos = System.nanoTime() - startNanos;
+        Trace.endSection();
+        MethodStats stats = counters.methods[MethodIndex(method)];
+        stats.latency.Record(nanos);
+        stats.payloadBytes.add(payloadBytes);
+        switch (outcome) {
+            case NOT_MODIFIED:
+                stats.notModified.increment();
+                break;
+            case NOT_SUPPORTED:
+                stats.notSupported.increment();
+                break;
+            case ERROR:
+                stats.errors.increment();
+                break;
+        }
+    }
+
+    /**
+     * Applies the function to the input inside a trace section, and records how long it took.
+     */
+    <T, R, X extends Exception> R Time(@NonNull Stage stage, @NonNull DlcType type, @NonNull FunctionX<T, R, X> function, T input) throws X {
+        Trace.beginSection(STAGE_TRACE_SECTIONS[stage.ordinal()][type.ordinal()]);
+        long startNanos = System.nanoTime();
+        try {
+            return function.apply(input);
+        }
+        finally {
+            counters.stages[stage.ordinal()][type.ordinal()].Record(System.nanoTime() - startNanos);
+            Trace.endSection();
+        }
+    }
+
+    /**
+     * @return
+     * The stats recorded so far. Methods and stages that haven't been used are left out.
+     */
+    @NonNull ProviderStats Snapshot() {
+        Counters counters = this.counters;
+        ProviderStats.Builder result = ProviderStats.newBuilder()
+                .setElapsedMillis(SystemClock.elapsedRealtime() - counters.startMillis);
+        for (long bound : BUCKET_UPPER_BOUNDS_MICROS) {
+            result.addBucketUpperBoundMicros(bound);
+        }
+        for (int i = 0; i < counters.methods.length; ++i) {
+            MethodStats stats = counters.methods[i];
+            if (stats.latency.Count() == 0) continue;
+            result.addMethod(ProviderStats.Method.newBuilder()
+                    .setMethod(MethodName(i))
+                    .setLatency(stats.latency.ToProto())
+                    .setErrors(stats.errors.sum())
+                    .setNotModified(stats.notModified.sum())
+                    .setNotSupported(stats.notSupported.sum())
+                    .setPayloadBytes(stats.payloadBytes.sum()));
+        }
+        for (Stage stage : Stage.values()) {
+            for (DlcType type : DlcType.values()) {
+                Histogram histogram = counters.stages[stage.ordinal()][type.ordinal()];
+                if (histogram.Count() == 0) continue;
+                result.addStage(ProviderStats.Stage.newBuilder()
+                        .setStage(stage.Name())
+                        .setDlcType(type.Tag())
+                        .setLatency(histogram.ToProto()));
+            }
+        }
+        return result.build();
+    }
+
+    /**
+     * Clears the stats. Calls in progress when the stats are reset may be recorded in either the old or the new stats.
+     */
+    void Reset() {
+        counters = new Counters();
+    }
+}
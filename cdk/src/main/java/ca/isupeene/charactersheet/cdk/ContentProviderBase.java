@@ -2,20 +2,61 @@ package ca.isupeene.charactersheet.cdk;
 
 import android.content.ContentProvider;
 import android.content.ContentValues;
+import android.content.pm.PackageInfo;
+import android.content.pm.PackageManager;
+import android.content.res.AssetFileDescriptor;
 import android.database.Cursor;
+import android.graphics.Bitmap;
+import android.graphics.BitmapFactory;
 import android.net.Uri;
 import android.os.Bundle;
+import android.os.ParcelFileDescriptor;
 import android.text.TextUtils;
 import android.util.Log;
 
 import androidx.annotation.NonNull;
 import androidx.annotation.Nullable;
 
+import java.io.ByteArrayInputStream;
+import java.io.File;
+import java.io.FileInputStream;
+import java.io.FileNotFoundException;
+import java.io.FileOutputStream;
 import java.io.IOException;
+import java.io.InputStream;
+import java.nio.charset.StandardCharsets;
+import java.security.MessageDigest;
+import java.security.NoSuchAlgorithmException;
+import java.util.ArrayList;
+import java.util.BitSet;
+import java.util.Comparator;
+import java.util.EnumSet;
+import java.util.HashMap;
+import java.util.LinkedHashMap;
+import java.util.List;
+import java.util.Map;
 import java.util.Objects;
+import java.util.Set;
+import java.util.concurrent.ConcurrentHashMap;
+import java.util.concurrent.ExecutionException;
+import java.util.concurrent.ExecutorService;
+import java.util.concurrent.Future;
+import java.util.concurrent.LinkedBlockingQueue;
+import java.util.concurrent.ThreadPoolExecutor;
+import java.util.concurrent.TimeUnit;
 import java.util.stream.Collectors;
 import java.util.stream.Stream;
 
+import com.google.protobuf.MessageLite;
+
+import ca.isupeene.charactersheet.cdk.Model.ClassSpellsList;
+import ca.isupeene.charactersheet.cdk.Model.ContentManifest;
+import ca.isupeene.charactersheet.cdk.Model.ItemList;
+import ca.isupeene.charactersheet.cdk.Model.MultiPageInfo;
+import ca.isupeene.charactersheet.cdk.Model.Query;
+import ca.isupeene.charactersheet.cdk.Model.SearchIndex;
+import ca.isupeene.charactersheet.cdk.Model.SearchResults;
+import ca.isupeene.charactersheet.cdk.Model.SpellList;
 import ca.isupeene.charactersheet.cdk.Parser.ParseException;
 
 /**
@@ -28,7 +69,7 @@ import ca.isupeene.charactersheet.cdk.Parser.ParseException;
  * <li>The asset paths should match the content_path fields in your content's {@link Model.InfoSource InfoSource} / {@link Model.ImageSource ImageSource}.
  * <li>Icon content paths should specify an image file, while info paths should specify a directory.
  * <li>Info should be organized as a sequence of markdown files under the specified directory.
- * <li>Each markdown file should be titled {index}.{content name}.md, e.g. 01.PRIMAL_INSTINCT.md
+ * <li>Each markdown file should be titled {index}.{content name}.md, e.g. 01.PRIMAL_INSTINCT.md. Other files in info directories are ignored.
  * <li>All other content should be contained in single text proto files under res/raw.
  * </ul><p>
  *
@@ -39,11 +80,88 @@ import ca.isupeene.charactersheet.cdk.Parser.ParseException;
  * contain content of a particular type, you should throw a
  * {@link ContentNotSupportedException ContentNotSupportedException}
  * when ResourceForContentType is called for that type.
+ *
+ * Optionally, the raw resources and assets can be packed into a single container asset at build
+ * time with the pack-container.py tool. Override {@link #ContainerAssetPath ContainerAssetPath()}
+ * to serve content from the container instead; anything the container doesn't hold is still
+ * looked up in res/raw and the assets directory.
+ *
+ * The "manifest" call returns a {@link Model.ContentManifest ContentManifest} listing a hash of each
+ * piece of content. Responses carry the content's hash under {@link #HASH_KEY "hash"}, and if the app
+ * passes the hash of its cached copy under {@link #IF_NONE_MATCH_KEY "if_none_match"}, the provider
+ * responds with {@link #NOT_MODIFIED_KEY "not_modified"} instead of the content when it hasn't changed.
+ * Override {@link #ManifestAssetPath ManifestAssetPath()} to serve a manifest built by pack-manifest.py.
+ *
+ * Images can be returned as their encoded file rather than a decoded Bitmap, or opened as a file descriptor
+ * with {@link android.content.ContentResolver#openAssetFileDescriptor ContentResolver.openAssetFileDescriptor},
+ * and downscaled variants built by image-variants.py are served when a smaller size is requested.
+ * See {@link ImageDelivery} for details.
+ *
+ * The "search" call finds the info pages matching a text query, using an index built by search-index.py.
+ * Override {@link #SearchIndexAssetPath SearchIndexAssetPath()} to enable it.
+ *
+ * The "query" call returns the spells or items matching a {@link Model.Query Query}, e.g. all 3rd level
+ * evocation spells, so the app doesn't need to fetch and filter the whole list.
+ *
+ * Parsed content is cached in the provider's cache directory, so that only the first process after the pack is
+ * installed or updated parses its text protos. Override {@link #ParseCacheMaxBytes ParseCacheMaxBytes()} to
+ * change the cache's size limit, or to disable it.
+ *
+ * While you edit your content, override {@link #DevelopmentDirectory DevelopmentDirectory()} and run dev-watch.py
+ * to serve it from a local copy of your sources, so that edits show up without reinstalling the pack.
+ *
+ * Each call, and each stage of reading content (opening, parsing, building, serializing and encoding it),
+ * is wrapped in an {@link android.os.Trace Trace} section, so it shows up in system traces, and counted in
+ * per-method and per-stage latency histograms returned by the "stats" call.
  */
 public abstract class ContentProviderBase extends ContentProvider {
     private static final String TAG = "ContentProviderBase";
     private static final String LEGAL_DLC_TYPES =
             TextUtils.join(", ", Stream.of(DlcType.values()).map(DlcType::Tag).collect(Collectors.toList()));
+    // The DlcTypes that are read from a raw resource file.
+    private static final Set<DlcType> RESOURCE_TYPES = EnumSet.of(
+            DlcType.BACKGROUND, DlcType.CLASS_SPELLS, DlcType.CLASS, DlcType.FEAT,
+            DlcType.ITEM, DlcType.RACE, DlcType.SPELL, DlcType.TALENT);
+    // The DlcTypes that can be requested by a "batch" call, i.e. those that don't need an arg.
+    private static final Set<DlcType> BATCHABLE_TYPES = EnumSet.of(
+            DlcType.BACKGROUND, DlcType.CLASS_SPELLS, DlcType.CLASS, DlcType.FEAT,
+            DlcType.ITEM, DlcType.RACE, DlcType.SPELL, DlcType.TALENT, DlcType.MANIFEST);
+    private static final int MAX_BATCH_THREADS = 4;
+
+    /**
+     * The extras key for the hash of the content the app already has.
+     */
+    public static final String IF_NONE_MATCH_KEY = "if_none_match";
+    /**
+     * The result key for the hash of the requested content, if it's listed in the manifest.
+     */
+    public static final String HASH_KEY = "hash";
+    /**
+     * The result key that's set to true, in place of the content, when the content's hash matches {@link #IF_NONE_MATCH_KEY}.
+     */
+    public static final String NOT_MODIFIED_KEY = "not_modified";
+    /**
+     * The extras key for the String array of {@link DlcType#Tag tags} requested by a "batch" call.
+     */
+    public static final String BATCH_TAGS_KEY = "tags";
+    /**
+     * The extras key for the maximum number of results returned by a "search" call.
+     */
+    public static final String SEARCH_LIMIT_KEY = "limit";
+    private static final int DEFAULT_SEARCH_LIMIT = 20;
+    /**
+     * The extras key for the serialized {@link Model.Query Query} of a "query" call.
+     */
+    public static final String QUERY_KEY = "query";
+    /**
+     * The result key for the positions, in the full {@link Model.SpellList SpellList} or {@link Model.ItemList ItemList},
+     * of the elements matching a "query" call.
+     */
+    public static final String QUERY_INDEXES_KEY = "indexes";
+    /**
+     * The extras key that's set to true to clear the stats after a "stats" call returns them.
+     */
+    public static final String STATS_RESET_KEY = "reset";
 
     /**
      * Throw this from {@link #ResourceForContentType ResourceForContentType} if your
@@ -63,31 +181,703 @@ public abstract class ContentProviderBase extends ContentProvider {
      */
     protected abstract int ResourceForContentType(DlcType type) throws ContentNotSupportedException;
 
+    /**
+     * Override this if your content is packed into a {@link DlcContainer DlcContainer} asset.
+     * @return
+     * The path of the container, relative to your content pack's "assets" directory,
+     * or null if content should be read from res/raw and the assets directory.
+     */
+    protected @Nullable String ContainerAssetPath() {
+        return null;
+    }
+
+    /**
+     * Override this to serve content from a local copy of your pack's sources while you edit them, e.g.
+     * return {@code BuildConfig.DEBUG ? new File(getContext().getExternalFilesDir(null), "dev") : null}, and run
+     * dev-watch.py to copy your edits to the device as you save them. Only changed files are reparsed.
+     * Don't enable this in release builds.
+     * @return
+     * A directory laid out like your project's src/main, with text protos under res/raw named after their
+     * raw resources, and info and images under assets, or null to only serve the packaged content.
+     * Content that isn't in the directory is still served from the package.
+     */
+    protected @Nullable File DevelopmentDirectory() {
+        return null;
+    }
+
+    /**
+     * Override this to change how much space the parse cache may take up in the provider's cache directory.
+     * @return
+     * The size limit of the cache, in bytes, or 0 to parse content in every process without caching it.
+     */
+    protected long ParseCacheMaxBytes() {
+        return DEFAULT_PARSE_CACHE_MAX_BYTES;
+    }
+
+    private static final long DEFAULT_PARSE_CACHE_MAX_BYTES = 32 * 1024 * 1024;
+    private static final String PARSE_CACHE_DIRECTORY = "cdk-parse-cache";
+
+    private ParseCache parseCache;
+    private boolean parseCacheOpened;
+
+    private synchronized @Nullable ParseCache GetParseCache() {
+        if (!parseCacheOpened) {
+            long maxBytes = ParseCacheMaxBytes();
+            if (maxBytes > 0) {
+                try {
+                    // Installing or updating the pack changes its last update time, even if the version code stays the same.
+                    PackageInfo packageInfo = getContext().getPackageManager().getPackageInfo(getContext().getPackageName(), 0);
+                    @SuppressWarnings("deprecation")
+                    String version = packageInfo.versionCode + "-" + packageInfo.lastUpdateTime;
+                    parseCache = ParseCache.Open(new File(getContext().getCacheDir(), PARSE_CACHE_DIRECTORY), version, maxBytes);
+                }
+                catch (PackageManager.NameNotFoundException | IOException ex) {
+                    Log.w(TAG, "Parsing content without a cache", ex);
+                }
+            }
+            parseCacheOpened = true;
+        }
+        return parseCache;
+    }
+
+    private DevDirectory devDirectory;
+    private boolean devDirectoryChecked;
+
+    private synchronized @Nullable DevDirectory GetDevDirectory() {
+        if (!devDirectoryChecked) {
+            File directory = DevelopmentDirectory();
+            if (directory != null) {
+                try {
+                    devDirectory = new DevDirectory(directory);
+                    Log.w(TAG, "Serving content under development from " + directory);
+                }
+                catch (IOException ex) {
+                    Log.e(TAG, "Couldn't open the development directory " + directory, ex);
+                }
+            }
+            devDirectoryChecked = true;
+        }
+        return devDirectory;
+    }
+
+    // The path of a DlcType's text proto in the development directory, named after its raw resource.
+    private String DevDlcPath(DlcType type) {
+        String name;
+        try {
+            name = getContext().getResources().getResourceEntryName(ResourceForContentType(type));
+        }
+        catch (ContentNotSupportedException ex) {
+            name = type.Tag();
+        }
+        return DevDirectory.RAW_DIRECTORY + name + ".textpb";
+    }
+
+    // The hashes of the DlcTypes' text protos in the development directory, so that values built from
+    // them can tell when to rebuild. Empty when there's no development directory.
+    private String DevHashes(DlcType... types) throws IOException {
+        DevDirectory devDirectory = GetDevDirectory();
+        if (devDirectory == null) return "";
+        StringBuilder hashes = new StringBuilder();
+        for (DlcType type : types) {
+            hashes.append(devDirectory.Hash(DevDlcPath(type))).append('/');
+        }
+        return hashes.toString();
+    }
+
+    private DlcContainer container;
+    private boolean containerOpened;
+
+    private synchronized @Nullable DlcContainer GetContainer() throws IOException {
+        if (!containerOpened) {
+            String containerAssetPath = ContainerAssetPath();
+            if (containerAssetPath != null) {
+                try (AssetFileDescriptor fileDescriptor = getContext().getAssets().openFd(containerAssetPath)) {
+                    container = DlcContainer.Open(fileDescriptor);
+                }
+            }
+            containerOpened = true;
+        }
+        return container;
+    }
+
+    /**
+     * Override this if your content pack includes a manifest built by pack-manifest.py.
+     * @return
+     * The path of the text-format {@link Model.ContentManifest ContentManifest}, relative to your content pack's "assets" directory,
+     * or null if the manifest should be built from the {@link #ContainerAssetPath container} or your raw resources at runtime.
+     * Manifests built at runtime only list {@link DlcType DlcTypes}, unless a container is used.
+     */
+    protected @Nullable String ManifestAssetPath() {
+        return null;
+    }
+
+    /**
+     * Override this if your content pack includes a search index built by search-index.py.
+     * @return
+     * The path of the {@link Model.SearchIndex SearchIndex}, relative to your content pack's "assets" directory,
+     * or null if "search" calls aren't supported.
+     */
+    protected @Nullable String SearchIndexAssetPath() {
+        return null;
+    }
+
+    private InfoSearch infoSearch;
+
+    private synchronized InfoSearch GetInfoSearch() throws IOException, ContentNotSupportedException {
+        DevDirectory devDirectory = GetDevDirectory();
+        String searchIndexAssetPath = SearchIndexAssetPath();
+        if (devDirectory != null && searchIndexAssetPath != null) {
+            InfoSearch devSearch = devDirectory.Load(
+                    DevDirectory.ASSETS_DIRECTORY + searchIndexAssetPath, data -> new InfoSearch(SearchIndex.parseFrom(data)));
+            if (devSearch != null) return devSearch;
+        }
+        if (infoSearch == null) {
+            if (searchIndexAssetPath == null) throw new ContentNotSupportedException();
+            try (InputStream input = getContext().getAssets().open(searchIndexAssetPath)) {
+                infoSearch = new InfoSearch(SearchIndex.parseFrom(input));
+            }
+        }
+        return infoSearch;
+    }
+
+    private ContentManifest manifest;
+    private final Map<String, String> manifestHashes = new HashMap<>();
+
+    private synchronized ContentManifest GetManifest() throws IOException {
+        if (manifest == null) {
+            String manifestAssetPath = ManifestAssetPath();
+            DlcContainer container = GetContainer();
+            if (manifestAssetPath != null) {
+                try (InputStream input = getContext().getAssets().open(manifestAssetPath)) {
+                    manifest = Parser.ParseContentManifest(input).build();
+                }
+            }
+            else if (container != null) {
+                manifest = BuildManifestFromContainer(container);
+            }
+            else {
+                manifest = BuildManifestFromResources();
+            }
+            for (ContentManifest.Entry entry : manifest.getEntryList()) {
+                manifestHashes.put(ManifestKey(entry.getKind(), entry.getKey()), entry.getHash());
+            }
+        }
+        return manifest;
+    }
+
+    private static String ManifestKey(ContentManifest.Entry.Kind kind, String key) {
+        return kind.name() + '/' + key;
+    }
+
+    private static ContentManifest BuildManifest(List<ContentManifest.Entry> entries) {
+        // Sort the entries so that the version doesn't depend on the order in which they were found.
+        entries.sort(Comparator.comparing(ContentManifest.Entry::getKind).thenComparing(ContentManifest.Entry::getKey));
+        MessageDigest digest = NewSha256();
+        for (ContentManifest.Entry entry : entries) {
+            digest.update((ManifestKey(entry.getKind(), entry.getKey()) + '/' + entry.getHash() + '\n').getBytes(StandardCharsets.UTF_8));
+        }
+        return ContentManifest.newBuilder().setVersion(ToHex(digest.digest())).addAllEntry(entries).build();
+    }
+
+    // The manifest, listing the hashes of the DlcTypes in the development directory in place of the packaged ones.
+    private ContentManifest GetServedManifest() throws IOException {
+        DevDirectory devDirectory = GetDevDirectory();
+        if (devDirectory == null) return GetManifest();
+
+        Map<String, ContentManifest.Entry> entries = new LinkedHashMap<>();
+        for (ContentManifest.Entry entry : GetManifest().getEntryList()) {
+            entries.put(ManifestKey(entry.getKind(), entry.getKey()), entry);
+        }
+        for (DlcType type : RESOURCE_TYPES) {
+            String path = DevDlcPath(type);
+            String hash = devDirectory.Hash(path);
+            File file = devDirectory.Find(path);
+            if (hash == null || file == null) continue;
+            entries.put(ManifestKey(ContentManifest.Entry.Kind.DLC_TYPE, type.Tag()), ContentManifest.Entry.newBuilder()
+                    .setKind(ContentManifest.Entry.Kind.DLC_TYPE)
+                    .setKey(type.Tag())
+                    .setHash(hash)
+                    .setSize(file.length())
+                    .build());
+        }
+        return BuildManifest(new ArrayList<>(entries.values()));
+    }
+
+    private static ContentManifest BuildManifestFromContainer(DlcContainer container) {
+        List<ContentManifest.Entry> entries = new ArrayList<>();
+        for (DlcContainer.Kind kind : DlcContainer.Kind.values()) {
+            for (DlcContainer.Entry entry : container.Entries(kind)) {
+                entries.add(ContentManifest.Entry.newBuilder()
+                        .setKind(ContentManifest.Entry.Kind.valueOf(kind.name()))
+                        .setKey(entry.Key())
+                        .setHash(ToHex(entry.Hash()))
+                        .setSize(entry.Length())
+                        .build());
+            }
+        }
+        return BuildManifest(entries);
+    }
+
+    private ContentManifest BuildManifestFromResources() throws IOException {
+        List<ContentManifest.Entry> entries = new ArrayList<>();
+        byte[] buffer = new byte[8192];
+        for (DlcType type : RESOURCE_TYPES) {
+            int resourceId;
+            try {
+                resourceId = ResourceForContentType(type);
+            }
+            catch (ContentNotSupportedException ex) {
+                continue;
+            }
+            MessageDigest digest = NewSha256();
+            long size = 0;
+            try (InputStream input = getContext().getResources().openRawResource(resourceId)) {
+                int count;
+                while ((count = input.read(buffer)) != -1) {
+                    digest.update(buffer, 0, count);
+                    size += count;
+                }
+            }
+            entries.add(ContentManifest.Entry.newBuilder()
+                    .setKind(ContentManifest.Entry.Kind.DLC_TYPE)
+                    .setKey(type.Tag())
+                    .setHash(ToHex(digest.digest()))
+                    .setSize(size)
+                    .build());
+        }
+        return BuildManifest(entries);
+    }
+
+    static MessageDigest NewSha256() {
+        try {
+            return MessageDigest.getInstance("SHA-256");
+        }
+        catch (NoSuchAlgorithmException ex) {
+            // Every Android implementation is required to support SHA-256.
+            throw new IllegalStateException(ex);
+        }
+    }
+
+    static String ToHex(byte[] bytes) {
+        StringBuilder hex = new StringBuilder(bytes.length * 2);
+        for (byte b : bytes) {
+            hex.append(Character.forDigit((b >> 4) & 0xF, 16)).append(Character.forDigit(b & 0xF, 16));
+        }
+        return hex.toString();
+    }
+
+    private @Nullable String ManifestHash(ContentManifest.Entry.Kind kind, String key) throws IOException {
+        DevDirectory devDirectory = GetDevDirectory();
+        if (devDirectory != null) {
+            if (kind == ContentManifest.Entry.Kind.DLC_TYPE) {
+                String hash = devDirectory.Hash(DevDlcPath(DlcType.ForTag(key)));
+                if (hash != null) return hash;
+            }
+            else if (devDirectory.Contains(DevDirectory.ASSETS_DIRECTORY + key)) {
+                // Info and images under development are served without a hash, so the app never keeps a stale copy.
+                return null;
+            }
+        }
+        GetManifest();
+        synchronized (this) {
+            return manifestHashes.get(ManifestKey(kind, key));
+        }
+    }
+
+    // Records the content's hash in the result. If the app already has this version of the content,
+    // also marks the result as not modified and returns true, in which case the content should be left out.
+    private static boolean IsNotModified(Bundle result, @Nullable String hash, @Nullable Bundle extras) {
+        if (hash == null) return false;
+
+        result.putString(HASH_KEY, hash);
+        if (extras != null && hash.equals(extras.getString(IF_NONE_MATCH_KEY))) {
+            result.putBoolean(NOT_MODIFIED_KEY, true);
+            return true;
+        }
+        return false;
+    }
+
+    private final CallStats stats = new CallStats();
+
+    private byte[] ParseDlc(DlcType type, InputStream input) throws IOException {
+        MessageLite.Builder builder = stats.Time(CallStats.Stage.PARSE, type, type.Parser(), input);
+        MessageLite message = stats.Time(CallStats.Stage.BUILD, type, MessageLite.Builder::build, builder);
+        return stats.Time(CallStats.Stage.SERIALIZE, type, MessageLite::toByteArray, message);
+    }
+
     private byte[] ReadDlcAsBytes(DlcType type) throws IOException, ContentNotSupportedException {
-        return type.Parser().apply(getContext().getResources().openRawResource(ResourceForContentType(type))).build().toByteArray();
+        DevDirectory devDirectory = GetDevDirectory();
+        if (devDirectory != null) {
+            byte[] devBytes = devDirectory.Load(DevDlcPath(type), data -> ParseDlc(type, new ByteArrayInputStream(data)));
+            if (devBytes != null) return devBytes;
+        }
+
+        DlcContainer container = GetContainer();
+        DlcContainer.Entry entry = container == null ? null : container.Find(DlcContainer.Kind.DLC_TYPE, type.Tag());
+        if (entry != null && entry.Encoding() == DlcContainer.Encoding.BINARY) {
+            return stats.Time(CallStats.Stage.OPEN, type, container::ReadBytes, entry);
+        }
+        int resourceId = entry == null ? ResourceForContentType(type) : 0;
+        // Keyed by the container's path too, since several providers in one package can share a cache directory.
+        String cacheKey = entry != null ? "container/" + ContainerAssetPath() + '/' + type.Tag() : "dlc/" + type.Tag() + '/' + resourceId;
+        ParseCache parseCache = GetParseCache();
+        byte[] cached = parseCache == null ? null : stats.Time(CallStats.Stage.OPEN, type, parseCache::Get, cacheKey);
+        if (cached != null) return cached;
+
+        InputStream input;
+        if (entry != null) {
+            input = stats.Time(CallStats.Stage.OPEN, type, container::OpenStream, entry);
+        }
+        else {
+            input = stats.Time(CallStats.Stage.OPEN, type, getContext().getResources()::openRawResource, resourceId);
+        }
+        byte[] data = ParseDlc(type, input);
+        if (parseCache != null) parseCache.Put(cacheKey, data);
+        return data;
+    }
+
+    private byte[] Encode(DlcType type, byte[] data, String encoding, int level) {
+        return stats.Time(CallStats.Stage.ENCODE, type, bytes -> ResponseEncoding.Encode(bytes, encoding, level), data);
+    }
+
+    private final Map<String, byte[]> encodedDlcCache = new ConcurrentHashMap<>();
+
+    private byte[] ReadEncodedDlcAsBytes(DlcType type, String encoding, int level) throws IOException, ContentNotSupportedException {
+        if (encoding.equals(ResponseEncoding.IDENTITY)) return ReadDlcAsBytes(type);
+        // Content under development can change at any time, so its encodings aren't cached.
+        if (GetDevDirectory() != null) return Encode(type, ReadDlcAsBytes(type), encoding, level);
+
+        // Compressing is expensive and the content never changes, so each encoding is computed once per process.
+        String cacheKey = type.Tag() + '/' + encoding + '/' + level;
+        byte[] encoded = encodedDlcCache.get(cacheKey);
+        if (encoded == null) {
+            encoded = Encode(type, ReadDlcAsBytes(type), encoding, level);
+            encodedDlcCache.put(cacheKey, encoded);
+        }
+        return encoded;
+    }
+
+    private byte[] ReadInfoAsBytes(String contentPath) throws IOException {
+        DevDirectory devDirectory = GetDevDirectory();
+        MultiPageInfo devInfo = devDirectory == null ? null : devDirectory.ReadInfo(contentPath);
+        if (devInfo != null) return devInfo.toByteArray();
+
+        DlcContainer container = GetContainer();
+        DlcContainer.Entry entry = container == null ? null : container.Find(DlcContainer.Kind.INFO, contentPath);
+        if (entry != null) {
+            return stats.Time(CallStats.Stage.OPEN, DlcType.INFO, container::ReadBytes, entry);
+        }
+        String cacheKey = "info/" + contentPath;
+        ParseCache parseCache = GetParseCache();
+        byte[] cached = parseCache == null ? null : stats.Time(CallStats.Stage.OPEN, DlcType.INFO, parseCache::Get, cacheKey);
+        if (cached != null) return cached;
+
+        MultiPageInfo info = stats.Time(CallStats.Stage.OPEN, DlcType.INFO, path -> Utils.GetMultiPageInfoFromAssets(getContext(), path), contentPath);
+        byte[] data = stats.Time(CallStats.Stage.SERIALIZE, DlcType.INFO, MultiPageInfo::toByteArray, info);
+        if (parseCache != null) parseCache.Put(cacheKey, data);
+        return data;
+    }
+
+    private Bitmap ReadImage(String contentPath) throws IOException {
+        File devFile = FindDevAsset(contentPath);
+        if (devFile != null) return BitmapFactory.decodeFile(devFile.getPath());
+
+        DlcContainer container = GetContainer();
+        DlcContainer.Entry entry = container == null ? null : container.Find(DlcContainer.Kind.IMAGE, contentPath);
+        if (entry != null) {
+            return stats.Time(CallStats.Stage.PARSE, DlcType.IMAGE, BitmapFactory::decodeStream, container.OpenStream(entry));
+        }
+        return stats.Time(CallStats.Stage.PARSE, DlcType.IMAGE, path -> Utils.GetBitmapFromAssets(getContext(), path), contentPath);
+    }
+
+    private @Nullable File FindDevAsset(String contentPath) throws IOException {
+        DevDirectory devDirectory = GetDevDirectory();
+        return devDirectory == null ? null : devDirectory.Find(DevDirectory.ASSETS_DIRECTORY + contentPath);
+    }
+
+    private byte[] ReadImageBytes(String contentPath) throws IOException {
+        File devFile = FindDevAsset(contentPath);
+        if (devFile != null) return Utils.ReadAllBytes(new FileInputStream(devFile));
+
+        DlcContainer container = GetContainer();
+        DlcContainer.Entry entry = container == null ? null : container.Find(DlcContainer.Kind.IMAGE, contentPath);
+        if (entry != null) {
+            return stats.Time(CallStats.Stage.OPEN, DlcType.IMAGE, container::ReadBytes, entry);
+        }
+        return stats.Time(CallStats.Stage.OPEN, DlcType.IMAGE, path -> Utils.ReadAllBytes(getContext().getAssets().open(path)), contentPath);
+    }
+
+    // The content paths of the images in each directory, from the container and the assets directory.
+    private final Map<String, List<String>> imageDirectoryListings = new ConcurrentHashMap<>();
+
+    // Returns the content path of the image variant that best matches the requested size.
+    private String ResolveImagePath(String contentPath, int size) throws IOException {
+        if (size == ImageDelivery.ORIGINAL_SIZE) return contentPath;
+
+        int directoryEnd = contentPath.lastIndexOf('/');
+        String directory = directoryEnd < 0 ? "" : contentPath.substring(0, directoryEnd);
+        List<String> listing = imageDirectoryListings.get(directory);
+        // Images under development can be added at any time, so their directories are listed on every call.
+        if (listing == null || GetDevDirectory() != null) {
+            listing = ListImageDirectory(directory);
+            imageDirectoryListings.put(directory, listing);
+        }
+        return ImageDelivery.ChooseVariant(contentPath, listing, size);
+    }
+
+    private List<String> ListImageDirectory(String directory) throws IOException {
+        String prefix = directory.isEmpty() ? "" : directory + '/';
+        List<String> listing = new ArrayList<>();
+        DevDirectory devDirectory = GetDevDirectory();
+        if (devDirectory != null) {
+            listing.addAll(devDirectory.ListImages(directory));
+        }
+        DlcContainer container = GetContainer();
+        if (container != null) {
+            for (DlcContainer.Entry entry : container.Entries(DlcContainer.Kind.IMAGE)) {
+                if (entry.Key().startsWith(prefix) && entry.Key().indexOf('/', prefix.length()) < 0) {
+                    listing.add(entry.Key());
+                }
+            }
+        }
+        String[] filenames = getContext().getAssets().list(directory);
+        if (filenames != null) {
+            for (String filename : filenames) {
+                listing.add(prefix + filename);
+            }
+        }
+        return listing;
+    }
+
+    private void CallImage(Bundle result, String contentPath, @Nullable Bundle extras) throws IOException {
+        String mode = ImageDelivery.RequestedMode(extras);
+        String imagePath = ResolveImagePath(contentPath, ImageDelivery.RequestedSize(extras));
+        result.putString(ImageDelivery.SERVED_PATH_KEY, imagePath);
+        if (IsNotModified(result, ManifestHash(ContentManifest.Entry.Kind.IMAGE, imagePath), extras)) return;
+
+        if (mode.equals(ImageDelivery.BYTES)) {
+            result.putByteArray(DlcType.IMAGE.Tag(), ReadImageBytes(imagePath));
+        }
+        else {
+            result.putParcelable(DlcType.IMAGE.Tag(), ReadImage(imagePath));
+        }
+        result.putString(ImageDelivery.MODE_KEY, mode);
+    }
+
+    private SearchResults Search(String query, @Nullable Bundle extras) throws IOException, ContentNotSupportedException {
+        int limit = extras == null ? DEFAULT_SEARCH_LIMIT : extras.getInt(SEARCH_LIMIT_KEY, DEFAULT_SEARCH_LIMIT);
+        InfoSearch search = GetInfoSearch();
+        SearchResults.Builder results = SearchResults.newBuilder();
+        // Snippets are built from the excerpts in the index, so no pages are read.
+        for (InfoSearch.Match match : search.Search(query, limit)) {
+            SearchIndex.Page page = search.Page(match.page);
+            results.addResult(SearchResults.Result.newBuilder()
+                    .setContentPath(page.getContentPath())
+                    .setPageIndex(page.getPageIndex())
+                    .setTitle(page.getTitle())
+                    .setScore(match.score)
+                    .setSnippet(InfoSearch.Snippet(page, match.firstOffset)));
+        }
+        return results.build();
+    }
+
+    private QueryEngine.Spells spellQueryEngine;
+    private QueryEngine.Items itemQueryEngine;
+    // The DevHashes of the lists each query engine was built from.
+    private String spellQueryEngineHashes;
+    private String itemQueryEngineHashes;
+
+    private static void LogSavings(Interner interner) {
+        for (Interner.Savings savings : interner.Savings()) {
+            if (savings.SavedBytes() > 0) Log.d(TAG, "Interning saved " + savings);
+        }
+    }
+
+    private synchronized QueryEngine.Spells GetSpellQueryEngine() throws IOException, ContentNotSupportedException {
+        String hashes = DevHashes(DlcType.SPELL, DlcType.CLASS_SPELLS);
+        if (spellQueryEngine == null || !hashes.equals(spellQueryEngineHashes)) {
+            // The engine holds the lists for the life of the provider, so share their repeated sub-messages.
+            Interner interner = new Interner();
+            ClassSpellsList classSpells;
+            try {
+                classSpells = interner.InternClassSpellsList(ClassSpellsList.parseFrom(ReadDlcAsBytes(DlcType.CLASS_SPELLS)));
+            }
+            catch (ContentNotSupportedException ex) {
+                // Without a class spell list, class filters match nothing.
+                classSpells = null;
+            }
+            spellQueryEngine = new QueryEngine.Spells(interner.InternSpellList(SpellList.parseFrom(ReadDlcAsBytes(DlcType.SPELL))), classSpells);
+            spellQueryEngineHashes = hashes;
+            LogSavings(interner);
+        }
+        return spellQueryEngine;
+    }
+
+    private synchronized QueryEngine.Items GetItemQueryEngine() throws IOException, ContentNotSupportedException {
+        String hashes = DevHashes(DlcType.ITEM);
+        if (itemQueryEngine == null || !hashes.equals(itemQueryEngineHashes)) {
+            Interner interner = new Interner();
+            itemQueryEngine = new QueryEngine.Items(interner.InternItemList(ItemList.parseFrom(ReadDlcAsBytes(DlcType.ITEM))));
+            itemQueryEngineHashes = hashes;
+            LogSavings(interner);
+        }
+        return itemQueryEngine;
+    }
+
+    private void CallQuery(Bundle result, @Nullable String arg, @Nullable Bundle extras, String encoding, int level)
+            throws IOException, ContentNotSupportedException {
+        Query query;
+        byte[] serializedQuery = extras == null ? null : extras.getByteArray(QUERY_KEY);
+        if (serializedQuery != null) {
+            query = Query.parseFrom(serializedQuery);
+        }
+        else if (arg != null) {
+            query = Parser.ParseQuery(new ByteArrayInputStream(arg.getBytes(StandardCharsets.UTF_8))).build();
+        }
+        else {
+            throw new IllegalArgumentException("query requires a serialized Query keyed by \"" + QUERY_KEY + "\", or a text-format Query as its arg");
+        }
+
+        BitSet matches;
+        byte[] payload;
+        switch (query.getTarget()) {
+            case SPELLS: {
+                QueryEngine.Spells engine = GetSpellQueryEngine();
+                matches = engine.Evaluate(query);
+                payload = query.getIndexesOnly() ? null : engine.Select(matches).toByteArray();
+                break;
+            }
+            case ITEMS: {
+                QueryEngine.Items engine = GetItemQueryEngine();
+                matches = engine.Evaluate(query);
+                payload = query.getIndexesOnly() ? null : engine.Select(matches).toByteArray();
+                break;
+            }
+            default:
+                throw new IllegalArgumentException("Unknown query target " + query.getTarget());
+        }
+
+        result.putIntArray(QUERY_INDEXES_KEY, QueryEngine.Positions(matches));
+        if (payload != null) {
+            result.putByteArray(DlcType.QUERY.Tag(), Encode(DlcType.QUERY, payload, encoding, level));
+            result.putString(ResponseEncoding.ENCODING_KEY, encoding);
+        }
+    }
+
+    private ExecutorService batchExecutor;
+
+    private synchronized ExecutorService GetBatchExecutor() {
+        if (batchExecutor == null) {
+            int threadCount = Math.max(1, Math.min(MAX_BATCH_THREADS, Runtime.getRuntime().availableProcessors()));
+            ThreadPoolExecutor executor = new ThreadPoolExecutor(
+                    threadCount, threadCount, 30, TimeUnit.SECONDS, new LinkedBlockingQueue<>(),
+                    runnable -> {
+                        Thread thread = new Thread(runnable, TAG + "-batch");
+                        thread.setDaemon(true);
+                        return thread;
+                    });
+            // Providers are mostly idle, so don't keep the threads around between batches.
+            executor.allowCoreThreadTimeOut(true);
+            batchExecutor = executor;
+        }
+        return batchExecutor;
+    }
+
+    private void CallBatch(Bundle result, @Nullable Bundle extras) throws InterruptedException {
+        String[] tags = extras == null ? null : extras.getStringArray(BATCH_TAGS_KEY);
+        if (tags == null) {
+            throw new IllegalArgumentException("batch requires a String array of tags keyed by \"" + BATCH_TAGS_KEY + "\"");
+        }
+        // For batches, "if_none_match" holds a Bundle of hashes keyed by tag.
+        Bundle hashesByTag = extras.getBundle(IF_NONE_MATCH_KEY);
+
+        Map<String, Future<Bundle>> futures = new LinkedHashMap<>();
+        for (String tag : tags) {
+            if (futures.containsKey(tag)) continue;
+            Bundle tagExtras = new Bundle(extras);
+            tagExtras.remove(BATCH_TAGS_KEY);
+            tagExtras.remove(IF_NONE_MATCH_KEY);
+            if (hashesByTag != null && hashesByTag.getString(tag) != null) {
+                tagExtras.putString(IF_NONE_MATCH_KEY, hashesByTag.getString(tag));
+            }
+            futures.put(tag, GetBatchExecutor().submit(() -> CallBatchElement(tag, tagExtras)));
+        }
+
+        for (Map.Entry<String, Future<Bundle>> entry : futures.entrySet()) {
+            try {
+                result.putBundle(entry.getKey(), entry.getValue().get());
+            }
+            catch (ExecutionException ex) {
+                Log.e(TAG, "Unexpected exception in batch", ex.getCause());
+                Bundle error = new Bundle();
+                error.putString(DlcType.EXCEPTION.Tag(), ex.getCause().getMessage());
+                result.putBundle(entry.getKey(), error);
+            }
+        }
+    }
+
+    private Bundle CallBatchElement(String tag, Bundle extras) {
+        try {
+            if (!BATCHABLE_TYPES.contains(DlcType.ForTag(tag))) {
+                Bundle error = new Bundle();
+                error.putString(DlcType.EXCEPTION.Tag(), tag + " can't be requested in a batch.");
+                return error;
+            }
+        }
+        catch (EnumConstantNotPresentException ex) {
+            // Let call report the invalid method in the usual way.
+        }
+        return call(tag, null, extras);
     }
 
     /**
      *
      * @param method
      * Specifies the type of content being requested:
-     * "backgrounds", "class_spells", "classes", "feats", "items", "spells", "talents", "info", or "image".
+     * "backgrounds", "class_spells", "classes", "feats", "items", "spells", "talents", "info", "image", "manifest", "batch", "search", "query", or "stats".
      * @param arg
-     * For "info" and "image", the content path specified in the {@link Model.InfoSource InfoSource} / {@link Model.ImageSource ImageSource}
+     * For "info" and "image", the content path specified in the {@link Model.InfoSource InfoSource} / {@link Model.ImageSource ImageSource}.
+     * For "search", the text to search for. For "query", optionally a text-format {@link Model.Query Query}.
      * @param extras
-     * Not used
+     * Optionally, the compressed encoding to use for serialized protos, as built by {@link ResponseEncoding#RequestExtras ResponseEncoding.RequestExtras},
+     * and the hash of the app's cached copy of the content keyed by {@link #IF_NONE_MATCH_KEY "if_none_match"}.
+     * For "batch", the tags to request keyed by {@link #BATCH_TAGS_KEY "tags"}, and optionally a Bundle of
+     * hashes keyed by tag under "if_none_match". Encoding extras apply to every tag in the batch.
+     * For "image", the delivery mode and display size, as built by {@link ImageDelivery#RequestExtras ImageDelivery.RequestExtras}.
+     * For "search", the maximum number of results keyed by {@link #SEARCH_LIMIT_KEY "limit"}.
+     * For "query", the serialized {@link Model.Query Query} keyed by {@link #QUERY_KEY "query"}, unless it's passed as the arg.
+     * For "stats", optionally true keyed by {@link #STATS_RESET_KEY "reset"} to clear the stats once they're returned.
      * @return
      * A bundle containing the result keyed by the provided method name, or an error message keyed by "exception".
      * An empty bundle may also be returned if the requested method is not supported.
      *
-     * "image" requests contain the result as a parcelled Bitmap, all others as proto messages serialized to byte[].
+     * "image" requests contain the result as a parcelled Bitmap, or as the image file's byte[] if requested,
+     * with the mode keyed by {@link ImageDelivery#MODE_KEY "image_mode"}. Use {@link ImageDelivery#DecodeBitmap ImageDelivery.DecodeBitmap}
+     * to get the image. All others contain proto messages serialized to byte[],
+     * with the encoding of the byte[] keyed by {@link ResponseEncoding#ENCODING_KEY "encoding"}.
+     * Use {@link ResponseEncoding#Decode ResponseEncoding.Decode} to get the serialized proto.
+     *
+     * "query" requests contain the matching elements as a serialized {@link Model.SpellList SpellList} or
+     * {@link Model.ItemList ItemList}, unless {@link Model.Query#getIndexesOnly indexes_only} is set,
+     * and their positions in the full list as an int[] keyed by {@link #QUERY_INDEXES_KEY "indexes"}.
+     *
+     * "batch" requests contain, for each requested tag, the Bundle that a call for that tag alone would return,
+     * keyed by the tag. Errors are reported under "exception" in the affected tag's Bundle. The tags are
+     * computed in parallel.
+     *
+     * "stats" requests contain a serialized {@link Model.ProviderStats ProviderStats} covering every call since the
+     * provider started or the stats were last reset. The calls for each tag of a batch are counted separately.
      */
     @Override
     public Bundle call(@NonNull String method, @Nullable String arg, @Nullable Bundle extras) {
         Log.i(TAG, "Received call for " + method + " " + arg);
+        long startNanos = stats.BeginCall(method);
         Bundle result = new Bundle();
+        CallStats.Outcome outcome = CallStats.Outcome.CONTENT;
         try {
             DlcType dlcType = DlcType.ForTag(method);
+            String encoding = ResponseEncoding.RequestedEncoding(extras);
+            int level = ResponseEncoding.RequestedLevel(extras);
             switch (dlcType) {
                 case BACKGROUND:
                 case CLASS_SPELLS:
@@ -97,35 +887,73 @@ public abstract class ContentProviderBase extends ContentProvider {
                 case RACE:
                 case SPELL:
                 case TALENT:
-                    result.putByteArray(method, ReadDlcAsBytes(dlcType));
+                    if (IsNotModified(result, ManifestHash(ContentManifest.Entry.Kind.DLC_TYPE, method), extras)) break;
+                    result.putByteArray(method, ReadEncodedDlcAsBytes(dlcType, encoding, level));
+                    result.putString(ResponseEncoding.ENCODING_KEY, encoding);
                     break;
                 case INFO:
-                    result.putByteArray(method, Utils.GetMultiPageInfoFromAssets(getContext(), Objects.requireNonNull(arg)).toByteArray());
+                    if (IsNotModified(result, ManifestHash(ContentManifest.Entry.Kind.INFO, Objects.requireNonNull(arg)), extras)) break;
+                    result.putByteArray(method, Encode(dlcType, ReadInfoAsBytes(Objects.requireNonNull(arg)), encoding, level));
+                    result.putString(ResponseEncoding.ENCODING_KEY, encoding);
                     break;
                 case IMAGE:
-                    result.putParcelable(method, Utils.GetBitmapFromAssets(getContext(), Objects.requireNonNull(arg)));
+                    CallImage(result, Objects.requireNonNull(arg), extras);
+                    break;
+                case MANIFEST:
+                    ContentManifest servedManifest = GetServedManifest();
+                    if (IsNotModified(result, servedManifest.getVersion(), extras)) break;
+                    result.putByteArray(method, Encode(dlcType, servedManifest.toByteArray(), encoding, level));
+                    result.putString(ResponseEncoding.ENCODING_KEY, encoding);
+                    break;
+                case BATCH:
+                    CallBatch(result, extras);
+                    break;
+                case SEARCH:
+                    result.putByteArray(method, Encode(dlcType, Search(Objects.requireNonNull(arg), extras).toByteArray(), encoding, level));
+                    result.putString(ResponseEncoding.ENCODING_KEY, encoding);
+                    break;
+                case QUERY:
+                    CallQuery(result, arg, extras, encoding, level);
+                    break;
+                case STATS:
+                    // Snapshot before resetting, so that no calls are lost between the two.
+                    result.putByteArray(method, ResponseEncoding.Encode(stats.Snapshot().toByteArray(), encoding, level));
+                    result.putString(ResponseEncoding.ENCODING_KEY, encoding);
+                    if (extras != null && extras.getBoolean(STATS_RESET_KEY)) stats.Reset();
                     break;
             }
         }
         catch (ContentNotSupportedException ex) {
             Log.i(TAG, method + " is not supported by this provider. Returning an empty bundle.");
+            outcome = CallStats.Outcome.NOT_SUPPORTED;
         }
         catch (EnumConstantNotPresentException ex) {
             String exceptionMessage = method + " is not a valid content method. The valid methods are [" + LEGAL_DLC_TYPES + "]";
             Log.e(TAG, exceptionMessage);
             result.putString(DlcType.EXCEPTION.Tag(), exceptionMessage);
+            outcome = CallStats.Outcome.ERROR;
         }
         catch (ParseException ex) {
             Log.e(TAG, "Failed to parse " + method, ex);
             result.putString(DlcType.EXCEPTION.Tag(), ex.getMessage());
+            outcome = CallStats.Outcome.ERROR;
         }
         catch (IOException ex) {
             Log.e(TAG, "Error reading content", ex);
             result.putString(DlcType.EXCEPTION.Tag(), ex.getMessage());
+            outcome = CallStats.Outcome.ERROR;
         }
         catch (Exception ex) {
             Log.e(TAG, "Unexpected exception", ex);
             result.putString(DlcType.EXCEPTION.Tag(), ex.getMessage());
+            outcome = CallStats.Outcome.ERROR;
+        }
+        finally {
+            if (outcome == CallStats.Outcome.CONTENT && result.getBoolean(NOT_MODIFIED_KEY)) {
+                outcome = CallStats.Outcome.NOT_MODIFIED;
+            }
+            Object payload = result.get(method);
+            stats.EndCall(method, startNanos, outcome, payload instanceof byte[] ? ((byte[]) payload).length : 0);
         }
         return result;
     }
@@ -142,6 +970,68 @@ public abstract class ContentProviderBase extends ContentProvider {
         return "application/ca.isupeene.charactersheet";
     }
 
+    /**
+     * Opens an image file for reading, without copying it through a {@link #call call}.
+     * @param uri
+     * A uri built by {@link ImageDelivery#ImageUri ImageDelivery.ImageUri}.
+     * @param mode
+     * Must be "r".
+     * @return
+     * A descriptor for the image file, or for the variant that best matches the size in the uri.
+     * Images in a {@link #ContainerAssetPath container} are returned as a section of the container asset.
+     * @throws FileNotFoundException
+     * If the uri doesn't name an image in this content pack, or the mode isn't "r".
+     */
+    @Nullable
+    @Override
+    public AssetFileDescriptor openAssetFile(@NonNull Uri uri, @NonNull String mode) throws FileNotFoundException {
+        List<String> segments = uri.getPathSegments();
+        if (!mode.equals("r") || segments.size() < 2 || !segments.get(0).equals(DlcType.IMAGE.Tag())) {
+            throw new FileNotFoundException("Only images can be opened, for reading: " + uri);
+        }
+        Log.i(TAG, "Received open for " + uri);
+        try {
+            String imagePath = ResolveImagePath(TextUtils.join("/", segments.subList(1, segments.size())), ImageDelivery.RequestedSize(uri));
+            File devFile = FindDevAsset(imagePath);
+            if (devFile != null) {
+                return new AssetFileDescriptor(ParcelFileDescriptor.open(devFile, ParcelFileDescriptor.MODE_READ_ONLY), 0, devFile.length());
+            }
+            DlcContainer container = GetContainer();
+            DlcContainer.Entry entry = container == null ? null : container.Find(DlcContainer.Kind.IMAGE, imagePath);
+            if (entry != null) {
+                AssetFileDescriptor containerDescriptor = getContext().getAssets().openFd(Objects.requireNonNull(ContainerAssetPath()));
+                return new AssetFileDescriptor(containerDescriptor.getParcelFileDescriptor(),
+                        containerDescriptor.getStartOffset() + entry.Offset(), entry.Length());
+            }
+            try {
+                return getContext().getAssets().openFd(imagePath);
+            }
+            catch (FileNotFoundException ex) {
+                // Compressed assets can't be opened as a descriptor, so stream them through a pipe instead.
+                byte[] data = ReadImageBytes(imagePath);
+                ParcelFileDescriptor pipe = openPipeHelper(uri, null, null, data, (output, pipeUri, mimeType, opts, bytes) -> {
+                    try {
+                        // The helper closes the descriptor once this returns.
+                        new FileOutputStream(output.getFileDescriptor()).write(bytes);
+                    }
+                    catch (IOException writeException) {
+                        Log.w(TAG, "The reader closed " + pipeUri + " early", writeException);
+                    }
+                });
+                return new AssetFileDescriptor(pipe, 0, AssetFileDescriptor.UNKNOWN_LENGTH);
+            }
+        }
+        catch (FileNotFoundException ex) {
+            throw ex;
+        }
+        catch (IOException | IllegalArgumentException ex) {
+            Log.e(TAG, "Error opening " + uri, ex);
+            FileNotFoundException notFound = new FileNotFoundException(ex.getMessage());
+            notFound.initCause(ex);
+            throw notFound;
+        }
+    }
+
     //region Required Overrides - Unused
     @Override
     public boolean onCreate() {
@@ -0,0 +1,206 @@
+package ca.isupeene.charactersheet.cdk;
+
+import androidx.annotation.NonNull;
+import androidx.annotation.Nullable;
+
+import java.io.File;
+import java.io.FileInputStream;
+import java.io.FileNotFoundException;
+import java.io.IOException;
+import java.util.ArrayList;
+import java.util.Arrays;
+import java.util.HashMap;
+import java.util.List;
+import java.util.Map;
+
+import ca.isupeene.charactersheet.cdk.Model.InfoPage;
+import ca.isupeene.charactersheet.cdk.Model.MultiPageInfo;
+
+/**
+ * A local copy of a content pack's sources, served in place of the packaged content while it's being
+ * edited. The directory mirrors the project: text protos under res/raw, and info and images under assets.
+ * Paths that lead outside the directory are rejected with a FileNotFoundException.
+ *
+ * Each file is tracked by its modification time and size, and only read again when either changes.
+ * A file that's read again is only reparsed if its SHA-256 hash changed, so saving a file without
+ * editing it costs a read, and files that haven't been touched cost a stat.
+ */
+final class DevDirectory {
+    static final String RAW_DIRECTORY = "res/raw/";
+    static final String ASSETS_DIRECTORY = "assets/";
+
+    private static final class TrackedFile {
+        private long lastModified;
+        private long length;
+        // The hash of the file's current content.
+        private String hash;
+        // The file's content, if it has been read but not yet loaded.
+        private byte[] data;
+        // The value loaded from the file, and the hash of the content it was loaded from.
+        private Object value;
+        private String valueHash;
+    }
+
+    private final File root;
+    private final String rootPrefix;
+    private final Map<String, TrackedFile> trackedFiles = new HashMap<>();
+
+    DevDirectory(@NonNull File root) throws IOException {
+        this.root = root.getCanonicalFile();
+        this.rootPrefix = this.root.getPath() + File.separator;
+    }
+
+    // Resolves a path relative to the directory. Paths come from callers of the provider, so any that
+    // lead outside the directory, e.g. through "..", are rejected.
+    private File Resolve(String path) throws IOException {
+        File file = new File(root, path).getCanonicalFile();
+        if (!file.equals(root) && !file.getPath().startsWith(rootPrefix)) {
+            throw new FileNotFoundException(path + " is outside the development directory");
+        }
+        return file;
+    }
+
+    /**
+     * @return
+     * True if there's a file or directory at the path, relative to the directory.
+     */
+    boolean Contains(@NonNull String path) throws IOException {
+        return Resolve(path).exists();
+    }
+
+    /**
+     * @return
+     * The file at the path, relative to the directory, or null if there isn't one.
+     */
+    @Nullable File Find(@NonNull String path) throws IOException {
+        File file = Resolve(path);
+        return file.isFile() ? file : null;
+    }
+
+    // Brings the file's hash up to date, or returns null if the file doesn't exist. The file is read and
+    // hashed without holding the lock, so that several files can be refreshed at once.
+    private @Nullable TrackedFile Refresh(String path) throws IOException {
+        File file = Find(path);
+        if (file == null) {
+            synchronized (this) {
+                trackedFiles.remove(path);
+            }
+            return null;
+        }
+        long lastModified = file.lastModified();
+        long length = file.length();
+        TrackedFile tracked;
+        synchronized (this) {
+            tracked = trackedFiles.get(path);
+            if (tracked == null) {
+                tracked = new TrackedFile();
+                trackedFiles.put(path, tracked);
+            }
+            if (tracked.hash != null && lastModified == tracked.lastModified && length == tracked.length) {
+                return tracked;
+            }
+        }
+        byte[] data = Utils.ReadAllBytes(new FileInputStream(file));
+        String hash = ContentProviderBase.ToHex(ContentProviderBase.NewSha256().digest(data));
+        synchronized (this) {
+            // If another thread refreshed the file meanwhile, the last to finish wins. Either way the
+            // recorded time and size match the hash, so a stale result is caught by the next refresh.
+            tracked.hash = hash;
+            tracked.data = hash.equals(tracked.valueHash) ? null : data;
+            tracked.lastModified = lastModified;
+            tracked.length = length;
+        }
+        return tracked;
+    }
+
+    /**
+     * @return
+     * The SHA-256 hash of the file at the path, as a hex string, or null if there isn't one.
+     */
+    @Nullable String Hash(@NonNull String path) throws IOException {
+        TrackedFile tracked = Refresh(path);
+        if (tracked == null) return null;
+        synchronized (this) {
+            return tracked.hash;
+        }
+    }
+
+    /**
+     * @param loader
+     * Parses the file's content. It's only called when the content has changed since the value was last loaded,
+     * and not while holding a lock, so that several files can be parsed at once.
+     * @return
+     * The value loaded from the file at the path, or null if there isn't one.
+     */
+    @SuppressWarnings("unchecked")
+    @Nullable <T> T Load(@NonNull String path, @NonNull FunctionX<byte[], T, IOException> loader) throws IOException {
+        TrackedFile tracked = Refresh(path);
+        if (tracked == null) return null;
+        String hash;
+        byte[] data;
+        synchronized (this) {
+            if (tracked.hash.equals(tracked.valueHash)) return (T) tracked.value;
+            hash = tracked.hash;
+            data = tracked.data;
+        }
+        if (data == null) {
+            data = Utils.ReadAllBytes(new FileInputStream(Resolve(path)));
+        }
+        T value = loader.apply(data);
+        synchronized (this) {
+            // Unless the file changed again while it was being parsed.
+            if (hash.equals(tracked.hash)) {
+                tracked.value = value;
+                tracked.valueHash = hash;
+                tracked.data = null;
+            }
+        }
+        return value;
+    }
+
+    /**
+     * @return
+     * The names of the files in the directory at the path, sorted as AssetManager.list sorts them,
+     * or an empty array if there's no such directory.
+     */
+    @NonNull String[] List(@NonNull String path) throws IOException {
+        String[] filenames = Resolve(path).list();
+        if (filenames == null) return new String[0];
+        Arrays.sort(filenames);
+        return filenames;
+    }
+
+    /**
+     * Reads an info directory the way {@link Utils#GetMultiPageInfoFromAssets Utils.GetMultiPageInfoFromAssets} does.
+     * Info pages are small, so they're read on every call rather than tracked.
+     * @return
+     * The info directory at the content path, under assets, or null if there isn't one.
+     */
+    @Nullable MultiPageInfo ReadInfo(@NonNull String contentPath) throws IOException {
+        File directory = Resolve(ASSETS_DIRECTORY + contentPath);
+        if (!directory.isDirectory()) return null;
+        MultiPageInfo.Builder info = MultiPageInfo.newBuilder();
+        for (String filename : List(ASSETS_DIRECTORY + contentPath)) {
+            if (!Utils.IsInfoPage(filename)) continue;
+            info.addPage(InfoPage.newBuilder()
+                    .setTitle(filename.split("\\.")[1])
+                    .setContent(Utils.ReadAll(new FileInputStream(new File(directory, filename)))));
+        }
+        return info.build();
+    }
+
+    /**
+     * @return
+     * The content paths of the images in the directory, a content path under assets.
+     */
+    @NonNull List<String> ListImages(@NonNull String directory) throws IOException {
+        String prefix = directory.isEmpty() ? "" : directory + '/';
+        List<String> listing = new ArrayList<>();
+        for (String filename : List(ASSETS_DIRECTORY + directory)) {
+            if (Resolve(ASSETS_DIRECTORY + prefix + filename).isFile()) {
+                listing.add(prefix + filename);
+            }
+        }
+        return listing;
+    }
+}
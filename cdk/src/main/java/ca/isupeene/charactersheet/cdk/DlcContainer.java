@@ -0,0 +1,259 @@
+package ca.isupeene.charactersheet.cdk;
+
+import android.content.res.AssetFileDescriptor;
+
+import androidx.annotation.NonNull;
+import androidx.annotation.Nullable;
+
+import java.io.FileInputStream;
+import java.io.IOException;
+import java.io.InputStream;
+import java.nio.ByteBuffer;
+import java.nio.channels.FileChannel;
+import java.nio.charset.StandardCharsets;
+import java.util.ArrayList;
+import java.util.Collections;
+import java.util.EnumMap;
+import java.util.HashMap;
+import java.util.List;
+import java.util.Map;
+
+/**
+ * A read-only view of a packed content container, as produced by the pack-container.py build tool.
+ *
+ * The container is a single uncompressed asset holding all of a content pack's
+ * {@link DlcType DlcTypes}, info directories and images. It is memory-mapped once, and each
+ * entry is served as a slice of the mapping, so no per-entry files need to be opened or listed.
+ *
+ * The layout is big-endian:
+ * <p><ul>
+ * <li>Header: the magic bytes "CSDC", a u16 format version, a u16 reserved field and a u32 entry count.
+ * <li>Table of contents: for each entry, a u8 {@link Kind}, a u8 {@link Encoding}, a u16 key length,
+ * the UTF-8 key, a u64 offset from the start of the container, a u64 length and a 32 byte SHA-256 hash of the payload.
+ * <li>Payloads, in any order.
+ * </ul><p>
+ *
+ * The asset must be stored uncompressed in the APK, e.g. with
+ * <code>aaptOptions { noCompress 'dlc' }</code> in your build.gradle.
+ */
+public class DlcContainer {
+    private static final int MAGIC = 0x43534443;  // "CSDC"
+    private static final int VERSION = 1;
+    private static final int HASH_LENGTH = 32;
+
+    /**
+     * The type of content held by an {@link Entry}.
+     */
+    public enum Kind {
+        /**
+         * A {@link DlcType} resource, keyed by its {@link DlcType#Tag Tag}.
+         */
+        DLC_TYPE,
+        /**
+         * A {@link Model.MultiPageInfo MultiPageInfo}, keyed by the content path of its {@link Model.InfoSource InfoSource}.
+         */
+        INFO,
+        /**
+         * An encoded image file, keyed by the content path of its {@link Model.ImageSource ImageSource}.
+         */
+        IMAGE
+    }
+
+    /**
+     * The format of an {@link Entry Entry's} payload.
+     */
+    public enum Encoding {
+        /**
+         * A text-format proto, which must be parsed with the {@link Parser}.
+         */
+        TEXT,
+        /**
+         * A serialized proto or image file, which can be used as-is.
+         */
+        BINARY
+    }
+
+    /**
+     * A single table of contents entry.
+     */
+    public static class Entry {
+        private final Kind kind;
+        private final Encoding encoding;
+        private final String key;
+        private final int offset;
+        private final int length;
+        private final byte[] hash;
+
+        Entry(Kind kind, Encoding encoding, String key, int offset, int length, byte[] hash) {
+            this.kind = kind;
+            this.encoding = encoding;
+            this.key = key;
+            this.offset = offset;
+            this.length = length;
+            this.hash = hash;
+        }
+
+        public @NonNull Kind Kind() { return kind; }
+        public @NonNull Encoding Encoding() { return encoding; }
+        public @NonNull String Key() { return key; }
+        /**
+         * @return
+         * The offset of the payload from the start of the container.
+         */
+        public int Offset() { return offset; }
+        public int Length() { return length; }
+        /**
+         * @return
+         * The SHA-256 hash of the payload, computed when the container was built.
+         */
+        public @NonNull byte[] Hash() { return hash.clone(); }
+    }
+
+    private final ByteBuffer buffer;
+    private final Map<Kind, Map<String, Entry>> entries = new EnumMap<>(Kind.class);
+
+    private DlcContainer(ByteBuffer buffer) throws IOException {
+        this.buffer = buffer;
+        for (Kind kind : Kind.values()) {
+            entries.put(kind, new HashMap<>());
+        }
+        ReadTableOfContents();
+    }
+
+    /**
+     * Memory-map a container. The descriptor may be closed once this returns.
+     * @param fileDescriptor
+     * A descriptor for the container asset, as returned by {@link android.content.res.AssetManager#openFd AssetManager.openFd}.
+     * @return
+     * A container backed by the mapped asset.
+     * @throws IOException
+     * If the asset can't be mapped, or is not a valid container.
+     */
+    public static @NonNull DlcContainer Open(@NonNull AssetFileDescriptor fileDescriptor) throws IOException {
+        try (FileInputStream stream = new FileInputStream(fileDescriptor.getFileDescriptor());
+             FileChannel channel = stream.getChannel()) {
+            return new DlcContainer(channel.map(FileChannel.MapMode.READ_ONLY, fileDescriptor.getStartOffset(), fileDescriptor.getLength()));
+        }
+    }
+
+    /**
+     * Wrap a container that is already in memory.
+     * @param buffer
+     * The container's contents.
+     * @return
+     * A container backed by the buffer.
+     * @throws IOException
+     * If the buffer is not a valid container.
+     */
+    public static @NonNull DlcContainer Wrap(@NonNull ByteBuffer buffer) throws IOException {
+        return new DlcContainer(buffer.slice());
+    }
+
+    private void ReadTableOfContents() throws IOException {
+        ByteBuffer header = buffer.duplicate();
+        try {
+            if (header.getInt() != MAGIC) throw new IOException("Not a content container.");
+            int version = header.getShort() & 0xFFFF;
+            if (version != VERSION) throw new IOException("Unsupported content container version " + version);
+            header.getShort();  // Reserved
+            int entryCount = header.getInt();
+            for (int i = 0; i < entryCount; ++i) {
+                Kind kind = Kind.values()[header.get()];
+                Encoding encoding = Encoding.values()[header.get()];
+                byte[] keyBytes = new byte[header.getShort() & 0xFFFF];
+                header.get(keyBytes);
+                long offset = header.getLong();
+                long length = header.getLong();
+                byte[] hash = new byte[HASH_LENGTH];
+                header.get(hash);
+                if (offset < 0 || length < 0 || offset + length > buffer.capacity()) {
+                    throw new IOException("Content container entry " + i + " is out of bounds.");
+                }
+                String key = new String(keyBytes, StandardCharsets.UTF_8);
+                entries.get(kind).put(key, new Entry(kind, encoding, key, (int)offset, (int)length, hash));
+            }
+        }
+        catch (RuntimeException ex) {
+            throw new IOException("The content container's table of contents is corrupt.", ex);
+        }
+    }
+
+    /**
+     * @return
+     * The entry with the specified kind and key, or null if the container doesn't hold one.
+     */
+    public @Nullable Entry Find(@NonNull Kind kind, @NonNull String key) {
+        return entries.get(kind).get(key);
+    }
+
+    /**
+     * @return
+     * All entries of the specified kind, in no particular order.
+     */
+    public @NonNull List<Entry> Entries(@NonNull Kind kind) {
+        return Collections.unmodifiableList(new ArrayList<>(entries.get(kind).values()));
+    }
+
+    /**
+     * @return
+     * A read-only view of the entry's payload. No data is copied.
+     */
+    public @NonNull ByteBuffer Slice(@NonNull Entry entry) {
+        ByteBuffer slice = buffer.asReadOnlyBuffer();
+        slice.position(entry.offset);
+        slice.limit(entry.offset + entry.length);
+        return slice.slice();
+    }
+
+    /**
+     * @return
+     * A stream over the entry's payload. No data is copied.
+     */
+    public @NonNull InputStream OpenStream(@NonNull Entry entry) {
+        return new ByteBufferInputStream(Slice(entry));
+    }
+
+    /**
+     * @return
+     * A copy of the entry's payload.
+     */
+    public @NonNull byte[] ReadBytes(@NonNull Entry entry) {
+        byte[] result = new byte[entry.length];
+        Slice(entry).get(result);
+        return result;
+    }
+
+    private static class ByteBufferInputStream extends InputStream {
+        private final ByteBuffer buffer;
+
+        ByteBufferInputStream(ByteBuffer buffer) {
+            this.buffer = buffer;
+        }
+
+        @Override
+        public int read() {
+            return buffer.hasRemaining() ? buffer.get() & 0xFF : -1;
+        }
+
+        @Override
+        public int read(@NonNull byte[] bytes, int offset, int length) {
+            if (length == 0) return 0;
+            if (!buffer.hasRemaining()) return -1;
+            int count = Math.min(length, buffer.remaining());
+            buffer.get(bytes, offset, count);
+            return count;
+        }
+
+        @Override
+        public long skip(long n) {
+            int count = (int)Math.max(0, Math.min(n, buffer.remaining()));
+            buffer.position(buffer.position() + count);
+            return count;
+        }
+
+        @Override
+        public int available() {
+            return buffer.remaining();
+        }
+    }
+}
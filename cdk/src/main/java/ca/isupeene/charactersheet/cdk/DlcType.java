@@ -21,49 +21,76 @@ import java.util.Map;
  *
  * For types other than INFO and ICON, the associated parse function is provided for convenience.
  *
+ * MANIFEST is not content in itself, but summarizes the rest of a pack's content so that the app can
+ * tell when its cached copy of some content is out of date. BATCH requests several other types in one call.
+ * SEARCH finds the info pages matching a text query, and QUERY finds the spells or items matching a structured query.
+ * STATS reports how the provider has been performing.
+ *
  * EXCEPTION is also included to specify the Bundle key that's used to pass an error back to the app.
  */
 public enum DlcType {
     /**
      * "backgrounds" - Indicates that the requested / returned value is a {@link Model.BackgroundList BackgroundList}
      */
-    BACKGROUND("backgrounds", Parser::ParseBackgroundList),
+    BACKGROUND("backgrounds", Parser::ParseBackgroundListParallel),
     /**
      * "class_spells" - Indicates that the requested / returned value is a {@link Model.ClassSpellsList ClassSpellsList}
      */
-    CLASS_SPELLS("class_spells", Parser::ParseClassSpellsList),
+    CLASS_SPELLS("class_spells", Parser::ParseClassSpellsListParallel),
     /**
      * "classes" - Indicates that the requested / returned value is a {@link Model.ClassList ClassList}
      */
-    CLASS("classes", Parser::ParseClassList),
+    CLASS("classes", Parser::ParseClassListParallel),
     /**
      * "feats" - Indicates that the requested / returned value is a {@link Model.FeatList FeatList}
      */
-    FEAT("feats", Parser::ParseFeatList),
+    FEAT("feats", Parser::ParseFeatListParallel),
     /**
      * "items" - Indicates that the requested / returned value is a {@link Model.ItemList ItemList}
      */
-    ITEM("items", Parser::ParseItemList),
+    ITEM("items", Parser::ParseItemListParallel),
     /**
      * "races" - Indicates that the requested / returned value is a {@link Model.RaceList RaceList}
      */
-    RACE("races", Parser::ParseRaceList),
+    RACE("races", Parser::ParseRaceListParallel),
     /**
      * "races" - Indicates that the requested / returned value is a {@link Model.SpellList SpellList}
      */
-    SPELL("spells", Parser::ParseSpellList),
+    SPELL("spells", Parser::ParseSpellListParallel),
     /**
      * "talents" - Indicates that the requested / returned value is a {@link Model.TalentList TalentList}
      */
-    TALENT("talents", Parser::ParseTalentList),
+    TALENT("talents", Parser::ParseTalentListParallel),
     /**
      * "info" - Indicates that the requested / returned value is a {@link Model.MultiPageInfo MultiPageInfo}
      */
     INFO("info", null),
     /**
-     * "image" - Indicates that the requested / returned value is a {@link android.graphics.Bitmap Bitmap}
+     * "image" - Indicates that the requested / returned value is a {@link android.graphics.Bitmap Bitmap},
+     * or the image file's bytes if requested through {@link ImageDelivery}
      */
     IMAGE("image", null),
+    /**
+     * "manifest" - Indicates that the requested / returned value is a {@link Model.ContentManifest ContentManifest}
+     */
+    MANIFEST("manifest", Parser::ParseContentManifest),
+    /**
+     * "batch" - Indicates that the returned value is a {@link android.os.Bundle Bundle} of results for several other DlcTypes, keyed by tag.
+     */
+    BATCH("batch", null),
+    /**
+     * "search" - Indicates that the returned value is a {@link Model.SearchResults SearchResults} listing the info pages matching a query.
+     */
+    SEARCH("search", Parser::ParseSearchResults),
+    /**
+     * "query" - Indicates that the returned value is a {@link Model.SpellList SpellList} or {@link Model.ItemList ItemList}
+     * holding the elements that match a {@link Model.Query Query}.
+     */
+    QUERY("query", null),
+    /**
+     * "stats" - Indicates that the returned value is a {@link Model.ProviderStats ProviderStats} summarizing the calls the provider has served.
+     */
+    STATS("stats", Parser::ParseProviderStats),
     /**
      * "exception" - Indicates that the returned value is an error message String.
      */
@@ -79,7 +106,8 @@ public enum DlcType {
     private final FunctionX<InputStream, MessageLite.Builder, IOException> parser;
     /**
      * @return
-     * The parser associated with this DlcType, or null for INFO, IMAGE, and EXCEPTION.
+     * The parser associated with this DlcType, or null for INFO, IMAGE, BATCH, QUERY, and EXCEPTION.
+     * Large content lists are parsed on several threads.
      */
     public FunctionX<InputStream, MessageLite.Builder, IOException> Parser() { return parser; }
 
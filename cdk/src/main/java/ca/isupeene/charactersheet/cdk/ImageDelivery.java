@@ -0,0 +1,219 @@
+package ca.isupeene.charactersheet.cdk;
+
+import android.content.ContentResolver;
+import android.graphics.Bitmap;
+import android.graphics.BitmapFactory;
+import android.net.Uri;
+import android.os.Bundle;
+
+import androidx.annotation.NonNull;
+import androidx.annotation.Nullable;
+
+import java.io.IOException;
+import java.util.Collection;
+import java.util.regex.Matcher;
+import java.util.regex.Pattern;
+
+/**
+ * Functions for choosing how images are delivered by {@link ContentProviderBase}.
+ *
+ * By default, an "image" call decodes the whole image and returns it as a parcelled {@link Bitmap},
+ * which is usually many times larger than the image file. Pass the Bundle returned by
+ * {@link #RequestExtras RequestExtras} as the extras of the call to receive the encoded file
+ * instead, and decode it at the size you'll display it with {@link #DecodeBitmap DecodeBitmap}.
+ * To avoid copying the file through the call at all, open the {@link #ImageUri ImageUri} with
+ * {@link ContentResolver#openAssetFileDescriptor ContentResolver.openAssetFileDescriptor}.
+ *
+ * Content packs may include downscaled variants of their images, generated by the image-variants.py
+ * build tool. A variant of "images/dragon.png" whose longest side is 256 pixels is named
+ * "images/dragon@256.png". When a size is requested, the provider serves the smallest variant
+ * that is at least that size, or the original image if there is none.
+ */
+public abstract class ImageDelivery {
+    /**
+     * The extras key for the requested delivery mode, and the result key for the mode that was used.
+     */
+    public static final String MODE_KEY = "image_mode";
+    /**
+     * The extras key for the size, in pixels along the longest side, at which the image will be displayed.
+     */
+    public static final String SIZE_KEY = "image_size";
+    /**
+     * The result key for the content path of the image that was served, which is a variant's path if a variant was chosen.
+     */
+    public static final String SERVED_PATH_KEY = "image_path";
+    /**
+     * The query parameter of an {@link #ImageUri ImageUri} holding the requested size.
+     */
+    public static final String SIZE_PARAMETER = "size";
+
+    /**
+     * The image is returned as a parcelled {@link Bitmap}.
+     */
+    public static final String BITMAP = "bitmap";
+    /**
+     * The image is returned as the byte[] contents of the image file.
+     */
+    public static final String BYTES = "bytes";
+
+    /**
+     * Any size is acceptable, so the original image is served.
+     */
+    public static final int ORIGINAL_SIZE = 0;
+
+    private static final Pattern VARIANT_PATTERN = Pattern.compile("(.*)@(\\d+)(\\.[^./]*)?");
+
+    /**
+     * @param mode
+     * {@link #BITMAP} or {@link #BYTES}.
+     * @param size
+     * The size, in pixels along the longest side, at which the image will be displayed, or {@link #ORIGINAL_SIZE}.
+     * @return
+     * Extras requesting the specified delivery, to pass to {@link ContentProviderBase#call ContentProviderBase.call}.
+     */
+    public static @NonNull Bundle RequestExtras(@NonNull String mode, int size) {
+        Bundle extras = new Bundle();
+        extras.putString(MODE_KEY, mode);
+        extras.putInt(SIZE_KEY, size);
+        return extras;
+    }
+
+    /**
+     * @param authority
+     * The authority of the content pack's provider.
+     * @param contentPath
+     * The content path specified in the {@link Model.ImageSource ImageSource}.
+     * @param size
+     * The size, in pixels along the longest side, at which the image will be displayed, or {@link #ORIGINAL_SIZE}.
+     * @return
+     * A uri that can be opened with {@link ContentResolver#openAssetFileDescriptor ContentResolver.openAssetFileDescriptor}
+     * to read the image file.
+     */
+    public static @NonNull Uri ImageUri(@NonNull String authority, @NonNull String contentPath, int size) {
+        Uri.Builder builder = new Uri.Builder()
+                .scheme(ContentResolver.SCHEME_CONTENT)
+                .authority(authority)
+                .appendPath(DlcType.IMAGE.Tag());
+        for (String segment : contentPath.split("/")) {
+            builder.appendPath(segment);
+        }
+        if (size != ORIGINAL_SIZE) {
+            builder.appendQueryParameter(SIZE_PARAMETER, Integer.toString(size));
+        }
+        return builder.build();
+    }
+
+    /**
+     * @return
+     * The content path of the variant of an image with the specified size, following the naming convention
+     * used by image-variants.py, e.g. "images/dragon@256.png" for "images/dragon.png".
+     */
+    public static @NonNull String VariantPath(@NonNull String contentPath, int size) {
+        int extensionStart = ExtensionStart(contentPath);
+        return contentPath.substring(0, extensionStart) + '@' + size + contentPath.substring(extensionStart);
+    }
+
+    private static int ExtensionStart(String contentPath) {
+        int extensionStart = contentPath.lastIndexOf('.');
+        return extensionStart > contentPath.lastIndexOf('/') ? extensionStart : contentPath.length();
+    }
+
+    static @NonNull String RequestedMode(@Nullable Bundle extras) {
+        String mode = extras == null ? null : extras.getString(MODE_KEY);
+        if (mode == null) return BITMAP;
+        if (mode.equals(BITMAP) || mode.equals(BYTES)) return mode;
+        throw new IllegalArgumentException(mode + " is not a valid image mode. The valid modes are [" + BITMAP + ", " + BYTES + "]");
+    }
+
+    static int RequestedSize(@Nullable Bundle extras) {
+        int size = extras == null ? ORIGINAL_SIZE : extras.getInt(SIZE_KEY, ORIGINAL_SIZE);
+        if (size < 0) throw new IllegalArgumentException(size + " is not a valid image size.");
+        return size;
+    }
+
+    static int RequestedSize(@NonNull Uri uri) {
+        String size = uri.getQueryParameter(SIZE_PARAMETER);
+        try {
+            return size == null ? ORIGINAL_SIZE : Math.max(ORIGINAL_SIZE, Integer.parseInt(size));
+        }
+        catch (NumberFormatException ex) {
+            throw new IllegalArgumentException(size + " is not a valid image size.");
+        }
+    }
+
+    /**
+     * @param contentPath
+     * The content path of the original image.
+     * @param candidatePaths
+     * Content paths that may include variants of the image. Paths that aren't variants of it are ignored.
+     * @param size
+     * The requested size, or {@link #ORIGINAL_SIZE}.
+     * @return
+     * The path of the smallest variant at least as large as the requested size,
+     * or the original content path if there is no such variant.
+     */
+    static @NonNull String ChooseVariant(@NonNull String contentPath, @NonNull Collection<String> candidatePaths, int size) {
+        if (size == ORIGINAL_SIZE) return contentPath;
+
+        String stem = contentPath.substring(0, ExtensionStart(contentPath));
+        String extension = contentPath.substring(stem.length());
+        String best = contentPath;
+        int bestSize = Integer.MAX_VALUE;
+        for (String candidate : candidatePaths) {
+            Matcher matcher = VARIANT_PATTERN.matcher(candidate);
+            if (!matcher.matches() || !matcher.group(1).equals(stem)) continue;
+            if (!extension.equals(matcher.group(3) == null ? "" : matcher.group(3))) continue;
+
+            int candidateSize;
+            try {
+                candidateSize = Integer.parseInt(matcher.group(2));
+            }
+            catch (NumberFormatException ex) {
+                continue;
+            }
+            if (candidateSize >= size && candidateSize < bestSize) {
+                best = candidate;
+                bestSize = candidateSize;
+            }
+        }
+        return best;
+    }
+
+    /**
+     * Get the image from a result returned by an "image" call to {@link ContentProviderBase#call ContentProviderBase.call},
+     * whichever mode it was delivered in.
+     * @param result
+     * The Bundle returned by the provider.
+     * @param maxSize
+     * For {@link #BYTES} results, the image is subsampled by a power of two while its longest side is
+     * at least twice this size, to save memory. Pass {@link #ORIGINAL_SIZE} to decode it at full size.
+     * @return
+     * The image, or null if the result doesn't hold one.
+     * @throws IOException
+     * If the result holds an image file that can't be decoded.
+     */
+    public static @Nullable Bitmap DecodeBitmap(@NonNull Bundle result, int maxSize) throws IOException {
+        String method = DlcType.IMAGE.Tag();
+        if (!result.getString(MODE_KEY, BITMAP).equals(BYTES)) {
+            return result.getParcelable(method);
+        }
+
+        byte[] data = result.getByteArray(method);
+        if (data == null) return null;
+
+        BitmapFactory.Options options = new BitmapFactory.Options();
+        if (maxSize != ORIGINAL_SIZE) {
+            options.inJustDecodeBounds = true;
+            BitmapFactory.decodeByteArray(data, 0, data.length, options);
+            int longestSide = Math.max(options.outWidth, options.outHeight);
+            options.inJustDecodeBounds = false;
+            options.inSampleSize = 1;
+            while (longestSide / (options.inSampleSize * 2) >= maxSize) {
+                options.inSampleSize *= 2;
+            }
+        }
+        Bitmap bitmap = BitmapFactory.decodeByteArray(data, 0, data.length, options);
+        if (bitmap == null) throw new IOException("The image could not be decoded.");
+        return bitmap;
+    }
+}
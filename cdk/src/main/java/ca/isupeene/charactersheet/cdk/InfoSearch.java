@@ -0,0 +1,211 @@
+package ca.isupeene.charactersheet.cdk;
+
+import androidx.annotation.NonNull;
+
+import java.util.ArrayList;
+import java.util.Arrays;
+import java.util.Collections;
+import java.util.LinkedHashSet;
+import java.util.List;
+import java.util.Locale;
+import java.util.Set;
+import java.util.regex.Matcher;
+import java.util.regex.Pattern;
+
+import ca.isupeene.charactersheet.cdk.Model.SearchIndex;
+
+/**
+ * Answers queries against a {@link SearchIndex SearchIndex} built by search-index.py.
+ *
+ * Queries are split into terms the same way the pages were when the index was built. Pages are ranked
+ * first by how many of the query's terms they contain, then by their BM25 score. The last term of a
+ * query also matches any indexed term it's a prefix of, so results can be shown as the user types.
+ */
+final class InfoSearch {
+    // Must match TERM_PATTERN in search-index.py.
+    private static final Pattern TERM_PATTERN = Pattern.compile("[\\p{L}\\p{N}]+");
+    // BM25 parameters, at their customary values.
+    private static final double K1 = 1.2;
+    private static final double B = 0.75;
+    // The most indexed terms a prefix may expand to, so that one-letter prefixes stay fast.
+    private static final int MAX_PREFIX_EXPANSIONS = 64;
+    private static final int SNIPPET_BEFORE = 60;
+    private static final int SNIPPET_AFTER = 140;
+
+    /**
+     * A page matching a query.
+     */
+    static final class Match {
+        final int page;
+        final int matchedTerms;
+        final double score;
+        // The offset of the first occurrence of a matched term in the page's content.
+        final int firstOffset;
+
+        Match(int page, int matchedTerms, double score, int firstOffset) {
+            this.page = page;
+            this.matchedTerms = matchedTerms;
+            this.score = score;
+            this.firstOffset = firstOffset;
+        }
+    }
+
+    private final SearchIndex index;
+    private final double averageTermCount;
+
+    InfoSearch(@NonNull SearchIndex index) {
+        this.index = index;
+        long totalTermCount = 0;
+        for (SearchIndex.Page page : index.getPageList()) {
+            totalTermCount += page.getTermCount();
+        }
+        averageTermCount = index.getPageCount() == 0 ? 1 : Math.max(1.0, (double)totalTermCount / index.getPageCount());
+    }
+
+    @NonNull SearchIndex.Page Page(int page) {
+        return index.getPage(page);
+    }
+
+    static @NonNull List<String> Terms(@NonNull String text) {
+        List<String> terms = new ArrayList<>();
+        Matcher matcher = TERM_PATTERN.matcher(text);
+        while (matcher.find()) {
+            terms.add(matcher.group().toLowerCase(Locale.ROOT));
+        }
+        return terms;
+    }
+
+    /**
+     * @param query
+     * The text to search for.
+     * @param limit
+     * The maximum number of matches to return.
+     * @return
+     * The best matching pages, best first.
+     */
+    @NonNull List<Match> Search(@NonNull String query, int limit) {
+        List<String> terms = Terms(query);
+        if (terms.isEmpty() || limit <= 0) return Collections.emptyList();
+        Set<String> queryTerms = new LinkedHashSet<>(terms);
+        // Only complete the last term if the user might still be typing it.
+        String prefixTerm = Character.isLetterOrDigit(query.charAt(query.length() - 1)) ? terms.get(terms.size() - 1) : null;
+
+        int pageCount = index.getPageCount();
+        double[] scores = new double[pageCount];
+        int[] matchedTerms = new int[pageCount];
+        int[] firstOffsets = new int[pageCount];
+        Arrays.fill(firstOffsets, Integer.MAX_VALUE);
+        double[] termScores = new double[pageCount];
+
+        for (String queryTerm : queryTerms) {
+            Arrays.fill(termScores, 0);
+            for (int term : FindTerms(queryTerm, queryTerm.equals(prefixTerm))) {
+                ScoreTerm(index.getTerm(term), termScores, firstOffsets);
+            }
+            // A page containing several completions of a prefix only counts the best of them.
+            for (int page = 0; page < pageCount; ++page) {
+                if (termScores[page] > 0) {
+                    scores[page] += termScores[page];
+                    matchedTerms[page]++;
+                }
+            }
+        }
+
+        List<Match> matches = new ArrayList<>();
+        for (int page = 0; page < pageCount; ++page) {
+            if (matchedTerms[page] > 0) {
+                matches.add(new Match(page, matchedTerms[page], scores[page], firstOffsets[page]));
+            }
+        }
+        matches.sort((a, b) -> a.matchedTerms != b.matchedTerms
+                ? Integer.compare(b.matchedTerms, a.matchedTerms)
+                : Double.compare(b.score, a.score));
+        return matches.size() > limit ? matches.subList(0, limit) : matches;
+    }
+
+    // Returns the indexes of the indexed terms equal to the query term, or starting with it if prefix is true.
+    private List<Integer> FindTerms(String queryTerm, boolean prefix) {
+        int first = LowerBound(queryTerm);
+        List<Integer> terms = new ArrayList<>();
+        for (int term = first; term < index.getTermCount(); ++term) {
+            String text = index.getTerm(term).getText();
+            if (prefix ? !text.startsWith(queryTerm) : !text.equals(queryTerm)) break;
+            terms.add(term);
+            if (!prefix || terms.size() == MAX_PREFIX_EXPANSIONS) break;
+        }
+        return terms;
+    }
+
+    private int LowerBound(String text) {
+        int low = 0;
+        int high = index.getTermCount();
+        while (low < high) {
+            int middle = (low + high) >>> 1;
+            if (index.getTerm(middle).getText().compareTo(text) < 0) {
+                low = middle + 1;
+            }
+            else {
+                high = middle;
+            }
+        }
+        return low;
+    }
+
+    private void ScoreTerm(SearchIndex.Term term, double[] termScores, int[] firstOffsets) {
+        int documentFrequency = term.getPageDeltaCount();
+        double idf = Math.log(1 + (index.getPageCount() - documentFrequency + 0.5) / (documentFrequency + 0.5));
+        int page = 0;
+        for (int i = 0; i < documentFrequency; ++i) {
+            page += term.getPageDelta(i);
+            int frequency = term.getFrequency(i);
+            double lengthRatio = index.getPage(page).getTermCount() / averageTermCount;
+            double score = idf * frequency * (K1 + 1) / (frequency + K1 * (1 - B + B * lengthRatio));
+            termScores[page] = Math.max(termScores[page], score);
+            firstOffsets[page] = Math.min(firstOffsets[page], term.getFirstOffset(i));
+        }
+    }
+
+    /**
+     * @param offset
+     * The offset of the first matching term in the page's content.
+     * @return
+     * A single line excerpt of the page's content around the offset, without markdown formatting characters,
+     * built from the excerpt kept in the index. If the offset is past the excerpt, the excerpt's start is used.
+     */
+    static @NonNull String Snippet(@NonNull SearchIndex.Page page, int offset) {
+        String excerpt = page.getExcerpt();
+        return Snippet(excerpt, offset < excerpt.length() ? offset : 0, page.getExcerptTruncated());
+    }
+
+    // Builds a snippet of the content around the offset. If truncated, the content continues past its end.
+    private static String Snippet(String content, int offset, boolean truncated) {
+        offset = Math.max(0, Math.min(offset, content.length()));
+        int start = Math.max(0, offset - SNIPPET_BEFORE);
+        int end = Math.min(content.length(), offset + SNIPPET_AFTER);
+        // Don't cut words in half.
+        if (start > 0) {
+            int wordStart = IndexOfWhitespace(content, start, offset);
+            if (wordStart >= 0) start = wordStart + 1;
+        }
+        if (end < content.length()) {
+            int wordEnd = LastIndexOfWhitespace(content, offset, end);
+            if (wordEnd >= 0) end = wordEnd;
+        }
+        String snippet = content.substring(start, end).replaceAll("[#*_`>|]+", "").replaceAll("\\s+", " ").trim();
+        return (start > 0 ? "…" : "") + snippet + (end < content.length() || truncated ? "…" : "");
+    }
+
+    private static int IndexOfWhitespace(String content, int from, int to) {
+        for (int i = from; i < to; ++i) {
+            if (Character.isWhitespace(content.charAt(i))) return i;
+        }
+        return -1;
+    }
+
+    private static int LastIndexOfWhitespace(String content, int from, int to) {
+        for (int i = to - 1; i > from; --i) {
+            if (Character.isWhitespace(content.charAt(i))) return i;
+        }
+        return -1;
+    }
+}
@@ -0,0 +1,188 @@
+package ca.isupeene.charactersheet.cdk;
+
+import android.util.Log;
+
+import androidx.annotation.NonNull;
+import androidx.annotation.Nullable;
+
+import java.io.BufferedInputStream;
+import java.io.BufferedOutputStream;
+import java.io.DataInputStream;
+import java.io.DataOutputStream;
+import java.io.File;
+import java.io.FileInputStream;
+import java.io.FileOutputStream;
+import java.io.IOException;
+import java.nio.charset.StandardCharsets;
+import java.util.Arrays;
+import java.util.Comparator;
+import java.util.zip.CRC32;
+
+/**
+ * Serialized content kept on disk between provider processes, so that text protos are only parsed by
+ * the first process after the pack is installed or updated, and later processes read the parsed bytes.
+ *
+ * Entries live in a directory named after the version of the package, so an update starts an empty
+ * cache, and the previous version's directory is deleted when the cache is opened. Each entry is
+ * written to a temporary file and renamed into place, so a process killed while writing never leaves
+ * a partial entry, and carries a CRC32 of its content, so a corrupted entry is dropped rather than served.
+ * When the entries grow past the size limit, the least recently read ones are deleted.
+ */
+final class ParseCache {
+    private static final String TAG = "ParseCache";
+    private static final int MAGIC = 0x43444b50;  // "CDKP"
+    private static final int FORMAT_VERSION = 1;
+    private static final String ENTRY_SUFFIX = ".bin";
+    private static final String TEMP_SUFFIX = ".tmp";
+
+    private final File directory;
+    private final long maxBytes;
+    private long totalBytes;
+
+    private ParseCache(File directory, long maxBytes) {
+        this.directory = directory;
+        this.maxBytes = maxBytes;
+    }
+
+    /**
+     * Opens the cache for one version of the package, deleting the entries of every other version.
+     * @param root
+     * The directory holding the caches of every version, e.g. a directory under {@link android.content.Context#getCacheDir getCacheDir()}.
+     * @param version
+     * Identifies the package's content, e.g. its version code and last update time.
+     * @param maxBytes
+     * The most space the entries may take up.
+     */
+    static @NonNull ParseCache Open(@NonNull File root, @NonNull String version, long maxBytes) throws IOException {
+        File[] stale = root.listFiles();
+        if (stale != null) {
+            for (File file : stale) {
+                if (!file.getName().equals(version)) DeleteRecursively(file);
+            }
+        }
+        File directory = new File(root, version);
+        if (!directory.isDirectory() && !directory.mkdirs()) {
+            throw new IOException("Couldn't create " + directory);
+        }
+        ParseCache cache = new ParseCache(directory, maxBytes);
+        File[] files = directory.listFiles();
+        if (files != null) {
+            for (File file : files) {
+                // Leftovers from a process that was killed while writing.
+                if (file.getName().endsWith(TEMP_SUFFIX)) {
+                    file.delete();
+                }
+                else {
+                    cache.totalBytes += file.length();
+                }
+            }
+        }
+        return cache;
+    }
+
+    private static void DeleteRecursively(File file) {
+        File[] children = file.listFiles();
+        if (children != null) {
+            for (File child : children) {
+                DeleteRecursively(child);
+            }
+        }
+        file.delete();
+    }
+
+    private File EntryFile(String key) {
+        byte[] hash = ContentProviderBase.NewSha256().digest(key.getBytes(StandardCharsets.UTF_8));
+        return new File(directory, ContentProviderBase.ToHex(Arrays.copyOf(hash, 16)) + ENTRY_SUFFIX);
+    }
+
+    private static long Checksum(byte[] data) {
+        CRC32 crc = new CRC32();
+        crc.update(data, 0, data.length);
+        return crc.getValue();
+    }
+
+    /**
+     * @return
+     * The content stored under the key, or null if there isn't any, or if its entry is unreadable or corrupt.
+     */
+    @Nullable byte[] Get(@NonNull String key) {
+        File file = EntryFile(key);
+        if (!file.isFile()) return null;
+        try (DataInputStream input = new DataInputStream(new BufferedInputStream(new FileInputStream(file)))) {
+            if (input.readInt() != MAGIC || input.readInt() != FORMAT_VERSION || !input.readUTF().equals(key)) {
+                throw new IOException("Unexpected header");
+            }
+            int length = input.readInt();
+            long checksum = input.readLong();
+            if (length < 0 || length > file.length()) throw new IOException("Bad length " + length);
+            byte[] data = new byte[length];
+            input.readFully(data);
+            if (Checksum(data) != checksum) throw new IOException("Bad checksum");
+            // Reading an entry marks it as recently used, for eviction.
+            file.setLastModified(System.currentTimeMillis());
+            return data;
+        }
+        catch (IOException ex) {
+            Log.w(TAG, "Dropping cache entry for " + key, ex);
+            Remove(file);
+            return null;
+        }
+    }
+
+    /**
+     * Stores the content under the key, replacing any previous entry, then evicts the least recently read
+     * entries if the cache is over its size limit. Content larger than the limit isn't stored. Failures are
+     * logged rather than thrown, since the content can always be parsed again.
+     */
+    void Put(@NonNull String key, @NonNull byte[] data) {
+        if (data.length > maxBytes) return;
+        File file = EntryFile(key);
+        File temp = null;
+        try {
+            temp = File.createTempFile(file.getName(), TEMP_SUFFIX, directory);
+            try (FileOutputStream output = new FileOutputStream(temp)) {
+                DataOutputStream dataOutput = new DataOutputStream(new BufferedOutputStream(output));
+                dataOutput.writeInt(MAGIC);
+                dataOutput.writeInt(FORMAT_VERSION);
+                dataOutput.writeUTF(key);
+                dataOutput.writeInt(data.length);
+                dataOutput.writeLong(Checksum(data));
+                dataOutput.write(data);
+                dataOutput.flush();
+                output.getFD().sync();
+            }
+            synchronized (this) {
+                long previousLength = file.length();
+                if (!temp.renameTo(file)) throw new IOException("Couldn't rename " + temp + " to " + file);
+                totalBytes += file.length() - previousLength;
+                if (totalBytes > maxBytes) Evict();
+            }
+        }
+        catch (IOException ex) {
+            Log.w(TAG, "Couldn't cache " + key, ex);
+            if (temp != null) temp.delete();
+        }
+    }
+
+    private synchronized void Remove(File file) {
+        long length = file.length();
+        if (file.delete()) totalBytes -= length;
+    }
+
+    // Deletes the least recently read entries until the cache is within its size limit.
+    private synchronized void Evict() {
+        File[] files = directory.listFiles((dir, name) -> name.endsWith(ENTRY_SUFFIX));
+        if (files == null) return;
+        long[] lastModified = new long[files.length];
+        Integer[] order = new Integer[files.length];
+        for (int i = 0; i < files.length; ++i) {
+            lastModified[i] = files[i].lastModified();
+            order[i] = i;
+        }
+        // Sort by timestamps read once up front, since reads can touch the files while they're being sorted.
+        Arrays.sort(order, Comparator.comparingLong(i -> lastModified[i]));
+        for (int i = 0; i < order.length && totalBytes > maxBytes; ++i) {
+            Remove(files[order[i]]);
+        }
+    }
+}
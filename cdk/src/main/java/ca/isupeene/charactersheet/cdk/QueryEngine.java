@@ -0,0 +1,195 @@
+package ca.isupeene.charactersheet.cdk;
+
+import androidx.annotation.NonNull;
+import androidx.annotation.Nullable;
+
+import java.util.ArrayList;
+import java.util.BitSet;
+import java.util.Collection;
+import java.util.HashMap;
+import java.util.List;
+import java.util.Locale;
+import java.util.Map;
+
+import ca.isupeene.charactersheet.cdk.Model.ArmorCategory;
+import ca.isupeene.charactersheet.cdk.Model.ClassSpells;
+import ca.isupeene.charactersheet.cdk.Model.ClassSpellsList;
+import ca.isupeene.charactersheet.cdk.Model.DamageType;
+import ca.isupeene.charactersheet.cdk.Model.Item;
+import ca.isupeene.charactersheet.cdk.Model.ItemList;
+import ca.isupeene.charactersheet.cdk.Model.Query;
+import ca.isupeene.charactersheet.cdk.Model.School;
+import ca.isupeene.charactersheet.cdk.Model.Spell;
+import ca.isupeene.charactersheet.cdk.Model.SpellList;
+import ca.isupeene.charactersheet.cdk.Model.WeaponCategory;
+import ca.isupeene.charactersheet.cdk.Model.WeaponInfo;
+
+/**
+ * Evaluates {@link Query Queries} against a content pack's spells and items.
+ *
+ * Each list is scanned once, when the first query is made, to build a {@link BitSet} of the matching
+ * positions for every value of every attribute a query can filter on. After that, a query is a union
+ * of the bitsets for each filter's values, intersected across filters.
+ */
+final class QueryEngine {
+    // The positions of the elements having each value of an attribute.
+    private static final class AttributeIndex<K> {
+        private final Map<K, BitSet> bitsets = new HashMap<>();
+
+        void Add(K value, int position) {
+            BitSet bitset = bitsets.get(value);
+            if (bitset == null) {
+                bitset = new BitSet();
+                bitsets.put(value, bitset);
+            }
+            bitset.set(position);
+        }
+
+        // Intersects the matches with the elements having any of the values. An empty filter matches everything.
+        void Restrict(BitSet matches, Collection<K> values) {
+            if (values.isEmpty()) return;
+            BitSet union = new BitSet();
+            for (K value : values) {
+                BitSet bitset = bitsets.get(value);
+                if (bitset != null) union.or(bitset);
+            }
+            matches.and(union);
+        }
+    }
+
+    // Restricts the matches to the flagged elements, if the filter is set.
+    private static void Restrict(BitSet matches, boolean filter, BitSet flagged) {
+        if (filter) matches.and(flagged);
+    }
+
+    private static BitSet All(int size) {
+        BitSet all = new BitSet(size);
+        all.set(0, size);
+        return all;
+    }
+
+    /**
+     * An index over a {@link SpellList SpellList}, and optionally the {@link ClassSpellsList ClassSpellsList}
+     * that says which classes may cast each spell.
+     */
+    static final class Spells {
+        private final SpellList spells;
+        private final AttributeIndex<School> schools = new AttributeIndex<>();
+        private final AttributeIndex<Integer> levels = new AttributeIndex<>();
+        private final AttributeIndex<String> classNames = new AttributeIndex<>();
+        private final BitSet ritual = new BitSet();
+        private final BitSet concentration = new BitSet();
+
+        Spells(@NonNull SpellList spells, @Nullable ClassSpellsList classSpells) {
+            this.spells = spells;
+            Map<String, Integer> positionsByName = new HashMap<>();
+            for (int i = 0; i < spells.getSpellCount(); ++i) {
+                Spell spell = spells.getSpell(i);
+                positionsByName.put(spell.getName().toLowerCase(Locale.ROOT), i);
+                schools.Add(spell.getSchool(), i);
+                levels.Add(spell.getLevel(), i);
+                ritual.set(i, spell.getRitual());
+                concentration.set(i, spell.getDuration().getConcentration());
+            }
+            if (classSpells != null) {
+                for (ClassSpells classSpell : classSpells.getClassSpellList()) {
+                    String className = classSpell.getClassName().toLowerCase(Locale.ROOT);
+                    for (String spellName : classSpell.getSpellList()) {
+                        Integer position = positionsByName.get(spellName.toLowerCase(Locale.ROOT));
+                        if (position != null) classNames.Add(className, position);
+                    }
+                }
+            }
+        }
+
+        @NonNull BitSet Evaluate(@NonNull Query query) {
+            BitSet matches = All(spells.getSpellCount());
+            schools.Restrict(matches, query.getSchoolList());
+            levels.Restrict(matches, query.getLevelList());
+            classNames.Restrict(matches, LowerCase(query.getClassNameList()));
+            Restrict(matches, query.getRitual(), ritual);
+            Restrict(matches, query.getConcentration(), concentration);
+            return matches;
+        }
+
+        @NonNull SpellList Select(@NonNull BitSet matches) {
+            SpellList.Builder result = SpellList.newBuilder();
+            for (int i = matches.nextSetBit(0); i >= 0; i = matches.nextSetBit(i + 1)) {
+                result.addSpell(spells.getSpell(i));
+            }
+            return result.build();
+        }
+    }
+
+    /**
+     * An index over an {@link ItemList ItemList}.
+     */
+    static final class Items {
+        private final ItemList items;
+        private final AttributeIndex<Item.Type> itemTypes = new AttributeIndex<>();
+        private final AttributeIndex<WeaponCategory> weaponCategories = new AttributeIndex<>();
+        private final AttributeIndex<DamageType> damageTypes = new AttributeIndex<>();
+        private final AttributeIndex<Query.WeaponProperty> weaponProperties = new AttributeIndex<>();
+        private final AttributeIndex<ArmorCategory> armorCategories = new AttributeIndex<>();
+
+        Items(@NonNull ItemList items) {
+            this.items = items;
+            for (int i = 0; i < items.getItemCount(); ++i) {
+                Item item = items.getItem(i);
+                itemTypes.Add(item.getType(), i);
+                if (item.hasWeaponInfo()) {
+                    WeaponInfo weapon = item.getWeaponInfo();
+                    weaponCategories.Add(weapon.getCategory(), i);
+                    damageTypes.Add(weapon.getDamageType(), i);
+                    if (weapon.getAmmunition()) weaponProperties.Add(Query.WeaponProperty.AMMUNITION, i);
+                    if (weapon.getFinesse()) weaponProperties.Add(Query.WeaponProperty.FINESSE, i);
+                    if (weapon.getHeavy()) weaponProperties.Add(Query.WeaponProperty.HEAVY, i);
+                    if (weapon.getLight()) weaponProperties.Add(Query.WeaponProperty.LIGHT, i);
+                    if (weapon.getLoading()) weaponProperties.Add(Query.WeaponProperty.LOADING, i);
+                    if (weapon.getReach()) weaponProperties.Add(Query.WeaponProperty.REACH, i);
+                    if (weapon.getSpecial()) weaponProperties.Add(Query.WeaponProperty.SPECIAL, i);
+                    if (weapon.getThrown()) weaponProperties.Add(Query.WeaponProperty.THROWN, i);
+                    if (weapon.getTwoHanded()) weaponProperties.Add(Query.WeaponProperty.TWO_HANDED, i);
+                    if (weapon.getVersatile()) weaponProperties.Add(Query.WeaponProperty.VERSATILE, i);
+                }
+                if (item.hasArmorInfo()) {
+                    armorCategories.Add(item.getArmorInfo().getCategory(), i);
+                }
+            }
+        }
+
+        @NonNull BitSet Evaluate(@NonNull Query query) {
+            BitSet matches = All(items.getItemCount());
+            itemTypes.Restrict(matches, query.getItemTypeList());
+            weaponCategories.Restrict(matches, query.getWeaponCategoryList());
+            damageTypes.Restrict(matches, query.getDamageTypeList());
+            weaponProperties.Restrict(matches, query.getWeaponPropertyList());
+            armorCategories.Restrict(matches, query.getArmorCategoryList());
+            return matches;
+        }
+
+        @NonNull ItemList Select(@NonNull BitSet matches) {
+            ItemList.Builder result = ItemList.newBuilder();
+            for (int i = matches.nextSetBit(0); i >= 0; i = matches.nextSetBit(i + 1)) {
+                result.addItem(items.getItem(i));
+            }
+            return result.build();
+        }
+    }
+
+    /**
+     * @return
+     * The positions of the matching elements, in ascending order.
+     */
+    static @NonNull int[] Positions(@NonNull BitSet matches) {
+        return matches.stream().toArray();
+    }
+
+    private static List<String> LowerCase(List<String> values) {
+        List<String> result = new ArrayList<>(values.size());
+        for (String value : values) {
+            result.add(value.toLowerCase(Locale.ROOT));
+        }
+        return result;
+    }
+}
@@ -0,0 +1,177 @@
+package ca.isupeene.charactersheet.cdk;
+
+import android.os.Bundle;
+
+import androidx.annotation.NonNull;
+import androidx.annotation.Nullable;
+
+import java.io.ByteArrayInputStream;
+import java.io.ByteArrayOutputStream;
+import java.io.IOException;
+import java.io.InputStream;
+import java.io.OutputStream;
+import java.util.zip.Deflater;
+import java.util.zip.DeflaterOutputStream;
+import java.util.zip.GZIPInputStream;
+import java.util.zip.GZIPOutputStream;
+import java.util.zip.InflaterInputStream;
+
+/**
+ * Functions for negotiating a compressed encoding for the serialized protos returned by
+ * {@link ContentProviderBase#call ContentProviderBase.call}.
+ *
+ * By default, payloads are returned as-is. To request a compressed payload, pass the Bundle
+ * returned by {@link #RequestExtras RequestExtras} as the extras of the call. The provider records
+ * the encoding it actually used under {@link #ENCODING_KEY}, and {@link #Decode Decode} reverses it.
+ * Providers built against an older CDK ignore the request, and their responses decode as {@link #IDENTITY}.
+ *
+ * "image" responses are never encoded.
+ */
+public abstract class ResponseEncoding {
+    /**
+     * The extras key for the requested encoding, and the result key for the encoding that was used.
+     */
+    public static final String ENCODING_KEY = "encoding";
+    /**
+     * The extras key for the requested compression level, from 0 to 9.
+     * Higher levels trade provider CPU time for smaller payloads.
+     */
+    public static final String LEVEL_KEY = "encoding_level";
+
+    /**
+     * The payload is not compressed.
+     */
+    public static final String IDENTITY = "identity";
+    /**
+     * The payload is compressed in the zlib format.
+     */
+    public static final String DEFLATE = "deflate";
+    /**
+     * The payload is compressed in the gzip format.
+     */
+    public static final String GZIP = "gzip";
+
+    private static final int BUFFER_SIZE = 8192;
+
+    /**
+     * @param encoding
+     * {@link #IDENTITY}, {@link #DEFLATE} or {@link #GZIP}.
+     * @param level
+     * The compression level, from 0 to 9, or -1 for the codec's default.
+     * @return
+     * Extras requesting the specified encoding, to pass to {@link ContentProviderBase#call ContentProviderBase.call}.
+     */
+    public static @NonNull Bundle RequestExtras(@NonNull String encoding, int level) {
+        Bundle extras = new Bundle();
+        extras.putString(ENCODING_KEY, encoding);
+        extras.putInt(LEVEL_KEY, level);
+        return extras;
+    }
+
+    static @NonNull String RequestedEncoding(@Nullable Bundle extras) {
+        String encoding = extras == null ? null : extras.getString(ENCODING_KEY);
+        return encoding == null ? IDENTITY : ValidateEncoding(encoding);
+    }
+
+    private static String ValidateEncoding(String encoding) {
+        if (encoding.equals(IDENTITY) || encoding.equals(DEFLATE) || encoding.equals(GZIP)) return encoding;
+        throw new IllegalArgumentException(encoding + " is not a valid encoding. The valid encodings are [" +
+                IDENTITY + ", " + DEFLATE + ", " + GZIP + "]");
+    }
+
+    static int RequestedLevel(@Nullable Bundle extras) {
+        int level = extras == null ? Deflater.DEFAULT_COMPRESSION : extras.getInt(LEVEL_KEY, Deflater.DEFAULT_COMPRESSION);
+        if (level < Deflater.DEFAULT_COMPRESSION || level > Deflater.BEST_COMPRESSION) {
+            throw new IllegalArgumentException(level + " is not a valid compression level. Use 0 to 9, or -1 for the default.");
+        }
+        return level;
+    }
+
+    /**
+     * Compress a payload.
+     * @param data
+     * The payload to compress.
+     * @param encoding
+     * {@link #IDENTITY}, {@link #DEFLATE} or {@link #GZIP}.
+     * @param level
+     * The compression level, from 0 to 9, or -1 for the codec's default.
+     * @return
+     * The compressed payload.
+     */
+    public static @NonNull byte[] Encode(@NonNull byte[] data, @NonNull String encoding, int level) {
+        if (ValidateEncoding(encoding).equals(IDENTITY)) return data;
+
+        ByteArrayOutputStream output = new ByteArrayOutputStream(data.length / 4 + 64);
+        try {
+            if (encoding.equals(GZIP)) {
+                try (GZIPOutputStream stream = new LeveledGZIPOutputStream(output, level)) {
+                    stream.write(data);
+                }
+            }
+            else {
+                Deflater deflater = new Deflater(level);
+                try (DeflaterOutputStream stream = new DeflaterOutputStream(output, deflater, BUFFER_SIZE)) {
+                    stream.write(data);
+                }
+                finally {
+                    deflater.end();
+                }
+            }
+        }
+        catch (IOException ex) {
+            // Writing to a ByteArrayOutputStream can't fail.
+            throw new IllegalStateException(ex);
+        }
+        return output.toByteArray();
+    }
+
+    /**
+     * Get a payload from a result returned by {@link ContentProviderBase#call ContentProviderBase.call},
+     * decompressing it if necessary.
+     * @param result
+     * The Bundle returned by the provider.
+     * @param method
+     * The method that was called, e.g. "classes".
+     * @return
+     * The serialized proto, or null if the result doesn't hold one.
+     * @throws IOException
+     * If the payload is not validly encoded, or the encoding is unknown.
+     */
+    public static @Nullable byte[] Decode(@NonNull Bundle result, @NonNull String method) throws IOException {
+        byte[] data = result.getByteArray(method);
+        if (data == null) return null;
+
+        String encoding = result.getString(ENCODING_KEY, IDENTITY);
+        InputStream stream;
+        switch (encoding) {
+            case IDENTITY:
+                return data;
+            case DEFLATE:
+                stream = new InflaterInputStream(new ByteArrayInputStream(data));
+                break;
+            case GZIP:
+                stream = new GZIPInputStream(new ByteArrayInputStream(data), BUFFER_SIZE);
+                break;
+            default:
+                throw new IOException("Unknown response encoding " + encoding);
+        }
+
+        try (InputStream input = stream) {
+            ByteArrayOutputStream output = new ByteArrayOutputStream(data.length * 4);
+            byte[] buffer = new byte[BUFFER_SIZE];
+            int count;
+            while ((count = input.read(buffer)) != -1) {
+                output.write(buffer, 0, count);
+            }
+            return output.toByteArray();
+        }
+    }
+
+    // GZIPOutputStream doesn't expose a compression level, but its deflater is accessible to subclasses.
+    private static class LeveledGZIPOutputStream extends GZIPOutputStream {
+        LeveledGZIPOutputStream(OutputStream output, int level) throws IOException {
+            super(output, BUFFER_SIZE);
+            def.setLevel(level);
+        }
+    }
+}
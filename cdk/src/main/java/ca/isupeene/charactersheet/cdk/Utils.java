@@ -8,6 +8,7 @@ import android.text.TextUtils;
 import androidx.annotation.NonNull;
 
 import java.io.BufferedReader;
+import java.io.ByteArrayOutputStream;
 import java.io.IOException;
 import java.io.InputStream;
 import java.io.InputStreamReader;
@@ -43,6 +44,34 @@ public abstract class Utils {
         }
     }
 
+    /**
+     * Read all bytes from an {@link InputStream}, then close it.
+     * @param inputStream
+     * The input data to read.
+     * @return
+     * A byte[] containing all the data from the InputStream
+     * @throws IOException
+     * If an error occurs while reading the stream.
+     */
+    public static @NonNull byte[] ReadAllBytes(@NonNull InputStream inputStream) throws IOException {
+        try (InputStream input = inputStream) {
+            ByteArrayOutputStream output = new ByteArrayOutputStream(Math.max(input.available(), 8192));
+            byte[] buffer = new byte[8192];
+            int count;
+            while ((count = input.read(buffer)) != -1) {
+                output.write(buffer, 0, count);
+            }
+            return output.toByteArray();
+        }
+    }
+
+    // True for an info page, named {index}.{content name}.md. Other files in info directories are ignored.
+    // Must match is_info_page in content_pack.py, so that containers, manifests and search indexes built
+    // by the pack tools list the same pages.
+    static boolean IsInfoPage(@NonNull String filename) {
+        return filename.endsWith(".md") && filename.split("\\.").length >= 3;
+    }
+
     /**
      * Gets a {@link MultiPageInfo} object from your content pack's asset directory at the specified path.
      * @param context
@@ -50,13 +79,15 @@ public abstract class Utils {
      * @param assetPath
      * The directory under which the info files are located, relative to your content pack's "assets" directory.
      * @return
-     * A {@link MultiPageInfo} with one {@link InfoPage} per file in the specified directory.
+     * A {@link MultiPageInfo} with one {@link InfoPage} per {index}.{content name}.md file in the specified directory.
+     * Other files are ignored.
      * @throws IOException
      * If there is an error reading the file.
      */
     public static @NonNull MultiPageInfo GetMultiPageInfoFromAssets(@NonNull Context context, @NonNull String assetPath) throws IOException {
         MultiPageInfo.Builder multiPageBuilder = MultiPageInfo.newBuilder();
         for (String filename : context.getAssets().list(assetPath)) {
+            if (!IsInfoPage(filename)) continue;
             String[] nameParts = filename.split("\\.");
             multiPageBuilder.addPage
                     (InfoPage.newBuilder()
@@ -0,0 +1,81 @@
+"""
+Measures the size / CPU trade-off of each ResponseEncoding compression level for a content pack's
+DlcType payloads, as ContentProviderBase would serialize them.
+
+Example:
+    python compression-benchmark.py --descriptor_set model.desc \\
+        --dlc classes=src/main/res/raw/classes.textpb --dlc spells=src/main/res/raw/spells.textpb
+
+Java's Deflater and python's zlib module wrap the same zlib library, so the compressed sizes are
+exactly those the provider produces. Timings are measured on the host, so compare them relative
+to one another rather than as absolute on-device costs. gzip payloads are 12 bytes larger than
+deflate payloads and cost the same to produce.
+"""
+import argparse
+import json
+import sys
+import time
+import zlib
+
+import content_pack
+
+
+def time_ms(function, repeat):
+    """The median wall time of 'repeat' calls to function, in milliseconds."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - start) * 1000)
+    return sorted(timings)[len(timings) // 2]
+
+
+def benchmark(payloads, levels, repeat):
+    results = []
+    for tag, payload in payloads.items():
+        for level in levels:
+            compressed = zlib.compress(payload, level)
+            results.append({
+                "dlc_type": tag,
+                "level": level,
+                "raw_bytes": len(payload),
+                "compressed_bytes": len(compressed),
+                "ratio": len(compressed) / len(payload) if payload else 1.0,
+                "compress_ms": time_ms(lambda: zlib.compress(payload, level), repeat),
+                "decompress_ms": time_ms(lambda: zlib.decompress(compressed), repeat),
+            })
+    return results
+
+
+def print_table(results):
+    print("{:<14}{:>6}{:>12}{:>12}{:>8}{:>14}{:>16}".format(
+        "dlc_type", "level", "raw_bytes", "compressed", "ratio", "compress_ms", "decompress_ms"))
+    for result in results:
+        print("{dlc_type:<14}{level:>6}{raw_bytes:>12}{compressed_bytes:>12}{ratio:>8.3f}{compress_ms:>14.3f}{decompress_ms:>16.3f}".format(**result))
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--descriptor_set", required=True, help="A FileDescriptorSet for model.proto.")
+    parser.add_argument("--dlc", action="append", default=[], metavar="TAG=PATH",
+                        help="A text proto resource, keyed by its DlcType tag. May be repeated.")
+    parser.add_argument("--levels", default="1,3,6,9", help="Comma-separated compression levels to measure.")
+    parser.add_argument("--repeat", type=int, default=20, help="The number of timed runs per measurement.")
+    parser.add_argument("--json", help="Also write the results to this file.")
+    args = parser.parse_args(argv)
+
+    compiler = content_pack.TextProtoCompiler(args.descriptor_set)
+    payloads = {}
+    for tag, path in sorted(content_pack.parse_dlc_arguments(args.dlc).items()):
+        with open(path, encoding="utf-8") as dlc_file:
+            payloads[tag] = compiler.compile(content_pack.DLC_TYPES[tag], dlc_file.read())
+
+    results = benchmark(payloads, [int(level) for level in args.levels.split(",")], args.repeat)
+    print_table(results)
+    if args.json:
+        with open(args.json, "w") as json_file:
+            json.dump(results, json_file, indent=2)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,193 @@
+import hashlib
+import os
+import re
+
+# The text proto message type held by the resource for each DlcType tag.
+DLC_TYPES = {
+    "backgrounds": "BackgroundList",
+    "class_spells": "ClassSpellsList",
+    "classes": "ClassList",
+    "feats": "FeatList",
+    "items": "ItemList",
+    "races": "RaceList",
+    "spells": "SpellList",
+    "talents": "TalentList",
+}
+
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".webp", ".gif", ".bmp"}
+
+PACKAGE = "ca.isupeene.charactersheet.cdk"
+
+# Matches the content path of a downscaled image variant, e.g. 'images/dragon@256.png'. See ImageDelivery.java.
+VARIANT_PATTERN = re.compile(r"^(.*)@(\d+)(\.[^./]*)?$")
+
+
+def sha256(data):
+    return hashlib.sha256(data).digest()
+
+
+def text_format_string(value):
+    """Quotes a string for a text proto, escaped so that the generated Parser reads it back unchanged."""
+    escaped = value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n").replace("\r", "\\r").replace("\t", "\\t")
+    return '"{}"'.format(escaped)
+
+
+def parse_dlc_arguments(dlc_arguments):
+    """Parses 'tag=path' command line arguments into a {tag: path} dict."""
+    dlc_paths = {}
+    for argument in dlc_arguments:
+        tag, _, path = argument.partition("=")
+        if tag not in DLC_TYPES or not path:
+            raise ValueError("Expected tag=path with a tag in [{}], got '{}'".format(", ".join(DLC_TYPES), argument))
+        dlc_paths[tag] = path
+    return dlc_paths
+
+
+def asset_path(assets_dir, path):
+    """The path of a file relative to the assets directory, as AssetManager would name it."""
+    return os.path.relpath(path, assets_dir).replace(os.sep, "/")
+
+
+def is_info_page(filename):
+    """True for an info page, named {index}.{content name}.md. Must match Utils.IsInfoPage."""
+    return filename.endswith(".md") and len(filename.split(".")) >= 3
+
+
+def find_info_directories(assets_dir):
+    """
+    Returns {content_path: [page filename]} for each directory under assets_dir that holds
+    {index}.{content name}.md files.  Pages are sorted the same way AssetManager.list sorts them.
+    Other files are left out, as Utils.GetMultiPageInfoFromAssets leaves them out.
+    """
+    info_directories = {}
+    for directory, _, filenames in os.walk(assets_dir):
+        pages = sorted(f for f in filenames if is_info_page(f))
+        if pages:
+            info_directories[asset_path(assets_dir, directory)] = pages
+    return dict(sorted(info_directories.items()))
+
+
+def find_images(assets_dir):
+    """Returns a sorted list of the content paths of all image files under assets_dir."""
+    images = []
+    for directory, _, filenames in os.walk(assets_dir):
+        for filename in filenames:
+            if os.path.splitext(filename)[1].lower() in IMAGE_EXTENSIONS:
+                images.append(asset_path(assets_dir, os.path.join(directory, filename)))
+    return sorted(images)
+
+
+def variant_path(content_path, size):
+    """The content path of an image's variant with the specified size, as ImageDelivery.VariantPath names it."""
+    stem, extension = os.path.splitext(content_path)
+    return "{}@{}{}".format(stem, size, extension)
+
+
+def is_variant(content_path):
+    return VARIANT_PATTERN.match(content_path) is not None
+
+
+def _varint(value):
+    result = bytearray()
+    while True:
+        bits = value & 0x7F
+        value >>= 7
+        if value:
+            result.append(bits | 0x80)
+        else:
+            result.append(bits)
+            return bytes(result)
+
+
+def _length_delimited(field_number, payload):
+    return _varint(field_number << 3 | 2) + _varint(len(payload)) + payload
+
+
+def _varint_field(field_number, value):
+    return _varint(field_number << 3) + _varint(value) if value else b""
+
+
+def _string_field(field_number, value):
+    return _length_delimited(field_number, value.encode("utf-8")) if value else b""
+
+
+def _packed_varints(field_number, values):
+    return _length_delimited(field_number, b"".join(_varint(v) for v in values)) if values else b""
+
+
+def read_page_text(path):
+    """Reads a markdown page the way Utils.ReadAll does: line by line, joined with '\\n'."""
+    with open(path, encoding="utf-8", newline="") as page_file:
+        lines = re.split("\r\n|\r|\n", page_file.read())
+    if lines[-1] == "":
+        lines.pop()
+    return "\n".join(lines)
+
+
+def encode_multi_page_info(info_dir, pages):
+    """
+    Serializes a MultiPageInfo identical to the one built by Utils.GetMultiPageInfoFromAssets,
+    without depending on generated python protos.
+    """
+    result = bytearray()
+    for filename in pages:
+        title = filename.split(".")[1].encode("utf-8")
+        content = read_page_text(os.path.join(info_dir, filename)).encode("utf-8")
+        page = b""
+        if title:
+            page += _length_delimited(1, title)  # InfoPage.title
+        if content:
+            page += _length_delimited(2, content)  # InfoPage.content
+        result += _length_delimited(1, page)  # MultiPageInfo.page
+    return bytes(result)
+
+
+def encode_search_index(pages, terms):
+    """
+    Serializes a SearchIndex without depending on generated python protos.
+
+    pages is a list of (content_path, page_index, title, term_count, excerpt, excerpt_truncated) tuples, and terms
+    is a list of (text, [(page, frequency, first_offset)]) tuples sorted by text, with postings sorted by page.
+    """
+    result = bytearray()
+    for content_path, page_index, title, term_count, excerpt, excerpt_truncated in pages:
+        page = (_string_field(1, content_path) + _varint_field(2, page_index)
+                + _string_field(3, title) + _varint_field(4, term_count)
+                + _string_field(5, excerpt) + _varint_field(6, int(excerpt_truncated)))
+        result += _length_delimited(1, page)  # SearchIndex.page
+    for text, postings in terms:
+        page_numbers = [page for page, _, _ in postings]
+        deltas = [page - previous for page, previous in zip(page_numbers, [0] + page_numbers)]
+        term = (_string_field(1, text) + _packed_varints(2, deltas)
+                + _packed_varints(3, [frequency for _, frequency, _ in postings])
+                + _packed_varints(4, [first_offset for _, _, first_offset in postings]))
+        result += _length_delimited(2, term)  # SearchIndex.term
+    return bytes(result)
+
+
+class TextProtoCompiler(object):
+    """Compiles text protos to their binary encoding, using a descriptor set built from model.proto."""
+
+    def __init__(self, descriptor_set_path):
+        from google.protobuf import descriptor_pb2, descriptor_pool, message_factory
+
+        with open(descriptor_set_path, "rb") as descriptor_set_file:
+            descriptor_set = descriptor_pb2.FileDescriptorSet.FromString(descriptor_set_file.read())
+        pool = descriptor_pool.DescriptorPool()
+        for file_descriptor in descriptor_set.file:
+            pool.Add(file_descriptor)
+        self._pool = pool
+        if hasattr(message_factory, "GetMessageClass"):
+            self._message_class = message_factory.GetMessageClass
+        else:
+            self._message_class = message_factory.MessageFactory(pool).GetPrototype
+
+    def parse(self, message_name, text):
+        """Returns the text proto as a message, for tools that inspect its contents."""
+        from google.protobuf import text_format
+
+        message_class = self._message_class(self._pool.FindMessageTypeByName("{}.{}".format(PACKAGE, message_name)))
+        return text_format.Parse(text, message_class())
+
+    def compile(self, message_name, text):
+        return self.parse(message_name, text).SerializeToString()
@@ -0,0 +1,100 @@
+"""
+Reports how much of a content pack is made of repeated sub-messages, e.g. the same Feature copied
+into several subclasses, and so how much heap the generated Interner saves when it shares them.
+
+Example:
+    python dedup-report.py --descriptor_set model.desc \\
+        --dlc classes=src/main/res/raw/classes.textpb --dlc races=src/main/res/raw/races.textpb
+
+The lists are walked the way Interner walks them: a message that's structurally equal to one seen
+before counts as a duplicate, along with everything inside it, and isn't walked any further. All
+the lists share one table, as if they'd been interned with one Interner. Saved bytes are the
+serialized size of the duplicates; the heap they'd hold on the device is several times larger.
+
+Binary protos have no way to refer to a shared message, so packed content is unchanged in size.
+Use the report to find the copies worth sharing, and Interner to share them after parsing.
+"""
+import argparse
+import json
+import sys
+
+from google.protobuf import descriptor
+
+import content_pack
+
+
+def is_repeated(field):
+    # Newer versions of protobuf replace FieldDescriptor.label with is_repeated.
+    if hasattr(field, "is_repeated"):
+        return field.is_repeated
+    return field.label == descriptor.FieldDescriptor.LABEL_REPEATED
+
+
+class DeduplicationReport(object):
+    """Counts the interned, unique and duplicate messages of each type, as Interner would."""
+
+    def __init__(self):
+        self.canonical = set()
+        self.types = {}
+
+    def add(self, message):
+        serialized = message.SerializeToString(deterministic=True)
+        message_type = message.DESCRIPTOR.full_name.replace(content_pack.PACKAGE + ".", "", 1)
+        counts = self.types.setdefault(message_type, {"message_type": message_type, "interned": 0, "unique": 0, "saved_bytes": 0})
+        counts["interned"] += 1
+        key = (message_type, serialized)
+        if key in self.canonical:
+            counts["saved_bytes"] += len(serialized)
+            return
+        self.canonical.add(key)
+        counts["unique"] += 1
+        for field, value in message.ListFields():
+            if field.type != descriptor.FieldDescriptor.TYPE_MESSAGE:
+                continue
+            if is_repeated(field):
+                for element in value:
+                    self.add(element)
+            else:
+                self.add(value)
+
+    def results(self):
+        """The counts for each message type, most bytes saved first."""
+        return sorted(self.types.values(), key=lambda counts: (-counts["saved_bytes"], counts["message_type"]))
+
+
+def print_table(results, total_bytes, top):
+    print("{:<40}{:>10}{:>10}{:>14}{:>8}".format("message_type", "interned", "unique", "saved_bytes", "saved"))
+    for result in results[:top]:
+        print("{message_type:<40}{interned:>10}{unique:>10}{saved_bytes:>14}".format(**result) +
+              "{:>8.1%}".format(result["saved_bytes"] / total_bytes if total_bytes else 0))
+    saved_bytes = sum(result["saved_bytes"] for result in results)
+    print("Duplicates make up {} of {} bytes ({:.1%}).".format(saved_bytes, total_bytes, saved_bytes / total_bytes if total_bytes else 0))
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--descriptor_set", required=True, help="A FileDescriptorSet for model.proto.")
+    parser.add_argument("--dlc", action="append", default=[], metavar="TAG=PATH",
+                        help="A text proto resource, keyed by its DlcType tag. May be repeated.")
+    parser.add_argument("--top", type=int, default=20, help="The number of message types to list.")
+    parser.add_argument("--json", help="Also write the counts for every message type to this file.")
+    args = parser.parse_args(argv)
+
+    compiler = content_pack.TextProtoCompiler(args.descriptor_set)
+    report = DeduplicationReport()
+    total_bytes = 0
+    for tag, path in sorted(content_pack.parse_dlc_arguments(args.dlc).items()):
+        with open(path, encoding="utf-8") as dlc_file:
+            message = compiler.parse(content_pack.DLC_TYPES[tag], dlc_file.read())
+        total_bytes += message.ByteSize()
+        report.add(message)
+
+    results = report.results()
+    print_table(results, total_bytes, args.top)
+    if args.json:
+        with open(args.json, "w") as json_file:
+            json.dump(results, json_file, indent=2)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
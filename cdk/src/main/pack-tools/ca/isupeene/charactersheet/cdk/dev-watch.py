@@ -0,0 +1,183 @@
+"""
+Watches a content pack's sources and copies each edit to a device as it's saved, to be served by a
+ContentProviderBase whose DevelopmentDirectory() points at the copy. Edits show up in the app on
+its next call, without rebuilding or reinstalling the pack.
+
+Example:
+    python dev-watch.py --source src/main --package com.example.mypack \\
+        --descriptor_set model.desc --search_index search.idx --image_sizes 128,256,512
+
+This copies res/raw/*.textpb and everything under assets/ to the app's external files directory,
+/sdcard/Android/data/<package>/files/dev, which the provider can read without any permissions, e.g.
+    new File(getContext().getExternalFilesDir(null), "dev")
+Pass --device_dir to copy them somewhere else.
+
+Only the files that changed are copied, and only the build steps they affect are re-run:
+  - Text protos named after a DlcType tag are checked with --descriptor_set before they're copied,
+    so a typo is reported here instead of as an "exception" in the app.
+  - Edits to info pages rebuild the --search_index, as search-index.py would.
+  - Edits to images regenerate their --image_sizes variants, as image-variants.py would.
+Rebuilt files are written to the source directory, as the tools write them, and copied with the edits.
+Deleted files are deleted from the device too.
+"""
+import argparse
+import importlib
+import os
+import shlex
+import subprocess
+import sys
+import time
+
+import content_pack
+
+RAW_DIRECTORY = "res/raw"
+ASSETS_DIRECTORY = "assets"
+
+
+def scan(source_dir):
+    """Returns {path relative to source_dir: (modification time, size)} for every file the provider can serve."""
+    files = {}
+    raw_dir = os.path.join(source_dir, RAW_DIRECTORY)
+    if os.path.isdir(raw_dir):
+        for filename in os.listdir(raw_dir):
+            if filename.endswith(".textpb"):
+                stat = os.stat(os.path.join(raw_dir, filename))
+                files[RAW_DIRECTORY + "/" + filename] = (stat.st_mtime_ns, stat.st_size)
+    assets_dir = os.path.join(source_dir, ASSETS_DIRECTORY)
+    for directory, _, filenames in os.walk(assets_dir):
+        for filename in filenames:
+            if filename.endswith(".tmp"):
+                continue
+            path = os.path.join(directory, filename)
+            stat = os.stat(path)
+            files[ASSETS_DIRECTORY + "/" + content_pack.asset_path(assets_dir, path)] = (stat.st_mtime_ns, stat.st_size)
+    return files
+
+
+class Device(object):
+    def __init__(self, adb, serial, device_dir):
+        self.command = [adb] + (["-s", serial] if serial else [])
+        self.device_dir = device_dir.rstrip("/")
+
+    def push(self, local_path, path):
+        subprocess.run(self.command + ["push", local_path, self.device_dir + "/" + path],
+                       check=True, stdout=subprocess.DEVNULL)
+
+    def remove(self, path):
+        # adb shell joins its arguments into one command line for the device's shell, so the path is quoted for it.
+        subprocess.run(self.command + ["shell", "rm", "-f", shlex.quote(self.device_dir + "/" + path)], check=True)
+
+
+class Watcher(object):
+    def __init__(self, args, device):
+        self.source_dir = args.source
+        self.assets_dir = os.path.join(args.source, ASSETS_DIRECTORY)
+        self.device = device
+        self.search_index = args.search_index
+        self.image_sizes = sorted({int(size) for size in args.image_sizes.split(",")}) if args.image_sizes else []
+        self.compiler = content_pack.TextProtoCompiler(args.descriptor_set) if args.descriptor_set else None
+        self.files = {}
+
+    def check(self, path):
+        """Returns an error message if the file is a text proto that doesn't parse, or None."""
+        tag = os.path.splitext(os.path.basename(path))[0]
+        if not self.compiler or not path.startswith(RAW_DIRECTORY + "/") or tag not in content_pack.DLC_TYPES:
+            return None
+        with open(os.path.join(self.source_dir, path), encoding="utf-8") as dlc_file:
+            text = dlc_file.read()
+        try:
+            self.compiler.compile(content_pack.DLC_TYPES[tag], text)
+        except Exception as ex:
+            return str(ex)
+        return None
+
+    def rebuild(self, changed, removed):
+        """Re-runs the build steps affected by the changed and removed paths. Returns True if any were run."""
+        rebuilt = False
+        info_changed = any(path.endswith(".md") for path in changed | removed)
+        if self.search_index and info_changed:
+            search_index = importlib.import_module("search-index")
+            pages, terms = search_index.build_index(self.assets_dir)
+            output = os.path.join(self.assets_dir, self.search_index)
+            with open(output + ".tmp", "wb") as index_file:
+                index_file.write(content_pack.encode_search_index(pages, terms))
+            os.replace(output + ".tmp", output)
+            print("Rebuilt {}".format(self.search_index))
+            rebuilt = True
+
+        images = [path for path in changed
+                  if os.path.splitext(path)[1].lower() in content_pack.IMAGE_EXTENSIONS and not content_pack.is_variant(path)]
+        if self.image_sizes and images:
+            image_variants = importlib.import_module("image-variants")
+            if image_variants.Image is None:
+                sys.exit("--image_sizes requires Pillow. Install it with 'pip install Pillow'.")
+            # Variants are only rewritten when they're older than their originals, i.e. for the changed images.
+            written, _, _ = image_variants.generate_variants(self.assets_dir, self.image_sizes, clean=False)
+            print("Wrote {} image variants".format(written))
+            rebuilt = rebuilt or written > 0
+        return rebuilt
+
+    def sync(self):
+        """Copies the changes since the last sync to the device. Returns the number of files copied and removed."""
+        start = time.perf_counter()
+        files = scan(self.source_dir)
+        changed = {path for path, state in files.items() if self.files.get(path) != state}
+        removed = set(self.files) - set(files)
+        if not changed and not removed:
+            return 0
+        if self.rebuild(changed, removed):
+            # Copy the rebuilt files along with the edits that caused them.
+            files = scan(self.source_dir)
+            changed = {path for path, state in files.items() if self.files.get(path) != state}
+            removed = set(self.files) - set(files)
+
+        copied = 0
+        for path in sorted(changed):
+            error = self.check(path)
+            if error:
+                print("Not copying {}: {}".format(path, error))
+                continue
+            self.device.push(os.path.join(self.source_dir, path), path)
+            copied += 1
+        for path in sorted(removed):
+            self.device.remove(path)
+        # Files that failed their check are retried when they next change.
+        self.files = files
+        print("Copied {} and removed {} files in {:.0f} ms".format(copied, len(removed), (time.perf_counter() - start) * 1000))
+        return copied + len(removed)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--source", required=True, help="The directory holding res/raw and assets, e.g. src/main.")
+    parser.add_argument("--package", help="The content pack's application id, to copy to its external files directory.")
+    parser.add_argument("--device_dir", help="The directory on the device to copy to, instead of the one for --package.")
+    parser.add_argument("--descriptor_set", help="A FileDescriptorSet for model.proto, to check text protos before copying them.")
+    parser.add_argument("--search_index", help="The search index to rebuild when info pages change, relative to assets.")
+    parser.add_argument("--image_sizes", help="Comma-separated image variant sizes to regenerate when images change.")
+    parser.add_argument("--adb", default="adb", help="The adb executable.")
+    parser.add_argument("--serial", help="The serial number of the device, if more than one is connected.")
+    parser.add_argument("--interval", type=float, default=0.2, help="Seconds between scans of the source directory.")
+    parser.add_argument("--once", action="store_true", help="Copy everything once and exit, instead of watching.")
+    args = parser.parse_args(argv)
+
+    if not args.device_dir and not args.package:
+        parser.error("Pass --package or --device_dir.")
+    device_dir = args.device_dir or "/sdcard/Android/data/{}/files/dev".format(args.package)
+    watcher = Watcher(args, Device(args.adb, args.serial, device_dir))
+
+    print("Copying {} to {}".format(args.source, device_dir))
+    watcher.sync()
+    if args.once:
+        return
+    print("Watching for changes. Press Ctrl+C to stop.")
+    try:
+        while True:
+            time.sleep(args.interval)
+            watcher.sync()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
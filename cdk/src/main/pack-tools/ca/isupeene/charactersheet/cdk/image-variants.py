@@ -0,0 +1,96 @@
+"""
+Generates downscaled variants of each image in a content pack's assets directory, so that
+ContentProviderBase can serve an image close to the size the app will display it at.
+
+Example:
+    python image-variants.py --assets src/main/assets --sizes 128,256,512
+
+Each variant is written next to its original and named after its longest side, e.g.
+images/dragon@256.png for images/dragon.png. Sizes at least as large as the original are skipped,
+as are animated images. Variants are only regenerated when the original is newer, and variants
+whose size is no longer requested are deleted with --clean.
+
+Run this before pack-container.py and pack-manifest.py, so that the variants are packed and listed too.
+Requires Pillow (pip install Pillow).
+"""
+import argparse
+import os
+import sys
+
+import content_pack
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+# The save options for each format, favouring small files over encoding time.
+SAVE_OPTIONS = {
+    "JPEG": {"quality": 85, "optimize": True, "progressive": True},
+    "PNG": {"optimize": True},
+    "WEBP": {"quality": 85, "method": 6},
+}
+
+
+def resize(source_path, variant_path, size):
+    """Writes a copy of the image at source_path scaled so that its longest side is 'size' pixels."""
+    with Image.open(source_path) as image:
+        scale = size / max(image.size)
+        variant_size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+        resampling = getattr(Image, "Resampling", Image).LANCZOS
+        variant = image.resize(variant_size, resampling)
+        options = SAVE_OPTIONS.get(image.format, {})
+        temporary_path = variant_path + ".tmp"
+        variant.save(temporary_path, format=image.format, **options)
+    os.replace(temporary_path, variant_path)
+
+
+def generate_variants(assets_dir, sizes, clean):
+    """Returns the number of variants written, skipped as up to date, and deleted."""
+    written = skipped = deleted = 0
+    originals = [path for path in content_pack.find_images(assets_dir) if not content_pack.is_variant(path)]
+    for content_path in originals:
+        source_path = os.path.join(assets_dir, content_path)
+        with Image.open(source_path) as image:
+            longest_side = max(image.size)
+            animated = getattr(image, "is_animated", False)
+        wanted = set() if animated else {size for size in sizes if size < longest_side}
+
+        for size in sorted(wanted):
+            variant_path = os.path.join(assets_dir, content_pack.variant_path(content_path, size))
+            if os.path.exists(variant_path) and os.path.getmtime(variant_path) >= os.path.getmtime(source_path):
+                skipped += 1
+                continue
+            resize(source_path, variant_path, size)
+            written += 1
+
+        if clean:
+            stem, extension = os.path.splitext(os.path.basename(source_path))
+            directory = os.path.dirname(source_path)
+            for filename in os.listdir(directory):
+                match = content_pack.VARIANT_PATTERN.match(filename)
+                if match and match.group(1) == stem and (match.group(3) or "") == extension and int(match.group(2)) not in wanted:
+                    os.remove(os.path.join(directory, filename))
+                    deleted += 1
+    return written, skipped, deleted
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--assets", required=True, help="The directory holding the content pack's images.")
+    parser.add_argument("--sizes", default="128,256,512", help="Comma-separated sizes, in pixels along the longest side.")
+    parser.add_argument("--clean", action="store_true", help="Delete variants whose size isn't in --sizes.")
+    args = parser.parse_args(argv)
+
+    if Image is None:
+        sys.exit("image-variants.py requires Pillow. Install it with 'pip install Pillow'.")
+    sizes = sorted({int(size) for size in args.sizes.split(",")})
+    if any(size <= 0 for size in sizes):
+        sys.exit("Sizes must be positive, got {}".format(args.sizes))
+
+    written, skipped, deleted = generate_variants(args.assets, sizes, args.clean)
+    print("Wrote {} variants, {} already up to date, {} deleted".format(written, skipped, deleted))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,93 @@
+"""
+Packs a content pack's DlcType resources, info directories and images into a single
+container asset, to be served by ContentProviderBase through DlcContainer.
+
+Example:
+    python pack-container.py --output src/main/assets/content.dlc \\
+        --dlc classes=src/content/raw/classes.textpb --dlc spells=src/content/raw/spells.textpb \\
+        --assets src/content/assets
+
+Keep the packed sources out of src/main/res and src/main/assets, or they'll be shipped twice,
+and make sure the container is stored uncompressed: aaptOptions { noCompress 'dlc' }.
+
+Text protos are packed as-is and parsed on the device. Pass --descriptor_set with the output of
+'protoc --include_imports -o model.desc model.proto' to compile them to binary protos at build time instead.
+"""
+import argparse
+import os
+import struct
+import sys
+
+import content_pack
+
+MAGIC = b"CSDC"
+VERSION = 1
+
+KIND_DLC_TYPE = 0
+KIND_INFO = 1
+KIND_IMAGE = 2
+
+ENCODING_TEXT = 0
+ENCODING_BINARY = 1
+
+HEADER_FORMAT = ">4sHHI"
+ENTRY_FORMAT = ">BBH{}sQQ32s"
+
+
+def collect_entries(dlc_paths, assets_dir, compiler):
+    """Returns a list of (kind, encoding, key, payload) tuples, in a deterministic order."""
+    entries = []
+    for tag, path in sorted(dlc_paths.items()):
+        with open(path, "rb") as dlc_file:
+            payload = dlc_file.read()
+        if compiler:
+            payload = compiler.compile(content_pack.DLC_TYPES[tag], payload.decode("utf-8"))
+            entries.append((KIND_DLC_TYPE, ENCODING_BINARY, tag, payload))
+        else:
+            entries.append((KIND_DLC_TYPE, ENCODING_TEXT, tag, payload))
+    if assets_dir:
+        for content_path, pages in content_pack.find_info_directories(assets_dir).items():
+            payload = content_pack.encode_multi_page_info(os.path.join(assets_dir, content_path), pages)
+            entries.append((KIND_INFO, ENCODING_BINARY, content_path, payload))
+        for content_path in content_pack.find_images(assets_dir):
+            with open(os.path.join(assets_dir, content_path), "rb") as image_file:
+                entries.append((KIND_IMAGE, ENCODING_BINARY, content_path, image_file.read()))
+    return entries
+
+
+def write_container(entries, output):
+    encoded_keys = [key.encode("utf-8") for _, _, key, _ in entries]
+    table_size = struct.calcsize(HEADER_FORMAT) + sum(struct.calcsize(ENTRY_FORMAT.format(len(k))) for k in encoded_keys)
+
+    output.write(struct.pack(HEADER_FORMAT, MAGIC, VERSION, 0, len(entries)))
+    offset = table_size
+    for (kind, encoding, _, payload), key in zip(entries, encoded_keys):
+        output.write(struct.pack(ENTRY_FORMAT.format(len(key)), kind, encoding, len(key), key,
+                                 offset, len(payload), content_pack.sha256(payload)))
+        offset += len(payload)
+    for _, _, _, payload in entries:
+        output.write(payload)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", required=True, help="The container file to write.")
+    parser.add_argument("--dlc", action="append", default=[], metavar="TAG=PATH",
+                        help="A text proto resource, keyed by its DlcType tag. May be repeated.")
+    parser.add_argument("--assets", help="The directory holding info directories and images, laid out as under src/main/assets.")
+    parser.add_argument("--descriptor_set", help="A FileDescriptorSet for model.proto. If set, text protos are compiled to binary.")
+    args = parser.parse_args(argv)
+
+    compiler = content_pack.TextProtoCompiler(args.descriptor_set) if args.descriptor_set else None
+    entries = collect_entries(content_pack.parse_dlc_arguments(args.dlc), args.assets, compiler)
+
+    # Write to a temporary file first so that a failed build never leaves a truncated container behind.
+    temporary_output = args.output + ".tmp"
+    with open(temporary_output, "wb") as output:
+        write_container(entries, output)
+    os.replace(temporary_output, args.output)
+    print("Packed {} entries into {}".format(len(entries), args.output))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,73 @@
+"""
+Builds a text-format ContentManifest listing the hash and size of each of a content pack's
+DlcType resources, info directories and images, to be served by ContentProviderBase.
+
+Example:
+    python pack-manifest.py --output src/main/assets/manifest.textpb \\
+        --dlc classes=src/main/res/raw/classes.textpb --dlc spells=src/main/res/raw/spells.textpb \\
+        --assets src/main/assets
+
+Then return "manifest.textpb" from ContentProviderBase.ManifestAssetPath(). Providers that use a
+container don't need a manifest asset, since the container's table of contents already has the hashes.
+"""
+import argparse
+import hashlib
+import os
+import sys
+
+import content_pack
+
+# The order of ContentManifest.Entry.Kind, which the manifest version is computed over.
+KINDS = ["DLC_TYPE", "INFO", "IMAGE"]
+
+
+def collect_entries(dlc_paths, assets_dir):
+    """Returns a list of (kind, key, payload) tuples."""
+    entries = []
+    for tag, path in dlc_paths.items():
+        with open(path, "rb") as dlc_file:
+            entries.append(("DLC_TYPE", tag, dlc_file.read()))
+    if assets_dir:
+        for content_path, pages in content_pack.find_info_directories(assets_dir).items():
+            payload = content_pack.encode_multi_page_info(os.path.join(assets_dir, content_path), pages)
+            entries.append(("INFO", content_path, payload))
+        for content_path in content_pack.find_images(assets_dir):
+            with open(os.path.join(assets_dir, content_path), "rb") as image_file:
+                entries.append(("IMAGE", content_path, image_file.read()))
+    return entries
+
+
+def build_manifest(entries):
+    """Returns the manifest's version and its (kind, key, hash, size) entries, computed as ContentProviderBase does."""
+    manifest_entries = sorted(
+        ((kind, key, content_pack.sha256(payload).hex(), len(payload)) for kind, key, payload in entries),
+        key=lambda entry: (KINDS.index(entry[0]), entry[1]))
+    version = hashlib.sha256()
+    for kind, key, hash, _ in manifest_entries:
+        version.update("{}/{}/{}\n".format(kind, key, hash).encode("utf-8"))
+    return version.hexdigest(), manifest_entries
+
+
+def write_manifest(version, manifest_entries, output):
+    output.write("version: {}\n".format(content_pack.text_format_string(version)))
+    for kind, key, hash, size in manifest_entries:
+        output.write("entry {{ kind: {} key: {} hash: {} size: {} }}\n".format(
+            kind, content_pack.text_format_string(key), content_pack.text_format_string(hash), size))
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", required=True, help="The manifest file to write.")
+    parser.add_argument("--dlc", action="append", default=[], metavar="TAG=PATH",
+                        help="A text proto resource, keyed by its DlcType tag. May be repeated.")
+    parser.add_argument("--assets", help="The directory holding info directories and images.")
+    args = parser.parse_args(argv)
+
+    version, manifest_entries = build_manifest(collect_entries(content_pack.parse_dlc_arguments(args.dlc), args.assets))
+    with open(args.output, "w", encoding="utf-8") as output:
+        write_manifest(version, manifest_entries, output)
+    print("Wrote {} entries to {} (version {})".format(len(manifest_entries), args.output, version))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
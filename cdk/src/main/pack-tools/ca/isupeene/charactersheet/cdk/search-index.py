@@ -0,0 +1,96 @@
+"""
+Builds a SearchIndex over the markdown pages of a content pack's info directories, so that
+ContentProviderBase can answer "search" calls without reading every page.
+
+Example:
+    python search-index.py --assets src/main/assets --output src/main/assets/search.idx
+
+Then return "search.idx" from ContentProviderBase.SearchIndexAssetPath(). Rebuild the index
+whenever the info pages change, or search results will point at the wrong pages.
+
+The index keeps the first --excerpt_length characters of each page, so that search results can show
+a snippet without reading the page. Matches past the excerpt are shown with the start of the page.
+"""
+import argparse
+import collections
+import os
+import re
+import sys
+
+import content_pack
+
+# Must match TERM_PATTERN in InfoSearch.java: runs of letters and digits.
+TERM_PATTERN = re.compile(r"[^\W_]+")
+# Long enough to hold a snippet around any match in a page's first couple of paragraphs.
+DEFAULT_EXCERPT_LENGTH = 400
+
+
+def utf16_offsets(text):
+    """Returns a function mapping code point offsets in text to UTF-16 offsets, as used by java Strings."""
+    if all(ord(c) < 0x10000 for c in text):
+        return lambda offset: offset
+    prefix = [0]
+    for c in text:
+        prefix.append(prefix[-1] + (2 if ord(c) >= 0x10000 else 1))
+    return lambda offset: prefix[offset]
+
+
+def index_page(text):
+    """Returns the page's term count, and {term: (frequency, first offset)}."""
+    to_utf16 = utf16_offsets(text)
+    term_count = 0
+    frequencies = collections.Counter()
+    first_offsets = {}
+    for match in TERM_PATTERN.finditer(text):
+        term = match.group().lower()
+        term_count += 1
+        frequencies[term] += 1
+        if term not in first_offsets:
+            first_offsets[term] = to_utf16(match.start())
+    return term_count, {term: (frequency, first_offsets[term]) for term, frequency in frequencies.items()}
+
+
+def excerpt(text, length):
+    """Returns (the start of the text, cut at a word boundary near the length, whether the text continues past it)."""
+    if len(text) <= length:
+        return text, False
+    cut = text.rfind(" ", 0, length + 1)
+    cut = max(cut, text.rfind("\n", 0, length + 1))
+    return text[:cut if cut > 0 else length], True
+
+
+def build_index(assets_dir, excerpt_length=DEFAULT_EXCERPT_LENGTH):
+    """Returns (pages, terms) as expected by content_pack.encode_search_index."""
+    pages = []
+    postings = collections.defaultdict(list)
+    for content_path, filenames in content_pack.find_info_directories(assets_dir).items():
+        for page_index, filename in enumerate(filenames):
+            text = content_pack.read_page_text(os.path.join(assets_dir, content_path, filename))
+            term_count, page_terms = index_page(text)
+            for term, (frequency, first_offset) in page_terms.items():
+                postings[term].append((len(pages), frequency, first_offset))
+            pages.append((content_path, page_index, filename.split(".")[1], term_count) + excerpt(text, excerpt_length))
+    # Sort terms by UTF-16 code units, the order java's String.compareTo uses to search them.
+    terms = sorted(postings.items(), key=lambda item: item[0].encode("utf-16-be"))
+    return pages, terms
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--assets", required=True, help="The directory holding the content pack's info directories.")
+    parser.add_argument("--output", required=True, help="The index file to write.")
+    parser.add_argument("--excerpt_length", type=int, default=DEFAULT_EXCERPT_LENGTH,
+                        help="The number of characters of each page to keep for search result snippets.")
+    args = parser.parse_args(argv)
+
+    pages, terms = build_index(args.assets, args.excerpt_length)
+    index = content_pack.encode_search_index(pages, terms)
+    temporary_path = args.output + ".tmp"
+    with open(temporary_path, "wb") as output:
+        output.write(index)
+    os.replace(temporary_path, args.output)
+    print("Indexed {} terms in {} pages into {} ({} bytes)".format(len(terms), len(pages), args.output, len(index)))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
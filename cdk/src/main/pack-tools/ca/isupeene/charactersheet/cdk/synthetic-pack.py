@@ -0,0 +1,240 @@
+"""
+Generates a synthetic content pack of any size, to benchmark ContentProviderBase against with
+ProviderBenchmark.java when real packs are too small, too few, or can't be shared.
+
+Example:
+    python synthetic-pack.py --descriptor_set model.desc --output build/synthetic --elements 2000
+
+The cdk's generateSyntheticPacks task runs this at several sizes, and packs the results into the
+instrumented tests' assets for ProviderBenchmarkTest.java.
+
+This writes a text proto for each DlcType to res/raw/<tag>.textpb, info directories of markdown
+pages to assets/info/, and PNG images to assets/images/. Every field of the generated messages is
+filled in at random, down to --max_depth nested messages, so the content has the shape of a real
+pack without making sense. Generation is deterministic for a given --seed.
+
+The InfoSources and ImageSources in the content point at the generated assets, and class_spells
+refers to the generated classes and spells, so "info", "image" and "query" calls can be benchmarked
+too. Run search-index.py, image-variants.py, pack-container.py and pack-manifest.py over the output
+as you would for a real pack.
+"""
+import argparse
+import os
+import random
+import struct
+import sys
+import zlib
+
+from google.protobuf import descriptor_pb2
+
+import content_pack
+
+# Content is generated in this order, so that class_spells can refer to the classes and spells.
+GENERATION_ORDER = ["backgrounds", "classes", "feats", "items", "races", "spells", "talents", "class_spells"]
+
+# (message type, field name) -> the message type whose generated names the field refers to.
+NAME_REFERENCES = {
+    ("ClassSpells", "class_name"): "Class",
+    ("ClassSpells", "spell"): "Spell",
+}
+
+WORDS = (
+    "arcane blade bolt cleric crown dagger dragon dungeon elder ember fey flame frost gauntlet giant "
+    "glyph grave guardian healing hex hunter iron keep knight lantern lich mage moon oath orb paladin "
+    "phantom potion radiant ranger relic rogue rune sacred scroll shadow shield sigil silver spirit "
+    "staff storm sword thunder tome totem vault veil ward warden whisper wild wyrm"
+).split()
+
+Field = descriptor_pb2.FieldDescriptorProto
+FLOATING_POINT_TYPES = {Field.TYPE_DOUBLE, Field.TYPE_FLOAT}
+INTEGER_TYPES = {Field.TYPE_INT64, Field.TYPE_UINT64, Field.TYPE_INT32, Field.TYPE_UINT32}
+
+
+def load_descriptors(descriptor_set_path):
+    """Returns ({message name: DescriptorProto}, {enum name: [value names]}) for model.proto, keyed by name without the package."""
+    with open(descriptor_set_path, "rb") as descriptor_set_file:
+        descriptor_set = descriptor_pb2.FileDescriptorSet.FromString(descriptor_set_file.read())
+    messages = {}
+    enums = {}
+
+    def add(message_type, prefix):
+        name = prefix + message_type.name
+        messages[name] = message_type
+        for enum_type in message_type.enum_type:
+            enums[name + "." + enum_type.name] = [value.name for value in enum_type.value]
+        for nested_type in message_type.nested_type:
+            add(nested_type, name + ".")
+
+    for file_descriptor in descriptor_set.file:
+        if file_descriptor.package != content_pack.PACKAGE:
+            continue
+        for enum_type in file_descriptor.enum_type:
+            enums[enum_type.name] = [value.name for value in enum_type.value]
+        for message_type in file_descriptor.message_type:
+            add(message_type, "")
+    return messages, enums
+
+
+def words(rng, low, high):
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(low, high)))
+
+
+class ContentGenerator(object):
+    def __init__(self, messages, enums, rng, info_paths, image_paths, max_depth):
+        self.messages = messages
+        self.enums = enums
+        self.rng = rng
+        self.info_paths = info_paths
+        self.image_paths = image_paths
+        self.max_depth = max_depth
+        # The names generated for each message type, so that other content can refer to them.
+        self.names = {}
+
+    def type_name(self, field):
+        return field.type_name.replace(".{}.".format(content_pack.PACKAGE), "", 1)
+
+    def string_value(self, message_name, field):
+        reference = NAME_REFERENCES.get((message_name, field.name))
+        if reference and self.names.get(reference):
+            return self.rng.choice(self.names[reference])
+        if field.name == "name":
+            names = self.names.setdefault(message_name, [])
+            name = "{} {}".format(words(self.rng, 1, 2).title(), len(names) + 1)
+            names.append(name)
+            return name
+        if field.name == "content_path":
+            paths = self.image_paths if message_name == "ImageSource" else self.info_paths
+            return self.rng.choice(paths) if paths else ""
+        if "description" in field.name or field.name in ("text", "content"):
+            return words(self.rng, 10, 60)
+        return words(self.rng, 1, 4)
+
+    def scalar_value(self, message_name, field):
+        if field.type == Field.TYPE_STRING:
+            return content_pack.text_format_string(self.string_value(message_name, field))
+        if field.type == Field.TYPE_BOOL:
+            return "true"
+        if field.type in INTEGER_TYPES:
+            return str(self.rng.randint(1, 9 if "level" in field.name else 20))
+        if field.type in FLOATING_POINT_TYPES:
+            return "{:.2f}".format(self.rng.uniform(0, 100))
+        if field.type == Field.TYPE_ENUM:
+            return self.rng.choice(self.enums[self.type_name(field)])
+        raise ValueError("Unsupported field type {} for {}.{}".format(field.type, message_name, field.name))
+
+    def write_message(self, output, message_name, depth):
+        """Writes the fields of a random message_name at the given nesting depth."""
+        message_type = self.messages[message_name]
+        indent = "  " * depth
+        nested = depth < self.max_depth
+
+        # Set one member of each oneof, preferring content paths so that sources point at the generated assets.
+        chosen_members = set()
+        for oneof_index in range(len(message_type.oneof_decl)):
+            members = [field for field in message_type.field if field.HasField("oneof_index") and field.oneof_index == oneof_index]
+            members = [field for field in members if nested or field.type != Field.TYPE_MESSAGE]
+            preferred = [field for field in members if field.name == "content_path"]
+            if preferred or members:
+                chosen_members.add((preferred or [self.rng.choice(members)])[0].name)
+
+        for field in message_type.field:
+            if field.type == Field.TYPE_BYTES:
+                continue
+            if (message_name, field.name) in NAME_REFERENCES:
+                # Always fill in references, e.g. so that every class has spells to query.
+                count = self.rng.randint(5, 30) if field.label == Field.LABEL_REPEATED else 1
+            elif field.HasField("oneof_index"):
+                count = 1 if field.name in chosen_members else 0
+            elif field.label == Field.LABEL_REPEATED:
+                count = self.rng.randint(0, 3) if nested or field.type != Field.TYPE_MESSAGE else 0
+            elif field.type == Field.TYPE_MESSAGE:
+                count = 1 if nested and self.rng.random() < 0.5 else 0
+            else:
+                count = 1 if self.rng.random() < 0.8 else 0
+
+            for _ in range(count):
+                if field.type == Field.TYPE_MESSAGE:
+                    output.append("{}{} {{\n".format(indent, field.name))
+                    self.write_message(output, self.type_name(field), depth + 1)
+                    output.append("{}}}\n".format(indent))
+                else:
+                    output.append("{}{}: {}\n".format(indent, field.name, self.scalar_value(message_name, field)))
+
+    def generate_list(self, list_name, elements):
+        """Returns a text proto of list_name, with 'elements' entries in its first field and a tenth as many in the others."""
+        output = []
+        for index, field in enumerate(self.messages[list_name].field):
+            for _ in range(elements if index == 0 else elements // 10):
+                output.append("{} {{\n".format(field.name))
+                self.write_message(output, self.type_name(field), 1)
+                output.append("}\n")
+        return "".join(output)
+
+
+def png(width, height, seed):
+    """Encodes a gradient as an RGB PNG, without depending on Pillow."""
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF)
+
+    rows = bytearray()
+    for y in range(height):
+        rows.append(0)  # No filter.
+        for x in range(width):
+            rows += bytes(((x * 255 // width + seed) & 0xFF, (y * 255 // height) & 0xFF, (x ^ y ^ seed) & 0xFF))
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", zlib.compress(bytes(rows), 6)) + chunk(b"IEND", b"")
+
+
+def write_file(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as output:
+        output.write(data)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--descriptor_set", required=True, help="A FileDescriptorSet for model.proto.")
+    parser.add_argument("--output", required=True, help="The directory to write res/raw and assets to.")
+    parser.add_argument("--elements", type=int, default=200, help="The number of elements in each list, e.g. spells.")
+    parser.add_argument("--info", type=int, default=20, help="The number of info directories.")
+    parser.add_argument("--pages", type=int, default=3, help="The number of pages in each info directory.")
+    parser.add_argument("--images", type=int, default=10, help="The number of images.")
+    parser.add_argument("--image_size", type=int, default=256, help="The width and height of each image, in pixels.")
+    parser.add_argument("--max_depth", type=int, default=4, help="The deepest nesting of generated messages.")
+    parser.add_argument("--seed", type=int, default=0, help="The random seed.")
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    assets_dir = os.path.join(args.output, "assets")
+
+    info_paths = []
+    for info_index in range(args.info):
+        content_path = "info/{}_{}".format(words(rng, 1, 1), info_index)
+        for page_index in range(args.pages):
+            title = words(rng, 1, 3).title().replace(" ", "_")
+            paragraphs = "\n\n".join(words(rng, 40, 120).capitalize() + "." for _ in range(rng.randint(2, 6)))
+            text = "# {}\n\n{}\n".format(title.replace("_", " "), paragraphs)
+            write_file(os.path.join(assets_dir, content_path, "{:02d}.{}.md".format(page_index + 1, title)), text.encode("utf-8"))
+        info_paths.append(content_path)
+
+    image_paths = []
+    for image_index in range(args.images):
+        content_path = "images/{}_{}.png".format(words(rng, 1, 1), image_index)
+        write_file(os.path.join(assets_dir, content_path), png(args.image_size, args.image_size, image_index * 37))
+        image_paths.append(content_path)
+
+    messages, enums = load_descriptors(args.descriptor_set)
+    generator = ContentGenerator(messages, enums, rng, info_paths, image_paths, args.max_depth)
+    compiler = content_pack.TextProtoCompiler(args.descriptor_set)
+    for tag in GENERATION_ORDER:
+        list_name = content_pack.DLC_TYPES[tag]
+        text = generator.generate_list(list_name, args.elements)
+        # Make sure the generated text is valid before writing it.
+        binary = compiler.compile(list_name, text)
+        write_file(os.path.join(args.output, "res", "raw", tag + ".textpb"), text.encode("utf-8"))
+        print("{:<14}{:>12} text bytes{:>12} binary bytes".format(tag, len(text.encode("utf-8")), len(binary)))
+    print("Wrote {} info directories and {} images to {}".format(len(info_paths), len(image_paths), assets_dir))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,222 @@
+import concurrent.futures
+import io
+import json
+import os
+import re
+import time
+from concurrent.futures.process import BrokenProcessPool
+
+from google.protobuf import descriptor_pb2 as descriptor
+from google.protobuf.compiler import plugin_pb2 as plugin
+
+import comment_tree
+
+# Unless a number of jobs is given, requests with fewer fields than this, counted across every message type
+# including nested ones, are generated serially, since starting worker processes would cost more than it saves.
+# The plugins spend around 10 microseconds per field, while starting a pool of workers takes tens of
+# milliseconds, or hundreds on Windows where workers are spawned. model.proto has a little over 400 fields.
+MIN_PARALLEL_FIELDS = 10000
+
+
+def parse_parameters(parameter):
+    """Parses a plugin parameter string of the form 'key=value,key2=value2' into a dict."""
+    parameters = {}
+    for item in filter(None, parameter.split(",")):
+        key, _, value = item.partition("=")
+        parameters[key.strip()] = value.strip()
+    return parameters
+
+
+def java_file_path(request_file):
+    """The path of the outer class generated by protoc for a .proto file, e.g. 'ca/isupeene/charactersheet/cdk/Model.java'."""
+    return "/".join(request_file.package.split(".") + [request_file.name.split("/")[-1].split(".")[0].capitalize() + ".java"])
+
+
+def java_package_path(request):
+    """The directory of the generated java package, e.g. 'ca/isupeene/charactersheet/cdk'."""
+    return "/".join(request.proto_file[-1].package.split(".")) if request.proto_file else ""
+
+
+def nested_message_types(message_descriptor: descriptor.DescriptorProto, prefix):
+    nested_descriptors = {}
+    for nested_type in message_descriptor.nested_type:
+        qualified_name = '.'.join([prefix, nested_type.name])
+        nested_descriptors[qualified_name] = nested_type
+        nested_descriptors |= nested_message_types(nested_type, qualified_name)
+    return nested_descriptors
+
+
+def message_types(message_type: descriptor.DescriptorProto):
+    """Returns {qualified name: descriptor} for a top-level message type and all the message types nested in it."""
+    return {message_type.name: message_type} | nested_message_types(message_type, message_type.name)
+
+
+def all_message_types(file_descriptor: descriptor.FileDescriptorProto):
+    message_descriptors = {}
+    for message_type in file_descriptor.message_type:
+        message_descriptors |= message_types(message_type)
+    return message_descriptors
+
+
+def field_count(message_type: descriptor.DescriptorProto):
+    """The number of fields in a message type and all the message types nested in it, as an estimate of the work to generate it."""
+    return sum(len(nested_type.field) for nested_type in message_types(message_type).values())
+
+
+class SourceWriter(object):
+    """
+    Accumulates generated source in a single buffer, so that large outputs are written
+    piece by piece instead of being rebuilt by repeated joins and formats.
+    """
+
+    def __init__(self):
+        self._buffer = io.StringIO()
+
+    def write(self, text):
+        self._buffer.write(text)
+
+    def write_template(self, template, **kwargs):
+        self._buffer.write(template.format(**kwargs))
+
+    def getvalue(self):
+        return self._buffer.getvalue()
+
+
+# Per-process state for worker processes. The request is sent to each worker once, rather than once per task.
+_request = None
+_comment_trees = {}
+
+
+def _initialize_worker(serialized_request):
+    global _request
+    _request = plugin.CodeGeneratorRequest.FromString(serialized_request)
+    _comment_trees.clear()
+
+
+def file_comment_tree(request_file):
+    """The comment tree for a file in the request, built at most once per process."""
+    if request_file.name not in _comment_trees:
+        _comment_trees[request_file.name] = comment_tree.build_comment_tree(request_file)
+    return _comment_trees[request_file.name]
+
+
+def _generate_task(task):
+    generate_message, file_index, message_index = task
+    request_file = _request.proto_file[file_index]
+    return generate_message(request_file, request_file.message_type[message_index])
+
+
+def generate_messages(request, generate_message, jobs=None):
+    """
+    Calls generate_message(request_file, top_level_message_type) for every top-level message type
+    in every file of the request, and returns the results in file and message order, so the
+    output is identical no matter how the work is scheduled.
+
+    generate_message must be a module-level function, so that it can be sent to worker processes.
+    With 'jobs' set above 1, the work is spread across a process pool with that many workers. Otherwise
+    requests with at least MIN_PARALLEL_FIELDS fields are spread across a pool with one worker per core.
+    """
+    global _request
+    tasks = [(generate_message, file_index, message_index)
+             for file_index, request_file in enumerate(request.proto_file)
+             for message_index in range(len(request_file.message_type))]
+    if jobs:
+        worker_count = jobs
+    elif sum(field_count(message_type)
+             for request_file in request.proto_file
+             for message_type in request_file.message_type) >= MIN_PARALLEL_FIELDS:
+        worker_count = os.cpu_count() or 1
+    else:
+        worker_count = 1
+
+    if worker_count > 1:
+        try:
+            with concurrent.futures.ProcessPoolExecutor(
+                    max_workers=worker_count,
+                    initializer=_initialize_worker,
+                    initargs=(request.SerializeToString(),)) as executor:
+                return list(executor.map(_generate_task, tasks, chunksize=max(1, len(tasks) // (worker_count * 4))))
+        except (OSError, NotImplementedError, BrokenProcessPool):
+            # Some sandboxed build environments can't start processes. Fall back to generating serially.
+            pass
+
+    _request = request
+    return [_generate_task(task) for task in tasks]
+
+
+# Comments and string literals are stripped before counting, so that words like 'class' in them aren't counted.
+_COMMENT_OR_STRING_PATTERN = re.compile(r'/\*.*?\*/|//[^\n]*|"(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\'', re.DOTALL)
+_METHOD_PATTERN = re.compile(
+    r"^[ \t]*((?:@\w+\s+|(?:public|protected|private|static|final|synchronized|abstract)\s+)*\w[\w.<>\[\]?, ]*?)\s+(\w+)\s*\([^;{}()]*\)\s*(?:throws\s+[\w., ]+)?\{",
+    re.MULTILINE)
+_NOT_METHOD_TYPES = {"new", "return", "throw", "else"}
+_NAMED_CLASS_PATTERN = re.compile(r"\b(?:class|interface|enum)\s+\w+")
+_ANONYMOUS_CLASS_PATTERN = re.compile(r"\bnew\s+[\w.<>]+\s*\([^;{}]*\)\s*\{")
+
+
+def measure(source):
+    """
+    Returns the number of methods, classes (named or anonymous) and characters in a piece of generated java.
+    The counts come from pattern matching rather than parsing, so they are approximate; package-private
+    constructors, for instance, aren't counted as methods. They are consistent from run to run, though,
+    which is what matters for spotting growth.
+    """
+    code = _COMMENT_OR_STRING_PATTERN.sub('""', source)
+    methods = sum(1 for m in _METHOD_PATTERN.finditer(code) if m.group(1).split()[-1] not in _NOT_METHOD_TYPES)
+    anonymous_classes = len(_ANONYMOUS_CLASS_PATTERN.findall(code))
+    return {
+        "methods": methods + anonymous_classes,  # Each anonymous class also gets a constructor.
+        "classes": len(_NAMED_CLASS_PATTERN.findall(code)) + anonymous_classes,
+        "chars": len(source),
+    }
+
+
+class FootprintReport(object):
+    """
+    Measures the java generated for each message type. Enabled by the plugin parameters:
+      report            Write <plugin name>-footprint.json alongside the generated code.
+      max_methods=N     Fail code generation if more than N methods are generated in total.
+      max_classes=N     Fail code generation if more than N classes are generated in total.
+      max_chars=N       Fail code generation if more than N characters of source are generated in total.
+    The budgets let a build catch schema changes that inflate the generated code.
+    """
+    BUDGETS = ["methods", "classes", "chars"]
+
+    def __init__(self, plugin_name, parameters):
+        self.plugin_name = plugin_name
+        self.enabled = "report" in parameters
+        self.budgets = {metric: int(parameters["max_" + metric]) for metric in self.BUDGETS if "max_" + metric in parameters}
+        self.messages = {}
+        self.start_time = time.perf_counter()
+
+    def add(self, message_name, source):
+        if not self.enabled and not self.budgets:
+            return
+        counts = self.messages.setdefault(message_name, {metric: 0 for metric in self.BUDGETS})
+        for metric, value in measure(source).items():
+            counts[metric] += value
+
+    def finish(self, response, java_package_path):
+        if not self.enabled and not self.budgets:
+            return
+        totals = {metric: sum(counts[metric] for counts in self.messages.values()) for metric in self.BUDGETS}
+
+        if self.enabled:
+            report = {
+                "plugin": self.plugin_name,
+                "seconds": round(time.perf_counter() - self.start_time, 4),
+                "totals": totals,
+                "budgets": self.budgets,
+                "messages": dict(sorted(self.messages.items())),
+            }
+            response_file = response.file.add()
+            response_file.name = "/".join(filter(None, [java_package_path, self.plugin_name + "-footprint.json"]))
+            response_file.content = json.dumps(report, indent=2) + "\n"
+
+        over_budget = ["{} {} (budget {})".format(totals[metric], metric, budget)
+                       for metric, budget in self.budgets.items() if totals[metric] > budget]
+        if over_budget:
+            largest = sorted(self.messages.items(), key=lambda item: -item[1]["chars"])[:5]
+            response.error = "{} generated code is over budget: {}. Largest message types: {}".format(
+                self.plugin_name, ", ".join(over_budget),
+                ", ".join("{} ({} chars)".format(name, counts["chars"]) for name, counts in largest))
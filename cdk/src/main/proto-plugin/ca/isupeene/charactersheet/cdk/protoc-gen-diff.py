@@ -0,0 +1,481 @@
+import string
+import sys
+
+from google.protobuf import descriptor_pb2 as descriptor
+from google.protobuf.compiler import plugin_pb2 as plugin
+
+import codegen
+
+# Parameters:
+#   roots=A+B      Only generate functions for these message types and the message types they contain.
+#                  By default, functions are generated for every message type.
+# along with the footprint parameters described in codegen.FootprintReport.
+
+# Repeated message fields are matched element by element using the first of these fields that the
+# element type has, so that an element that moved or changed is recognized as the same element.
+KEY_FIELD_NAMES = ["source_id", "name", "class_name", "ability"]
+
+FILE_TEMPLATE = """
+package ca.isupeene.charactersheet.cdk;
+
+import androidx.annotation.NonNull;
+import androidx.annotation.Nullable;
+
+import com.google.protobuf.ByteString;
+import com.google.protobuf.InvalidProtocolBufferException;
+import com.google.protobuf.MessageLite;
+
+import java.util.ArrayDeque;
+import java.util.ArrayList;
+import java.util.Deque;
+import java.util.HashMap;
+import java.util.List;
+import java.util.Map;
+import java.util.function.Function;
+
+/**
+ * Structural diff and patch functions generated by the protoc-gen-diff plugin.
+ *
+ * Diff<i>MessageType</i>(a, b) returns a {{@link Model.Patch Patch}} holding only the fields of b that
+ * differ from a, and Apply<i>MessageType</i>(a, patch) rebuilds b from a and the patch. Changed message
+ * fields are patched recursively, and repeated message fields are patched element by element, so the
+ * size of a patch depends on the size of the edit rather than the size of the message.
+ *
+ * Elements of repeated fields are matched by their {key_fields} field, where they have one,
+ * and otherwise by position. Unchanged runs of elements are encoded as a single copy.
+ *
+ * Patches are not commutative: a patch only applies to the exact message it was computed from.
+ */
+public abstract class Patches {{
+    private interface Differ<T> {{
+        Model.Patch Diff(T a, T b);
+    }}
+
+    private interface Applier<T> {{
+        T Apply(T base, Model.Patch patch) throws InvalidProtocolBufferException;
+    }}
+
+    private interface ElementParser<T> {{
+        T Parse(ByteString value) throws InvalidProtocolBufferException;
+    }}
+
+    private static Model.Patch.Field SetField(int number, MessageLite value) {{
+        return Model.Patch.Field.newBuilder().setNumber(number).setValue(value.toByteString()).build();
+    }}
+
+    private static Model.Patch.Field PatchField(int number, Model.Patch patch) {{
+        return Model.Patch.Field.newBuilder().setNumber(number).setPatch(patch).build();
+    }}
+
+    private static Model.Patch.Field ElementsField(int number, List<Model.Patch.Element> elements) {{
+        return Model.Patch.Field.newBuilder().setNumber(number).setElements(Model.Patch.Elements.newBuilder().addAllElement(elements)).build();
+    }}
+
+    private static void MergeValue(MessageLite.Builder builder, Model.Patch.Field field) throws InvalidProtocolBufferException {{
+        if (field.getChangeCase() != Model.Patch.Field.ChangeCase.VALUE) {{
+            throw new InvalidProtocolBufferException("Field " + field.getNumber() + " can only be patched with a value.");
+        }}
+        builder.mergeFrom(field.getValue());
+    }}
+
+    private static <K> Integer TakeUnused(Map<K, Deque<Integer>> indexes, K key, boolean[] used) {{
+        Deque<Integer> candidates = indexes.get(key);
+        while (candidates != null && !candidates.isEmpty()) {{
+            int index = candidates.removeFirst();
+            if (!used[index]) return index;
+        }}
+        return null;
+    }}
+
+    private static <K> void AddIndex(Map<K, Deque<Integer>> indexes, K key, int index) {{
+        Deque<Integer> candidates = indexes.get(key);
+        if (candidates == null) {{
+            candidates = new ArrayDeque<>();
+            indexes.put(key, candidates);
+        }}
+        candidates.addLast(index);
+    }}
+
+    private static <T extends MessageLite> List<Model.Patch.Element> DiffElements(
+            List<T> a, List<T> b, @Nullable Function<T, Object> key, Differ<T> differ) {{
+        boolean[] used = new boolean[a.size()];
+        Map<T, Deque<Integer>> indexesByValue = new HashMap<>();
+        Map<Object, Deque<Integer>> indexesByKey = new HashMap<>();
+        for (int i = 0; i < a.size(); ++i) {{
+            AddIndex(indexesByValue, a.get(i), i);
+            if (key != null) AddIndex(indexesByKey, key.apply(a.get(i)), i);
+        }}
+
+        List<Model.Patch.Element> elements = new ArrayList<>();
+        for (int j = 0; j < b.size(); ++j) {{
+            T element = b.get(j);
+            Integer match = TakeUnused(indexesByValue, element, used);
+            if (match != null) {{
+                used[match] = true;
+                int last = elements.size() - 1;
+                Model.Patch.Element previous = last < 0 ? null : elements.get(last);
+                if (previous != null && previous.getSourceCase() == Model.Patch.Element.SourceCase.COPY_COUNT
+                        && previous.getBaseIndex() + previous.getCopyCount() == match) {{
+                    elements.set(last, previous.toBuilder().setCopyCount(previous.getCopyCount() + 1).build());
+                }}
+                else {{
+                    elements.add(Model.Patch.Element.newBuilder().setBaseIndex(match).setCopyCount(1).build());
+                }}
+                continue;
+            }}
+
+            Integer similar = key != null
+                    ? TakeUnused(indexesByKey, key.apply(element), used)
+                    : (j < a.size() && !used[j] ? Integer.valueOf(j) : null);
+            if (similar != null) {{
+                used[similar] = true;
+                Model.Patch patch = differ.Diff(a.get(similar), element);
+                // Small elements can be cheaper to replace than to patch.
+                if (patch.getSerializedSize() < element.getSerializedSize()) {{
+                    elements.add(Model.Patch.Element.newBuilder().setBaseIndex(similar).setPatch(patch).build());
+                    continue;
+                }}
+            }}
+            elements.add(Model.Patch.Element.newBuilder().setValue(element.toByteString()).build());
+        }}
+        return elements;
+    }}
+
+    private static <T> List<T> ApplyElements(
+            List<T> base, List<Model.Patch.Element> elements, ElementParser<T> parser, Applier<T> applier)
+            throws InvalidProtocolBufferException {{
+        List<T> result = new ArrayList<>(base.size());
+        for (Model.Patch.Element element : elements) {{
+            int baseIndex = element.getBaseIndex();
+            switch (element.getSourceCase()) {{
+                case COPY_COUNT:
+                    if (baseIndex < 0 || element.getCopyCount() < 0 || baseIndex + element.getCopyCount() > base.size()) {{
+                        throw new InvalidProtocolBufferException("The patch doesn't apply: element " + baseIndex + " is out of range.");
+                    }}
+                    result.addAll(base.subList(baseIndex, baseIndex + element.getCopyCount()));
+                    break;
+                case PATCH:
+                    if (baseIndex < 0 || baseIndex >= base.size()) {{
+                        throw new InvalidProtocolBufferException("The patch doesn't apply: element " + baseIndex + " is out of range.");
+                    }}
+                    result.add(applier.Apply(base.get(baseIndex), element.getPatch()));
+                    break;
+                case VALUE:
+                    result.add(parser.Parse(element.getValue()));
+                    break;
+                default:
+                    throw new InvalidProtocolBufferException("The patch has an element with no source.");
+            }}
+        }}
+        return result;
+    }}
+{functions}
+}}
+"""
+
+# Parameters:
+#   message_type      e.g. Resource.Quantity
+#   simple_type       e.g. Resource_Quantity
+#   field_diffs       The code comparing each field.
+#   field_cases       The switch cases applying each field.
+FUNCTIONS_TEMPLATE = """
+    /**
+     * @return
+     * The changes from a to b.
+     */
+    public static @NonNull Model.Patch Diff{simple_type}(@NonNull Model.{message_type} a, @NonNull Model.{message_type} b) {{
+        Model.Patch.Builder patch = Model.Patch.newBuilder();{field_diffs}
+        return patch.build();
+    }}
+
+    /**
+     * @return
+     * The message the patch was computed from, with the changes in the patch.
+     * @throws InvalidProtocolBufferException
+     * If the patch is corrupt, or was computed for a different message.
+     */
+    public static @NonNull Model.{message_type} Apply{simple_type}(@NonNull Model.{message_type} base, @NonNull Model.Patch patch) throws InvalidProtocolBufferException {{
+        Model.{message_type}.Builder builder = base.toBuilder();
+        for (Model.Patch.Field field : patch.getFieldList()) {{
+            switch (field.getNumber()) {{{field_cases}
+                default:
+                    throw new InvalidProtocolBufferException("{message_type} has no field " + field.getNumber());
+            }}
+        }}
+        return builder.build();
+    }}
+"""
+
+SCALAR_DIFF_TEMPLATE = """
+        if ({different}) {{
+            patch.addField(SetField({number}, Model.{message_type}.newBuilder().{setter}(b.{getter}()).build()));
+        }}"""
+
+MESSAGE_DIFF_TEMPLATE = """
+        if (a.has{field_name}() != b.has{field_name}() || !a.get{field_name}().equals(b.get{field_name}())) {{
+            if (a.has{field_name}() && b.has{field_name}()) {{
+                patch.addField(PatchField({number}, Diff{field_simple_type}(a.get{field_name}(), b.get{field_name}())));
+            }}
+            else {{
+                patch.addField(SetField({number}, b.has{field_name}() ? Model.{message_type}.newBuilder().set{field_name}(b.get{field_name}()).build() : Model.{message_type}.getDefaultInstance()));
+            }}
+        }}"""
+
+REPEATED_MESSAGE_DIFF_TEMPLATE = """
+        if (!a.get{field_name}List().equals(b.get{field_name}List())) {{
+            patch.addField(ElementsField({number}, DiffElements(a.get{field_name}List(), b.get{field_name}List(), {key}, Patches::Diff{field_simple_type})));
+        }}"""
+
+# Oneofs are replaced as a whole when any of their fields change, since setting one field clears the others.
+ONEOF_DIFF_TEMPLATE = """
+        if (a.get{oneof_name}Case() != b.get{oneof_name}Case(){member_differences}) {{
+            Model.{message_type}.Builder value = Model.{message_type}.newBuilder();
+            switch (b.get{oneof_name}Case()) {{{member_setters}
+                default:
+                    break;
+            }}
+            patch.addField(SetField({number}, value.build()));
+        }}"""
+
+ONEOF_MEMBER_SETTER_TEMPLATE = """
+                case {case_name}:
+                    value.{setter}(b.{getter}());
+                    break;"""
+
+VALUE_CASE_TEMPLATE = """
+                case {number}:
+                    builder.clear{field_name}();
+                    MergeValue(builder, field);
+                    break;"""
+
+ONEOF_CASE_TEMPLATE = """
+                case {number}:
+                    builder.clear{oneof_name}();
+                    MergeValue(builder, field);
+                    break;"""
+
+MESSAGE_CASE_TEMPLATE = """
+                case {number}:
+                    if (field.getChangeCase() == Model.Patch.Field.ChangeCase.PATCH) {{
+                        builder.set{field_name}(Apply{field_simple_type}(builder.get{field_name}(), field.getPatch()));
+                    }}
+                    else {{
+                        builder.clear{field_name}();
+                        MergeValue(builder, field);
+                    }}
+                    break;"""
+
+REPEATED_MESSAGE_CASE_TEMPLATE = """
+                case {number}:
+                    if (field.getChangeCase() == Model.Patch.Field.ChangeCase.ELEMENTS) {{
+                        List<Model.{field_type}> {variable_name} = ApplyElements(
+                                builder.get{field_name}List(), field.getElements().getElementList(), Model.{field_type}::parseFrom, Patches::Apply{field_simple_type});
+                        builder.clear{field_name}().addAll{field_name}({variable_name});
+                    }}
+                    else {{
+                        builder.clear{field_name}();
+                        MergeValue(builder, field);
+                    }}
+                    break;"""
+
+PRIMITIVE_TYPES = {
+    descriptor.FieldDescriptorProto.TYPE_INT32,
+    descriptor.FieldDescriptorProto.TYPE_UINT32,
+    descriptor.FieldDescriptorProto.TYPE_SINT32,
+    descriptor.FieldDescriptorProto.TYPE_FIXED32,
+    descriptor.FieldDescriptorProto.TYPE_SFIXED32,
+    descriptor.FieldDescriptorProto.TYPE_INT64,
+    descriptor.FieldDescriptorProto.TYPE_UINT64,
+    descriptor.FieldDescriptorProto.TYPE_SINT64,
+    descriptor.FieldDescriptorProto.TYPE_FIXED64,
+    descriptor.FieldDescriptorProto.TYPE_SFIXED64,
+    descriptor.FieldDescriptorProto.TYPE_BOOL,
+}
+
+FLOATING_POINT_TYPES = {
+    descriptor.FieldDescriptorProto.TYPE_FLOAT: "Float",
+    descriptor.FieldDescriptorProto.TYPE_DOUBLE: "Double",
+}
+
+
+def camel_case(name):
+    # The generated java code treats the word 'class' as a special case.
+    return string.capwords(name, "_").replace("_", "") if name != "class" else "Class_"
+
+
+def simplified_type_name(type_name, package):
+    """Switches from global scope to implicit 'Model' class scope for java, e.g. '.pkg.Resource.Quantity' -> 'Resource.Quantity'."""
+    return type_name.replace(".{}.".format(package), "", 1)
+
+
+def simple_type_name(qualified_name):
+    return qualified_name.replace(".", "_")
+
+
+def is_repeated(field):
+    return field.label == descriptor.FieldDescriptorProto.LABEL_REPEATED
+
+
+def is_message(field):
+    return field.type == descriptor.FieldDescriptorProto.TYPE_MESSAGE
+
+
+def is_enum(field):
+    return field.type == descriptor.FieldDescriptorProto.TYPE_ENUM
+
+
+def value_accessors(field):
+    """Returns the (getter, setter) names for a singular field's value. Enums are compared by number, so that unrecognized values survive."""
+    name = camel_case(field.name)
+    if is_enum(field):
+        return "get{}Value".format(name), "set{}Value".format(name)
+    return "get{}".format(name), "set{}".format(name)
+
+
+def value_difference(field, a, b):
+    """A java expression that's true if the singular non-message field differs between messages a and b."""
+    getter, _ = value_accessors(field)
+    if field.type in PRIMITIVE_TYPES or is_enum(field):
+        return "{a}.{getter}() != {b}.{getter}()".format(a=a, b=b, getter=getter)
+    if field.type in FLOATING_POINT_TYPES:
+        return "{boxed}.compare({a}.{getter}(), {b}.{getter}()) != 0".format(boxed=FLOATING_POINT_TYPES[field.type], a=a, b=b, getter=getter)
+    return "!{a}.{getter}().equals({b}.{getter}())".format(a=a, b=b, getter=getter)
+
+
+def key_expression(element_type, package, message_descriptors):
+    element_descriptor = message_descriptors[element_type]
+    for key_field_name in KEY_FIELD_NAMES:
+        for field in element_descriptor.field:
+            if field.name == key_field_name and not is_repeated(field):
+                return "Model.{}::get{}".format(element_type, camel_case(field.name))
+    return "null"
+
+
+def generate_functions(writer, package, qualified_name, message_type, message_descriptors):
+    field_diffs = []
+    field_cases = []
+    oneof_fields = {}
+    for field in message_type.field:
+        if field.HasField("oneof_index"):
+            oneof_fields.setdefault(field.oneof_index, []).append(field)
+
+    for field in message_type.field:
+        field_name = camel_case(field.name)
+        if field.HasField("oneof_index"):
+            oneof_name = camel_case(message_type.oneof_decl[field.oneof_index].name)
+            members = oneof_fields[field.oneof_index]
+            if field is members[0]:
+                field_diffs.append(ONEOF_DIFF_TEMPLATE.format(
+                    oneof_name=oneof_name,
+                    message_type=qualified_name,
+                    number=field.number,
+                    member_differences="".join(
+                        " || {}".format(value_difference(member, "a", "b")) for member in members if not is_message(member)) +
+                        "".join(" || !a.get{0}().equals(b.get{0}())".format(camel_case(member.name)) for member in members if is_message(member)),
+                    member_setters="".join(ONEOF_MEMBER_SETTER_TEMPLATE.format(
+                        case_name=member.name.upper(),
+                        getter=value_accessors(member)[0],
+                        setter=value_accessors(member)[1]) for member in members)))
+            field_cases.append(ONEOF_CASE_TEMPLATE.format(number=field.number, oneof_name=oneof_name))
+        elif is_repeated(field) and is_message(field):
+            field_type = simplified_type_name(field.type_name, package)
+            field_diffs.append(REPEATED_MESSAGE_DIFF_TEMPLATE.format(
+                field_name=field_name,
+                number=field.number,
+                key=key_expression(field_type, package, message_descriptors),
+                field_simple_type=simple_type_name(field_type)))
+            field_cases.append(REPEATED_MESSAGE_CASE_TEMPLATE.format(
+                number=field.number,
+                field_name=field_name,
+                field_type=field_type,
+                field_simple_type=simple_type_name(field_type),
+                variable_name="patched" + field_name))
+        elif is_repeated(field):
+            list_getter = "get{}ValueList".format(field_name) if is_enum(field) else "get{}List".format(field_name)
+            adder = "addAll{}Value".format(field_name) if is_enum(field) else "addAll{}".format(field_name)
+            field_diffs.append(SCALAR_DIFF_TEMPLATE.format(
+                different="!a.{0}().equals(b.{0}())".format(list_getter),
+                number=field.number,
+                message_type=qualified_name,
+                setter=adder,
+                getter=list_getter))
+            field_cases.append(VALUE_CASE_TEMPLATE.format(number=field.number, field_name=field_name))
+        elif is_message(field):
+            field_diffs.append(MESSAGE_DIFF_TEMPLATE.format(
+                field_name=field_name,
+                number=field.number,
+                message_type=qualified_name,
+                field_simple_type=simple_type_name(simplified_type_name(field.type_name, package))))
+            field_cases.append(MESSAGE_CASE_TEMPLATE.format(
+                number=field.number,
+                field_name=field_name,
+                field_simple_type=simple_type_name(simplified_type_name(field.type_name, package))))
+        else:
+            getter, setter = value_accessors(field)
+            field_diffs.append(SCALAR_DIFF_TEMPLATE.format(
+                different=value_difference(field, "a", "b"),
+                number=field.number,
+                message_type=qualified_name,
+                setter=setter,
+                getter=getter))
+            field_cases.append(VALUE_CASE_TEMPLATE.format(number=field.number, field_name=field_name))
+
+    writer.write_template(
+        FUNCTIONS_TEMPLATE,
+        message_type=qualified_name,
+        simple_type=simple_type_name(qualified_name),
+        field_diffs="".join(field_diffs),
+        field_cases="".join(field_cases))
+
+
+def reachable_message_types(roots, message_descriptors, package):
+    """Returns the names of the root message types and all the message types their fields contain, in declaration order."""
+    reachable = set()
+    pending = list(roots)
+    while pending:
+        name = pending.pop()
+        if name in reachable:
+            continue
+        if name not in message_descriptors:
+            raise Exception("Unknown message type in roots: " + name)
+        reachable.add(name)
+        for field in message_descriptors[name].field:
+            if is_message(field):
+                pending.append(simplified_type_name(field.type_name, package))
+    return [name for name in message_descriptors if name in reachable]
+
+
+def generate_code(request):
+    response = plugin.CodeGeneratorResponse()
+    parameters = codegen.parse_parameters(request.parameter)
+    footprint = codegen.FootprintReport("diff", parameters)
+    java_package_path = codegen.java_package_path(request)
+
+    writer = codegen.SourceWriter()
+    for request_file in request.proto_file:
+        if request_file.name not in request.file_to_generate:
+            continue
+        message_descriptors = codegen.all_message_types(request_file)
+        roots = [root for root in parameters.get("roots", "").split("+") if root]
+        names = reachable_message_types(roots, message_descriptors, request_file.package) if roots else list(message_descriptors)
+        for qualified_name in names:
+            function_writer = codegen.SourceWriter()
+            generate_functions(function_writer, request_file.package, qualified_name, message_descriptors[qualified_name], message_descriptors)
+            writer.write(function_writer.getvalue())
+            footprint.add(qualified_name, function_writer.getvalue())
+
+    response_file = response.file.add()
+    response_file.name = "/".join([java_package_path, "Patches.java"])
+    key_fields = ", ".join(KEY_FIELD_NAMES[:-1]) + " or " + KEY_FIELD_NAMES[-1]
+    response_file.content = FILE_TEMPLATE.format(key_fields=key_fields, functions=writer.getvalue())
+    footprint.finish(response, java_package_path)
+    return response
+
+
+if __name__ == '__main__':
+    # Parse request from stdin
+    request = plugin.CodeGeneratorRequest()
+    request.ParseFromString(sys.stdin.buffer.read())
+
+    # Generate code and write to stdout
+    sys.stdout.buffer.write(generate_code(request).SerializeToString())
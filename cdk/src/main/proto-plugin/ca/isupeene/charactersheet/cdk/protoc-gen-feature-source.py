@@ -3,6 +3,10 @@ import sys
 from google.protobuf import descriptor_pb2 as descriptor
 from google.protobuf.compiler import plugin_pb2 as plugin
 
+import codegen
+
+# Parameters: the footprint parameters described in codegen.FootprintReport.
+
 
 def implements_feature_source(message_type):
     has_feature_list = False
@@ -19,6 +23,7 @@ def implements_feature_source(message_type):
 
 def generate_code(request):
     response = plugin.CodeGeneratorResponse()
+    footprint = codegen.FootprintReport("feature-source", codegen.parse_parameters(request.parameter))
 
     for request_file in request.proto_file:
         java_file_path = "/".join(request_file.package.split(".") + [request_file.name.split("/")[-1].split(".")[0].capitalize() + ".java"])
@@ -43,6 +48,7 @@ def generate_code(request):
                 public java.lang.String getName();
             }
         """
+        footprint.add("FeatureSource", response_file.content)
 
         for message_type in request_file.message_type:
             if implements_feature_source(message_type):
@@ -50,6 +56,8 @@ def generate_code(request):
                 response_file.name = java_file_path
                 response_file.insertion_point = "message_implements:{}.{}".format(request_file.package, message_type.name)
                 response_file.content = "FeatureSource,"
+                footprint.add(message_type.name, response_file.content)
+    footprint.finish(response, codegen.java_package_path(request))
     return response
 
 if __name__ == '__main__':
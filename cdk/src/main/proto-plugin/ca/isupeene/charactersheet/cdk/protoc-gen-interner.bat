@@ -0,0 +1,3 @@
+@ECHO off
+cd %~dp0
+python -u protoc-gen-interner.py
\ No newline at end of file
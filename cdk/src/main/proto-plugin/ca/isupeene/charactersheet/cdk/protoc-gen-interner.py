@@ -0,0 +1,306 @@
+import string
+import sys
+
+from google.protobuf import descriptor_pb2 as descriptor
+from google.protobuf.compiler import plugin_pb2 as plugin
+
+import codegen
+
+# Parameters:
+#   roots=A+B      Only generate functions for these message types and the message types they contain.
+#                  By default, functions are generated for every message type.
+# along with the footprint parameters described in codegen.FootprintReport.
+
+FILE_TEMPLATE = """
+package ca.isupeene.charactersheet.cdk;
+
+import androidx.annotation.NonNull;
+
+import com.google.protobuf.MessageLite;
+
+import java.util.ArrayList;
+import java.util.HashMap;
+import java.util.List;
+import java.util.Locale;
+import java.util.Map;
+
+/**
+ * Hash-consing for parsed messages, generated by the protoc-gen-interner plugin.
+ *
+ * Content packs repeat the same sub-messages in many places, e.g. a Feature shared by several
+ * subclasses, but a parsed message holds a separate copy of each. Intern<i>MessageType</i> returns
+ * the first message it was given that's structurally equal to its argument, after interning the
+ * message's sub-messages the same way, so that every copy of a sub-message becomes one shared
+ * instance. Retained heap drops accordingly, and comparing shared sub-messages with equals() stops
+ * at the identity check.
+ *
+ * An Interner keeps every message it has returned alive, so intern everything that should share
+ * sub-messages with one Interner, then let it go. Interners are not thread-safe.
+ */
+public final class Interner {{
+    /**
+     * How much interning saved for one message type.
+     */
+    public static final class Savings {{
+        private final String messageType;
+        private final long interned;
+        private final long unique;
+        private final long savedBytes;
+
+        Savings(String messageType, long interned, long unique, long savedBytes) {{
+            this.messageType = messageType;
+            this.interned = interned;
+            this.unique = unique;
+            this.savedBytes = savedBytes;
+        }}
+
+        /**
+         * @return
+         * The name of the message type, e.g. "Resource.Quantity".
+         */
+        public @NonNull String MessageType() {{ return messageType; }}
+
+        /**
+         * @return
+         * The number of messages of this type that were interned, not counting those inside a duplicate.
+         */
+        public long Interned() {{ return interned; }}
+
+        /**
+         * @return
+         * The number of distinct messages of this type.
+         */
+        public long Unique() {{ return unique; }}
+
+        /**
+         * @return
+         * The serialized size of the duplicate messages that were replaced by a shared instance.
+         * The heap they held is several times larger.
+         */
+        public long SavedBytes() {{ return savedBytes; }}
+
+        @Override
+        public String toString() {{
+            return String.format(Locale.ROOT, "%s: %d interned, %d unique, %d bytes saved", messageType, interned, unique, savedBytes);
+        }}
+    }}
+
+    // The canonical instance of each distinct message of one type.
+    private static final class Table<T extends MessageLite> {{
+        private final String messageType;
+        private final Map<T, T> canonical = new HashMap<>();
+        private long interned;
+        private long savedBytes;
+
+        Table(String messageType) {{
+            this.messageType = messageType;
+        }}
+
+        // Returns the canonical message equal to the given one, or null if this is the first of its kind.
+        T Find(T message) {{
+            ++interned;
+            T existing = canonical.get(message);
+            if (existing != null && existing != message) {{
+                savedBytes += message.getSerializedSize();
+            }}
+            return existing;
+        }}
+
+        T Add(T message) {{
+            canonical.put(message, message);
+            return message;
+        }}
+
+        void AddSavings(List<Savings> savings) {{
+            if (interned > 0) {{
+                savings.add(new Savings(messageType, interned, canonical.size(), savedBytes));
+            }}
+        }}
+    }}
+{tables}
+
+    /**
+     * @return
+     * What interning has saved so far, for each message type that has been interned, most bytes saved first.
+     */
+    public @NonNull List<Savings> Savings() {{
+        List<Savings> savings = new ArrayList<>();{add_savings}
+        savings.sort((a, b) -> Long.compare(b.SavedBytes(), a.SavedBytes()));
+        return savings;
+    }}
+{functions}
+}}
+"""
+
+# Parameters:
+#   table_name     e.g. resourceQuantityTable
+#   message_type   e.g. Resource.Quantity
+TABLE_TEMPLATE = """
+    private final Table<Model.{message_type}> {table_name} = new Table<>("{message_type}");"""
+
+ADD_SAVINGS_TEMPLATE = """
+        {table_name}.AddSavings(savings);"""
+
+# Parameters:
+#   message_type      e.g. Resource.Quantity
+#   simple_type       e.g. Resource_Quantity
+#   table_name        e.g. resourceQuantityTable
+#   builder_declaration  The declaration of the builder that's used if any field changes, if there are message fields.
+#   field_interns     The code interning each message field.
+#   result            The interned message.
+FUNCTION_TEMPLATE = """
+    /**
+     * @return
+     * The canonical {{@link Model.{message_type} {message_type}}} equal to the given one, whose sub-messages are canonical too.
+     */
+    public @NonNull Model.{message_type} Intern{simple_type}(@NonNull Model.{message_type} message) {{
+        Model.{message_type} existing = {table_name}.Find(message);
+        if (existing != null) return existing;{builder_declaration}{field_interns}
+        return {table_name}.Add({result});
+    }}
+"""
+
+BUILDER_DECLARATION_TEMPLATE = """
+
+        Model.{message_type}.Builder builder = null;"""
+
+# Parameters:
+#   condition        An expression that's true if the field is set.
+#   field_name       e.g. Quantity
+#   field_type       e.g. Resource.Quantity
+#   field_simple_type  e.g. Resource_Quantity
+SINGULAR_INTERN_TEMPLATE = """
+        if ({condition}) {{
+            Model.{field_type} value = Intern{field_simple_type}(message.get{field_name}());
+            if (value != message.get{field_name}()) {{
+                if (builder == null) builder = message.toBuilder();
+                builder.set{field_name}(value);
+            }}
+        }}"""
+
+REPEATED_INTERN_TEMPLATE = """
+        for (int i = 0; i < message.get{field_name}Count(); ++i) {{
+            Model.{field_type} value = Intern{field_simple_type}(message.get{field_name}(i));
+            if (value != message.get{field_name}(i)) {{
+                if (builder == null) builder = message.toBuilder();
+                builder.set{field_name}(i, value);
+            }}
+        }}"""
+
+
+def camel_case(name):
+    # The generated java code treats the word 'class' as a special case.
+    return string.capwords(name, "_").replace("_", "") if name != "class" else "Class_"
+
+
+def simplified_type_name(type_name, package):
+    """Switches from global scope to implicit 'Model' class scope for java, e.g. '.pkg.Resource.Quantity' -> 'Resource.Quantity'."""
+    return type_name.replace(".{}.".format(package), "", 1)
+
+
+def simple_type_name(qualified_name):
+    return qualified_name.replace(".", "_")
+
+
+def table_name(qualified_name):
+    simple_type = simple_type_name(qualified_name).replace("_", "")
+    return simple_type[0].lower() + simple_type[1:] + "Table"
+
+
+def is_repeated(field):
+    return field.label == descriptor.FieldDescriptorProto.LABEL_REPEATED
+
+
+def is_message(field):
+    return field.type == descriptor.FieldDescriptorProto.TYPE_MESSAGE
+
+
+def generate_function(writer, package, qualified_name, message_type):
+    field_interns = []
+    for field in message_type.field:
+        if not is_message(field):
+            continue
+        field_type = simplified_type_name(field.type_name, package)
+        arguments = dict(
+            field_name=camel_case(field.name),
+            field_type=field_type,
+            field_simple_type=simple_type_name(field_type))
+        if is_repeated(field):
+            field_interns.append(REPEATED_INTERN_TEMPLATE.format(**arguments))
+        elif field.HasField("oneof_index"):
+            oneof_name = camel_case(message_type.oneof_decl[field.oneof_index].name)
+            condition = "message.get{oneof_name}Case() == Model.{message_type}.{oneof_name}Case.{case_name}".format(
+                oneof_name=oneof_name, message_type=qualified_name, case_name=field.name.upper())
+            field_interns.append(SINGULAR_INTERN_TEMPLATE.format(condition=condition, **arguments))
+        else:
+            condition = "message.has{}()".format(camel_case(field.name))
+            field_interns.append(SINGULAR_INTERN_TEMPLATE.format(condition=condition, **arguments))
+
+    # Messages without message fields are interned as they are.
+    writer.write_template(
+        FUNCTION_TEMPLATE,
+        message_type=qualified_name,
+        simple_type=simple_type_name(qualified_name),
+        table_name=table_name(qualified_name),
+        builder_declaration=BUILDER_DECLARATION_TEMPLATE.format(message_type=qualified_name) if field_interns else "",
+        field_interns="".join(field_interns),
+        result="builder == null ? message : builder.build()" if field_interns else "message")
+
+
+def reachable_message_types(roots, message_descriptors, package):
+    """Returns the names of the root message types and all the message types their fields contain, in declaration order."""
+    reachable = set()
+    pending = list(roots)
+    while pending:
+        name = pending.pop()
+        if name in reachable:
+            continue
+        if name not in message_descriptors:
+            raise Exception("Unknown message type in roots: " + name)
+        reachable.add(name)
+        for field in message_descriptors[name].field:
+            if is_message(field):
+                pending.append(simplified_type_name(field.type_name, package))
+    return [name for name in message_descriptors if name in reachable]
+
+
+def generate_code(request):
+    response = plugin.CodeGeneratorResponse()
+    parameters = codegen.parse_parameters(request.parameter)
+    footprint = codegen.FootprintReport("interner", parameters)
+    java_package_path = codegen.java_package_path(request)
+
+    tables = codegen.SourceWriter()
+    add_savings = codegen.SourceWriter()
+    functions = codegen.SourceWriter()
+    for request_file in request.proto_file:
+        if request_file.name not in request.file_to_generate:
+            continue
+        message_descriptors = codegen.all_message_types(request_file)
+        roots = [root for root in parameters.get("roots", "").split("+") if root]
+        names = reachable_message_types(roots, message_descriptors, request_file.package) if roots else list(message_descriptors)
+        for qualified_name in names:
+            tables.write_template(TABLE_TEMPLATE, message_type=qualified_name, table_name=table_name(qualified_name))
+            add_savings.write_template(ADD_SAVINGS_TEMPLATE, table_name=table_name(qualified_name))
+            function_writer = codegen.SourceWriter()
+            generate_function(function_writer, request_file.package, qualified_name, message_descriptors[qualified_name])
+            functions.write(function_writer.getvalue())
+            footprint.add(qualified_name, function_writer.getvalue())
+
+    response_file = response.file.add()
+    response_file.name = "/".join([java_package_path, "Interner.java"])
+    response_file.content = FILE_TEMPLATE.format(
+        tables=tables.getvalue(),
+        add_savings=add_savings.getvalue(),
+        functions=functions.getvalue())
+    footprint.finish(response, java_package_path)
+    return response
+
+
+if __name__ == '__main__':
+    # Parse request from stdin
+    request = plugin.CodeGeneratorRequest()
+    request.ParseFromString(sys.stdin.buffer.read())
+
+    # Generate code and write to stdout
+    sys.stdout.buffer.write(generate_code(request).SerializeToString())
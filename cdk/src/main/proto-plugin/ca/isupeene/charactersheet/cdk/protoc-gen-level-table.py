@@ -0,0 +1,278 @@
+import string
+import sys
+
+from google.protobuf import descriptor_pb2 as descriptor
+from google.protobuf.compiler import plugin_pb2 as plugin
+
+import codegen
+
+# Parameters:
+#   max_level=N    The highest level with a precomputed table entry. Defaults to 20.
+# along with the footprint parameters described in codegen.FootprintReport.
+
+# Step messages are keyed by an int32 field with one of these names, e.g. Resource.ResourceDie.start_level.
+LEVEL_FIELD_NAMES = ["start_level", "level"]
+# A step message with an enum field that has a value of this name is unlimited when the field has that value.
+UNLIMITED_VALUE_NAME = "UNLIMITED"
+DEFAULT_MAX_LEVEL = 20
+
+FILE_TEMPLATE = """
+package ca.isupeene.charactersheet.cdk;
+
+import androidx.annotation.NonNull;
+
+import java.util.List;
+import java.util.Map;
+import java.util.WeakHashMap;
+import java.util.function.Function;
+import java.util.function.ToIntFunction;
+
+/**
+ * Level lookups for level progressions, generated by the protoc-gen-level-table plugin.
+ *
+ * A level progression is a repeated field of steps, each keyed by a start_level or level field, such as
+ * {{@link Model.Resource.Quantity#getLevelProgressionList Resource.Quantity.level_progression}}.
+ * The value at a level is the value of the last step whose level is at most that level, or 0 if there
+ * is no such step. Rather than scanning the steps on every lookup, the value at every level from 1 to
+ * {{@link #MAX_LEVEL}} is computed once per message, so each later lookup is an array access.
+ *
+ * Tables are kept for as long as their messages are, and shared by structurally equal messages.
+ * The lookups are thread-safe.
+ */
+public final class LevelTables {{
+    /**
+     * The highest level with a precomputed value. Lookups for higher levels scan the steps.
+     */
+    public static final int MAX_LEVEL = {max_level};
+
+    /**
+     * The value at levels where a progression is unlimited.
+     */
+    public static final int UNLIMITED = Integer.MAX_VALUE;
+
+    private LevelTables() {{}}
+
+    // The tables for one value of one progression, keyed by the message holding the progression.
+    private static final class Progression<M, T> {{
+        private final Function<M, List<T>> steps;
+        private final ToIntFunction<T> level;
+        private final ToIntFunction<T> value;
+        private final Map<M, int[]> tables = new WeakHashMap<>();
+
+        Progression(Function<M, List<T>> steps, ToIntFunction<T> level, ToIntFunction<T> value) {{
+            this.steps = steps;
+            this.level = level;
+            this.value = value;
+        }}
+
+        private int Scan(List<T> steps, int level) {{
+            int result = 0;
+            int resultLevel = Integer.MIN_VALUE;
+            for (T step : steps) {{
+                int stepLevel = this.level.applyAsInt(step);
+                if (stepLevel <= level && stepLevel >= resultLevel) {{
+                    result = value.applyAsInt(step);
+                    resultLevel = stepLevel;
+                }}
+            }}
+            return result;
+        }}
+
+        int ValueAtLevel(M message, int level) {{
+            if (level < 1 || level > MAX_LEVEL) {{
+                return Scan(steps.apply(message), level);
+            }}
+            int[] table;
+            synchronized (tables) {{
+                table = tables.get(message);
+                if (table == null) {{
+                    List<T> steps = this.steps.apply(message);
+                    table = new int[MAX_LEVEL + 1];
+                    for (int i = 1; i <= MAX_LEVEL; ++i) {{
+                        table[i] = Scan(steps, i);
+                    }}
+                    tables.put(message, table);
+                }}
+            }}
+            return table[level];
+        }}
+    }}
+{functions}
+}}
+"""
+
+# Parameters:
+#   message_type    e.g. Resource.Quantity
+#   step_type       e.g. Resource.Quantity.LevelQuantity
+#   progression_name  e.g. resourceQuantityQuantity
+#   function_name   e.g. QuantityAtLevel
+#   field_name      e.g. LevelProgression
+#   field           e.g. level_progression
+#   level_name      e.g. StartLevel
+#   level           e.g. start_level
+#   value           An expression for the value of 'step', e.g. step.getQuantity()
+#   value_doc       The javadoc describing the value, e.g. The {@code quantity} of the last...
+FUNCTION_TEMPLATE = """
+    private static final Progression<Model.{message_type}, Model.{step_type}> {progression_name} = new Progression<>(
+            Model.{message_type}::get{field_name}List,
+            Model.{step_type}::get{level_name},
+            step -> {value});
+
+    /**
+     * @return
+     * {value_doc}
+     */
+    public static int {function_name}(@NonNull Model.{message_type} message, int level) {{
+        return {progression_name}.ValueAtLevel(message, level);
+    }}
+"""
+
+VALUE_DOC_TEMPLATE = (
+    "The {{@code {value}}} of the last {{@code {field}}} step whose {{@code {level}}} is at most the given level,"
+    "\n     * or 0 if there's no such step.")
+
+UNLIMITED_VALUE_DOC_TEMPLATE = (
+    "The {{@code {value}}} of the last {{@code {field}}} step whose {{@code {level}}} is at most the given level,"
+    "\n     * {{@link #UNLIMITED}} if that step's {{@code {unlimited_field}}} is {unlimited}, or 0 if there's no such step.")
+
+
+def camel_case(name):
+    # The generated java code treats the word 'class' as a special case.
+    return string.capwords(name, "_").replace("_", "") if name != "class" else "Class_"
+
+
+def progression_name(qualified_name, function_name):
+    simple_type = qualified_name.replace(".", "")
+    return simple_type[0].lower() + simple_type[1:] + function_name.replace("AtLevel", "")
+
+
+def simplified_type_name(type_name, package):
+    """Switches from global scope to implicit 'Model' class scope for java, e.g. '.pkg.Resource.Quantity' -> 'Resource.Quantity'."""
+    return type_name.replace(".{}.".format(package), "", 1)
+
+
+def all_enum_types(file_descriptor: descriptor.FileDescriptorProto):
+    """Returns {qualified name: descriptor} for every enum type in the file, including those nested in messages."""
+    enum_descriptors = {enum_type.name: enum_type for enum_type in file_descriptor.enum_type}
+    for qualified_name, message_type in codegen.all_message_types(file_descriptor).items():
+        for enum_type in message_type.enum_type:
+            enum_descriptors[".".join([qualified_name, enum_type.name])] = enum_type
+    return enum_descriptors
+
+
+def is_int32(field):
+    return field.type == descriptor.FieldDescriptorProto.TYPE_INT32 and field.label != descriptor.FieldDescriptorProto.LABEL_REPEATED
+
+
+def is_enum(field):
+    return field.type == descriptor.FieldDescriptorProto.TYPE_ENUM and field.label != descriptor.FieldDescriptorProto.LABEL_REPEATED
+
+
+def level_field(step_type):
+    """
+    Returns the field that keys a step message, or None if the message isn't a step.
+    Steps hold nothing but int32 and enum fields, so that e.g. a list of Features, which have a level, isn't a progression.
+    """
+    if not all(is_int32(field) or is_enum(field) for field in step_type.field):
+        return None
+    for name in LEVEL_FIELD_NAMES:
+        for field in step_type.field:
+            if field.name == name and is_int32(field):
+                return field
+    return None
+
+
+def unlimited_condition(step_type, enum_descriptors, package):
+    """Returns (field, expression) for a step message whose enum field can be UNLIMITED, or (None, None)."""
+    for field in step_type.field:
+        if not is_enum(field):
+            continue
+        enum_name = simplified_type_name(field.type_name, package)
+        if any(value.name == UNLIMITED_VALUE_NAME for value in enum_descriptors[enum_name].value):
+            return field, "step.get{}() == Model.{}.{}".format(camel_case(field.name), enum_name, UNLIMITED_VALUE_NAME)
+    return None, None
+
+
+def find_progressions(message_descriptors, enum_descriptors, package):
+    """Returns (message name, progression field, step name, step descriptor) for every level progression, in declaration order."""
+    progressions = []
+    for qualified_name, message_type in message_descriptors.items():
+        for field in message_type.field:
+            if field.label != descriptor.FieldDescriptorProto.LABEL_REPEATED or field.type != descriptor.FieldDescriptorProto.TYPE_MESSAGE:
+                continue
+            step_name = simplified_type_name(field.type_name, package)
+            step_type = message_descriptors[step_name]
+            level = level_field(step_type)
+            if level is not None and any(is_int32(value) and value is not level for value in step_type.field):
+                progressions.append((qualified_name, field, step_name, step_type))
+    return progressions
+
+
+def generate_functions(writer, package, qualified_name, progressions, enum_descriptors):
+    """Writes a lookup for each value of each of a message type's progressions."""
+    for field, step_name, step_type in progressions:
+        level = level_field(step_type)
+        unlimited_field, unlimited = unlimited_condition(step_type, enum_descriptors, package)
+        for value in step_type.field:
+            if not is_int32(value) or value is level:
+                continue
+            # A message type with several progressions names its lookups after them, e.g. LevelProgressionQuantityAtLevel.
+            function_name = camel_case(value.name) + "AtLevel"
+            if len(progressions) > 1:
+                function_name = camel_case(field.name) + function_name
+            getter = "step.get{}()".format(camel_case(value.name))
+            arguments = dict(value=value.name, field=field.name, level=level.name)
+            if unlimited:
+                value_doc = UNLIMITED_VALUE_DOC_TEMPLATE.format(
+                    unlimited_field=unlimited_field.name, unlimited=UNLIMITED_VALUE_NAME, **arguments)
+            else:
+                value_doc = VALUE_DOC_TEMPLATE.format(**arguments)
+            writer.write_template(
+                FUNCTION_TEMPLATE,
+                message_type=qualified_name,
+                step_type=step_name,
+                progression_name=progression_name(qualified_name, function_name),
+                function_name=function_name,
+                field_name=camel_case(field.name),
+                level_name=camel_case(level.name),
+                value="{} ? UNLIMITED : {}".format(unlimited, getter) if unlimited else getter,
+                value_doc=value_doc)
+
+
+def generate_code(request):
+    response = plugin.CodeGeneratorResponse()
+    parameters = codegen.parse_parameters(request.parameter)
+    footprint = codegen.FootprintReport("level-table", parameters)
+    java_package_path = codegen.java_package_path(request)
+
+    functions = codegen.SourceWriter()
+    for request_file in request.proto_file:
+        if request_file.name not in request.file_to_generate:
+            continue
+        message_descriptors = codegen.all_message_types(request_file)
+        enum_descriptors = all_enum_types(request_file)
+        progressions = {}
+        for qualified_name, field, step_name, step_type in find_progressions(message_descriptors, enum_descriptors, request_file.package):
+            progressions.setdefault(qualified_name, []).append((field, step_name, step_type))
+        for qualified_name, message_progressions in progressions.items():
+            function_writer = codegen.SourceWriter()
+            generate_functions(function_writer, request_file.package, qualified_name, message_progressions, enum_descriptors)
+            functions.write(function_writer.getvalue())
+            footprint.add(qualified_name, function_writer.getvalue())
+
+    response_file = response.file.add()
+    response_file.name = "/".join([java_package_path, "LevelTables.java"])
+    response_file.content = FILE_TEMPLATE.format(
+        max_level=int(parameters.get("max_level", DEFAULT_MAX_LEVEL)),
+        functions=functions.getvalue())
+    footprint.finish(response, java_package_path)
+    return response
+
+
+if __name__ == '__main__':
+    # Parse request from stdin
+    request = plugin.CodeGeneratorRequest()
+    request.ParseFromString(sys.stdin.buffer.read())
+
+    # Generate code and write to stdout
+    sys.stdout.buffer.write(generate_code(request).SerializeToString())
@@ -4,7 +4,7 @@ import sys
 from google.protobuf import descriptor_pb2 as descriptor
 from google.protobuf.compiler import plugin_pb2 as plugin
 
-import comment_tree
+import codegen
 
 # TODO: Add a mutable function that takes a lambda, to enable builder chaining.
 NON_REPEATED_FUNCTION_TEMPLATE = """
@@ -94,64 +94,46 @@ def make_comments(leading_comments, trailing_comments, type_name, snake_field_na
             type_name=type_name, snake_field_name=snake_field_name, tag_number=tag_number)
 
 
-# TODO: Deduplicate this message handling code
-def nested_message_types(message_descriptor: descriptor.DescriptorProto, prefix):
-    nested_descriptors = {}
-    for nested_type in message_descriptor.nested_type:
-        qualified_name = '.'.join([prefix, nested_type.name])
-        nested_descriptors[qualified_name] = nested_type
-        nested_descriptors |= nested_message_types(nested_type, qualified_name)
-    return nested_descriptors
-
-
-def all_message_types(file_descriptor: descriptor.FileDescriptorProto):
-    message_descriptors = {}
-    for message_type in file_descriptor.message_type:
-        message_descriptors[message_type.name] = message_type
-        message_descriptors |= nested_message_types(message_type, message_type.name)
-    return message_descriptors
-
-
-
-def generate_mutable_functions(request_file, file_comment_tree, qualified_name, message_type):
-    mutable_functions = []
-    insertion_point = "builder_scope:{}.{}".format(request_file.package, qualified_name)
-
-    mutable_functions.append(
-        SNEAKY_PROTECTED_MEMBER_ACCESS_TEMPLATE.format(type_name=message_type.name)
-    )
+def generate_mutable_functions(writer, request_file, file_comment_tree, qualified_name, message_type):
+    writer.write(SNEAKY_PROTECTED_MEMBER_ACCESS_TEMPLATE.format(type_name=message_type.name))
 
     for field in [f for f in message_type.field if f.type == descriptor.FieldDescriptorProto.TYPE_MESSAGE]:
         comment_node = file_comment_tree.at_path(qualified_name.split('.') + [field.name])
         CamelCaseName = string.capwords(field.name, "_").replace("_", "") if field.name != "class" else "Class_"
         simplified_type_name = field.type_name.replace(".ca.isupeene.charactersheet.cdk.", "")  # Switch from global scope to implicit 'Model' class scope for java.
+        comments = make_comments(comment_node.leading_comments.strip(), comment_node.trailing_comments.strip(),
+                                 simplified_type_name, field.name, field.number)
+        writer.write("\n\n")
         if field.label == descriptor.FieldDescriptorProto.LABEL_REPEATED:
-            mutable_functions.append(
-                REPEATED_FUNCTION_TEMPLATE.format(field_name=CamelCaseName, type_name=simplified_type_name,
-                                                  comments=make_comments(comment_node.leading_comments.strip(), comment_node.trailing_comments.strip(),
-                                                                         simplified_type_name, field.name, field.number)))
+            writer.write_template(REPEATED_FUNCTION_TEMPLATE, field_name=CamelCaseName, type_name=simplified_type_name, comments=comments)
         else:
-            mutable_functions.append(
-                NON_REPEATED_FUNCTION_TEMPLATE.format(field_name=CamelCaseName, type_name=simplified_type_name,
-                                                      comments=make_comments(comment_node.leading_comments.strip(), comment_node.trailing_comments.strip(),
-                                                                             simplified_type_name, field.name, field.number)))
+            writer.write_template(NON_REPEATED_FUNCTION_TEMPLATE, field_name=CamelCaseName, type_name=simplified_type_name, comments=comments)
+
 
-    return mutable_functions, insertion_point
+# Returns (qualified name, file name, insertion point, content) tuples for a top-level message type and each of its nested message types.
+def generate_message_code(request_file, top_level_message_type):
+    insertions = []
+    for qualified_name, message_type in codegen.message_types(top_level_message_type).items():
+        writer = codegen.SourceWriter()
+        generate_mutable_functions(writer, request_file, codegen.file_comment_tree(request_file), qualified_name, message_type)
+        insertions.append((qualified_name, codegen.java_file_path(request_file),
+                           "builder_scope:{}.{}".format(request_file.package, qualified_name),
+                           writer.getvalue()))
+    return insertions
 
 
 def generate_code(request):
     response = plugin.CodeGeneratorResponse()
-    for request_file in request.proto_file:
-        java_file_path = "/".join(request_file.package.split(".") + [request_file.name.split("/")[-1].split(".")[0].capitalize() + ".java"])
-        file_comment_tree = comment_tree.build_comment_tree(request_file)
-
-        for qualified_name, message_type in all_message_types(request_file).items():
-            mutable_functions, insertion_point = generate_mutable_functions(request_file, file_comment_tree, qualified_name, message_type)
-            if mutable_functions:
-                response_file = response.file.add()
-                response_file.name = java_file_path
-                response_file.insertion_point = insertion_point
-                response_file.content = "\n\n".join(mutable_functions)
+    parameters = codegen.parse_parameters(request.parameter)
+    footprint = codegen.FootprintReport("mutable", parameters)
+    for insertions in codegen.generate_messages(request, generate_message_code, int(parameters.get("jobs", 0))):
+        for qualified_name, file_name, insertion_point, content in insertions:
+            response_file = response.file.add()
+            response_file.name = file_name
+            response_file.insertion_point = insertion_point
+            response_file.content = content
+            footprint.add(qualified_name, content)
+    footprint.finish(response, codegen.java_package_path(request))
     return response
 
 if __name__ == '__main__':
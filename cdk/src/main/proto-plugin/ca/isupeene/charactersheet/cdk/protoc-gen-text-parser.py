@@ -4,26 +4,39 @@ import sys
 from google.protobuf import descriptor_pb2 as descriptor
 from google.protobuf.compiler import plugin_pb2 as plugin
 
+import codegen
+
 # Parameters:
 #   parser_functions
-#     The set of ParseMessage and ParseMessageImpl functions that actually do the parsing
+#     The set of public Parse<MessageType> functions, each of which delegates to the
+#     generated <MessageType>Parser class that actually does the parsing.
 FILE_TEMPLATE = """
 package ca.isupeene.charactersheet.cdk;
 
 import androidx.annotation.NonNull;
-import androidx.core.util.Pair;
 import android.util.Log;
 
 import java.io.BufferedReader;
 import java.io.IOException;
 import java.io.InputStream;
 import java.io.InputStreamReader;
+import java.io.Reader;
 import java.io.StreamTokenizer;
+import java.nio.charset.StandardCharsets;
 
-import java.util.HashMap;
-import java.util.HashSet;
-import java.util.Map;
+import java.util.ArrayList;
+import java.util.Arrays;
+import java.util.List;
 import java.util.Set;
+import java.util.concurrent.ExecutionException;
+import java.util.concurrent.ExecutorService;
+import java.util.concurrent.Future;
+import java.util.concurrent.LinkedBlockingQueue;
+import java.util.concurrent.ThreadPoolExecutor;
+import java.util.concurrent.TimeUnit;
+import java.util.function.BiConsumer;
+
+import com.google.protobuf.ByteString;
 
 /**
  * A simple text proto parser generated by the protoc-gen-text-parser plugin.
@@ -32,10 +45,20 @@ import java.util.Set;
  * 
  * If an error is encountered while parsing the message, the Parser raises a ParseException
  * indicating the error and the line number on which it occurred.
+ *
+ * The parsing code for each message type lives in its own package-private class, so that
+ * parsing one type of message only loads the code for the message types it contains.
+ *
+ * Top-level lists whose fields are all repeated messages, such as SpellList, also get a
+ * Parse<i>MessageType</i>Parallel function, which splits large inputs between their top-level
+ * messages and parses the pieces on several threads.
  */
 public class Parser {{
     private static final String TAG = "Parser";
     private static final String LOG_FORMAT = "Line %d: %s";
+    // Checked once, so that tracing each token costs nothing unless it was enabled before the parser
+    // was loaded, e.g. with "adb shell setprop log.tag.Parser VERBOSE".
+    private static final boolean VERBOSE = Log.isLoggable(TAG, Log.VERBOSE);
 
 
 	/**
@@ -61,25 +84,21 @@ public class Parser {{
 		}}
 	}}
 
-    private static void info(int lineNumber, String message) {{
-        // Log.d(TAG, String.format(LOG_FORMAT, lineNumber, message));
+    static void info(int lineNumber, String message) {{
+        if (VERBOSE) Log.v(TAG, String.format(LOG_FORMAT, lineNumber, message));
     }}
 
-    private static void error(int lineNumber, String message) throws ParseException {{
-        // Log.e(TAG, String.format(LOG_FORMAT, lineNumber, message));
+    static void error(int lineNumber, String message) throws ParseException {{
+        if (VERBOSE) Log.v(TAG, String.format(LOG_FORMAT, lineNumber, message));
         throw new ParseException(message, lineNumber);
     }}
     
-    interface FieldHandler {{
-        void HandleField() throws IOException;
-    }}
-	
-	private static StreamTokenizer GetTokenizer(InputStream input) {{
-        StreamTokenizer tokenizer = new StreamTokenizer(
-                new BufferedReader(
-                        new InputStreamReader(input)
-                )
-        );
+	static StreamTokenizer GetTokenizer(InputStream input) {{
+		return GetTokenizer(new BufferedReader(new InputStreamReader(input)));
+	}}
+
+	static StreamTokenizer GetTokenizer(Reader reader) {{
+        StreamTokenizer tokenizer = new StreamTokenizer(reader);
         tokenizer.slashSlashComments(true);
         tokenizer.slashStarComments(true);
         tokenizer.commentChar('#');
@@ -89,7 +108,7 @@ public class Parser {{
         return tokenizer;
 	}}
 	
-	private static int ConsumeInt32(StreamTokenizer tokenizer) throws IOException {{
+	static int ConsumeInt32(StreamTokenizer tokenizer) throws IOException {{
 		tokenizer.nextToken();
 		if (tokenizer.ttype == StreamTokenizer.TT_NUMBER) {{
 			info(tokenizer.lineno(), "Parsed a number.");
@@ -101,7 +120,7 @@ public class Parser {{
 		}}
 	}}
 	
-	private static long ConsumeInt64(StreamTokenizer tokenizer) throws IOException {{
+	static long ConsumeInt64(StreamTokenizer tokenizer) throws IOException {{
 		tokenizer.nextToken();
 		if (tokenizer.ttype == StreamTokenizer.TT_NUMBER) {{
 			info(tokenizer.lineno(), "Parsed a number.");
@@ -113,7 +132,7 @@ public class Parser {{
 		}}
 	}}
 	
-	private static float ConsumeFloat(StreamTokenizer tokenizer) throws IOException {{
+	static float ConsumeFloat(StreamTokenizer tokenizer) throws IOException {{
 		tokenizer.nextToken();
 		if (tokenizer.ttype == StreamTokenizer.TT_NUMBER) {{
 			info(tokenizer.lineno(), "Parsed a number.");
@@ -125,7 +144,7 @@ public class Parser {{
 		}}
 	}}
 	
-	private static double ConsumeDouble(StreamTokenizer tokenizer) throws IOException {{
+	static double ConsumeDouble(StreamTokenizer tokenizer) throws IOException {{
 		tokenizer.nextToken();
 		if (tokenizer.ttype == StreamTokenizer.TT_NUMBER) {{
 			info(tokenizer.lineno(), "Parsed a number.");
@@ -137,7 +156,7 @@ public class Parser {{
 		}}
 	}}
 	
-	private static boolean ConsumeBool(StreamTokenizer tokenizer) throws IOException {{
+	static boolean ConsumeBool(StreamTokenizer tokenizer) throws IOException {{
 		tokenizer.nextToken();
 		if (tokenizer.ttype == StreamTokenizer.TT_WORD) {{
 		    if (tokenizer.sval.toLowerCase().equals("true")) {{
@@ -153,7 +172,7 @@ public class Parser {{
 		return false;
 	}}
 	
-	private static String ConsumeString(StreamTokenizer tokenizer) throws IOException, ParseException {{
+	static String ConsumeString(StreamTokenizer tokenizer) throws IOException, ParseException {{
 		tokenizer.nextToken();
 		if (tokenizer.ttype == '"' || tokenizer.ttype == '\\'') {{
 			info(tokenizer.lineno(), "Parsed a quoted string.");
@@ -172,10 +191,249 @@ public class Parser {{
 		}}
 	}}
 	
+	// Text-format bytes are quoted strings with octal escapes for non-printable bytes,
+	// which the tokenizer decodes to chars from 0 to 255.
+	static ByteString ConsumeBytes(StreamTokenizer tokenizer) throws IOException, ParseException {{
+		return ByteString.copyFrom(ConsumeString(tokenizer), StandardCharsets.ISO_8859_1);
+	}}
+	
+	// Inputs shorter than this are parsed on the calling thread, since splitting them would cost more than it saves.
+	private static final int MIN_PARALLEL_CHARS = 64 * 1024;
+	// Inputs are split into a few chunks per thread, so that one slow chunk doesn't leave the other threads idle.
+	private static final int CHUNKS_PER_THREAD = 4;
+	private static ExecutorService parallelExecutor;
+
+	private static synchronized ExecutorService GetParallelExecutor() {{
+		if (parallelExecutor == null) {{
+			// The calling thread parses a chunk too.
+			int threadCount = Math.max(1, Runtime.getRuntime().availableProcessors() - 1);
+			ThreadPoolExecutor executor = new ThreadPoolExecutor(
+					threadCount, threadCount, 30, TimeUnit.SECONDS, new LinkedBlockingQueue<>(),
+					runnable -> {{
+						Thread thread = new Thread(runnable, TAG + "-parallel");
+						thread.setDaemon(true);
+						return thread;
+					}});
+			executor.allowCoreThreadTimeOut(true);
+			parallelExecutor = executor;
+		}}
+		return parallelExecutor;
+	}}
+
+	/**
+	 * Reads a range of an array of chars, preceded by enough newlines that the tokenizer
+	 * reports the line numbers the chars have in the whole array.
+	 */
+	private static final class ChunkReader extends Reader {{
+		private final char[] chars;
+		private final int end;
+		private int position;
+		private int newlines;
+
+		ChunkReader(char[] chars, int start, int end, int line) {{
+			this.chars = chars;
+			this.end = end;
+			this.position = start;
+			this.newlines = line - 1;
+		}}
+
+		// The tokenizer reads one char at a time, so this avoids Reader.read()'s allocation.
+		@Override
+		public int read() {{
+			if (newlines > 0) {{
+				--newlines;
+				return '\\n';
+			}}
+			return position < end ? chars[position++] : -1;
+		}}
+
+		@Override
+		public int read(char[] buffer, int offset, int length) {{
+			if (length == 0) return 0;
+			int count = 0;
+			while (newlines > 0 && count < length) {{
+				buffer[offset + count++] = '\\n';
+				--newlines;
+			}}
+			int copied = Math.min(length - count, end - position);
+			System.arraycopy(chars, position, buffer, offset + count, copied);
+			position += copied;
+			count += copied;
+			return count == 0 ? -1 : count;
+		}}
+
+		@Override
+		public void close() {{}}
+	}}
+
+	private static char[] ReadAllChars(InputStream input) throws IOException {{
+		Reader reader = new InputStreamReader(input);
+		char[] buffer = new char[Math.max(8192, input.available())];
+		int length = 0;
+		for (int count; (count = reader.read(buffer, length, buffer.length - length)) >= 0; ) {{
+			length += count;
+			if (length == buffer.length) buffer = Arrays.copyOf(buffer, buffer.length * 2);
+		}}
+		return Arrays.copyOf(buffer, length);
+	}}
+
+	/**
+	 * Finds the end of each top-level message in the input, skipping quoted strings and comments
+	 * the same way the tokenizer does.
+	 *
+	 * @return
+	 * The offset just past each top-level message's closing brace, followed by the line that offset is on,
+	 * or null if the braces don't balance, in which case the input should be parsed serially so that the
+	 * error is reported as usual.
+	 */
+	static int[] FindTopLevelMessageEnds(char[] chars) {{
+		int[] ends = new int[64];
+		int count = 0;
+		int depth = 0;
+		int line = 1;
+		int i = 0;
+		while (i < chars.length) {{
+			char c = chars[i++];
+			switch (c) {{
+				case '\\n':
+					++line;
+					break;
+				case '\\r':
+					++line;
+					if (i < chars.length && chars[i] == '\\n') ++i;
+					break;
+				case '"':
+				case '\\'':
+					// Quoted strings end at the matching quote or at the end of the line. An escaped newline doesn't end
+					// the string, and the tokenizer doesn't count it as a line either.
+					while (i < chars.length && chars[i] != c && chars[i] != '\\n' && chars[i] != '\\r') {{
+						i += chars[i] == '\\\\' ? 2 : 1;
+					}}
+					if (i < chars.length && chars[i] == c) ++i;
+					break;
+				case '/':
+					if (i < chars.length && chars[i] == '*') {{
+						// Block comments end at the first "*/" after the "/*", so "/*/" doesn't end one.
+						int commentStart = ++i;
+						while (i < chars.length && !(chars[i] == '/' && i > commentStart && chars[i - 1] == '*')) {{
+							if (chars[i] == '\\n' || (chars[i] == '\\r' && (i + 1 == chars.length || chars[i + 1] != '\\n'))) ++line;
+							++i;
+						}}
+						// The tokenizer treats an unterminated comment as the end of the input.
+						if (i == chars.length) return null;
+						++i;
+						break;
+					}}
+					// Otherwise, '/' starts a comment running to the end of the line, like '//' and '#'.
+				case '#':
+					while (i < chars.length && chars[i] != '\\n' && chars[i] != '\\r') ++i;
+					break;
+				case '{{':
+					++depth;
+					break;
+				case '}}':
+					if (depth == 0) return null;
+					if (--depth == 0) {{
+						if (count + 2 > ends.length) ends = Arrays.copyOf(ends, ends.length * 2);
+						ends[count++] = i;
+						ends[count++] = line;
+					}}
+					break;
+			}}
+		}}
+		return depth == 0 ? Arrays.copyOf(ends, count) : null;
+	}}
+
+	private static <B> Future<B> ParseChunk(
+			FunctionX<StreamTokenizer, B, IOException> parser, char[] chars, int start, int end, int line) {{
+		return GetParallelExecutor().submit(() -> parser.apply(GetTokenizer(new ChunkReader(chars, start, end, line))));
+	}}
+
+	/**
+	 * Parses a message whose fields are all repeated messages by splitting it between its top-level messages,
+	 * parsing the chunks concurrently, and merging the results in their original order. Each chunk is parsed
+	 * as a whole message, by the same code and with the same line numbers, so the result and any error are the
+	 * same as parsing the input serially. If several chunks have errors, the first one's is thrown.
+	 */
+	static <B> B ParseInParallel(
+			InputStream input, FunctionX<StreamTokenizer, B, IOException> parser, BiConsumer<B, B> merge) throws IOException {{
+		char[] chars = ReadAllChars(input);
+		int threadCount = Runtime.getRuntime().availableProcessors();
+		int[] ends = chars.length < MIN_PARALLEL_CHARS || threadCount < 2 ? null : FindTopLevelMessageEnds(chars);
+		int messageCount = ends == null ? 0 : ends.length / 2;
+		if (messageCount < 2) {{
+			return parser.apply(GetTokenizer(new ChunkReader(chars, 0, chars.length, 1)));
+		}}
+
+		// Cut the input after the first message ending past each equal share of it.
+		int chunkCount = Math.min(messageCount, threadCount * CHUNKS_PER_THREAD);
+		List<Future<B>> futures = new ArrayList<>(chunkCount);
+		int start = 0;
+		int startLine = 1;
+		int message = 0;
+		for (int chunk = 1; chunk < chunkCount; ++chunk) {{
+			long share = (long)chars.length * chunk / chunkCount;
+			while (message < messageCount - 1 && ends[2 * message] < share) ++message;
+			int end = ends[2 * message];
+			if (end <= start) continue;
+			futures.add(ParseChunk(parser, chars, start, end, startLine));
+			start = end;
+			startLine = ends[2 * message + 1];
+		}}
+
+		// Parse the last chunk on this thread while the others are parsed in the background.
+		B last = null;
+		Exception lastError = null;
+		try {{
+			last = parser.apply(GetTokenizer(new ChunkReader(chars, start, chars.length, startLine)));
+		}}
+		catch (IOException | RuntimeException ex) {{
+			lastError = ex;
+		}}
+
+		B result = null;
+		try {{
+			for (Future<B> future : futures) {{
+				B chunk = future.get();
+				if (result == null) {{
+					result = chunk;
+				}}
+				else {{
+					merge.accept(result, chunk);
+				}}
+			}}
+		}}
+		catch (ExecutionException ex) {{
+			CancelAll(futures);
+			Throwable cause = ex.getCause();
+			if (cause instanceof IOException) throw (IOException)cause;
+			if (cause instanceof RuntimeException) throw (RuntimeException)cause;
+			if (cause instanceof Error) throw (Error)cause;
+			throw new ParseException("Failed to parse a chunk of the input.", cause);
+		}}
+		catch (InterruptedException ex) {{
+			CancelAll(futures);
+			Thread.currentThread().interrupt();
+			throw new ParseException("Interrupted while parsing.", ex);
+		}}
+
+		if (lastError instanceof IOException) throw (IOException)lastError;
+		if (lastError != null) throw (RuntimeException)lastError;
+		if (result == null) return last;
+		merge.accept(result, last);
+		return result;
+	}}
+
+	private static void CancelAll(List<? extends Future<?>> futures) {{
+		for (Future<?> future : futures) {{
+			future.cancel(false);
+		}}
+	}}
+
 	// Since the generic Enum class's valueOf method is a little more expensive
 	// than a specific enum's valueOf method, we shunt a bit of the logic back
 	// to the sender where the actual Enum type is known.
-	private static String ConsumeEnum(StreamTokenizer tokenizer) throws IOException {{
+	static String ConsumeEnum(StreamTokenizer tokenizer) throws IOException {{
 		tokenizer.nextToken();
 		if (tokenizer.ttype == StreamTokenizer.TT_WORD) {{
 			return tokenizer.sval;
@@ -185,7 +443,7 @@ public class Parser {{
 		}}
 	}}
 	
-	private static String ConsumeFieldNameOrEndOfMessage(StreamTokenizer tokenizer,  Set<String> messageFields, boolean expectEof) throws IOException {{
+	static String ConsumeFieldNameOrEndOfMessage(StreamTokenizer tokenizer,  Set<String> messageFields, boolean expectEof) throws IOException {{
 		tokenizer.nextToken();
 		if (tokenizer.ttype == StreamTokenizer.TT_WORD) {{
 			String fieldName = tokenizer.sval;
@@ -252,9 +510,6 @@ public class Parser {{
 #
 #   simple_message_type
 #     The unqualified type of the proto message to parse, e.g. 'Character'.
-#
-#   field_handlers
-#	  The set of statements responsible for parsing each individual field.
 FUNCTION_TEMPLATE = """
 	/**
 	 * Parse a text-format {{@link {message_type} {simple_message_type}}} from an {{@link java.io.InputStream InputStream}}.
@@ -262,7 +517,7 @@ FUNCTION_TEMPLATE = """
     public static @NonNull {message_type}.Builder Parse{simple_message_type}(@NonNull InputStream input) throws ParseException {{
         Log.i(TAG, "Trying to parse a {message_type}");
         try {{
-            return Parse{simple_message_type}Impl(GetTokenizer(input), true);
+            return {simple_message_type}Parser.Parse(GetTokenizer(input), true);
         }}
         catch (ParseException ex) {{
         	throw ex;
@@ -271,163 +526,101 @@ FUNCTION_TEMPLATE = """
             throw new ParseException("The input to Parse{simple_message_type} could not be read.", ex);
         }}
     }}
-    
-    private static @NonNull {message_type}.Builder Parse{simple_message_type}Impl(final StreamTokenizer tokenizer, boolean isOutermostMessage) throws IOException {{
-        final {message_type}.Builder builder = {message_type}.newBuilder();
-        
-        Map<String, Pair<? extends FieldHandler, Boolean>> fieldHandlers = new HashMap<>();
-        Set<String> messageFields = new HashSet<>();
-        {field_handlers}
-
-		Set<String> foundFieldNames = new HashSet<>();
-
-        for (String fieldName = ConsumeFieldNameOrEndOfMessage(tokenizer, messageFields, isOutermostMessage);
-            !fieldName.isEmpty();
-            fieldName = ConsumeFieldNameOrEndOfMessage(tokenizer, messageFields, isOutermostMessage))
-        {{
-            Pair<? extends FieldHandler, Boolean> pair = fieldHandlers.get(fieldName);
-            if (pair == null) error(tokenizer.lineno(), "Parsed a bad field name: " + fieldName);
+"""
 
-            FieldHandler handler = pair.first;
-            boolean repeated = pair.second;
-            if (!foundFieldNames.add(fieldName) && !repeated) error(tokenizer.lineno(), "Parsed a duplicate field name for a non-repeated field: " + fieldName);
 
-            handler.HandleField();
+# Parameters:
+#   message_type
+#     The qualified type of the proto message to parse, e.g. 'Model.SpellList'.
+#
+#   simple_message_type
+#     The unqualified type of the proto message to parse, e.g. 'SpellList'.
+PARALLEL_FUNCTION_TEMPLATE = """
+	/**
+	 * Parse a text-format {{@link {message_type} {simple_message_type}}} from an {{@link java.io.InputStream InputStream}},
+	 * splitting large inputs between several threads. The result, and the line number of any error,
+	 * is the same as {{@link #Parse{simple_message_type} Parse{simple_message_type}}}'s.
+	 */
+    public static @NonNull {message_type}.Builder Parse{simple_message_type}Parallel(@NonNull InputStream input) throws ParseException {{
+        Log.i(TAG, "Trying to parse a {message_type} in parallel");
+        try {{
+            return ParseInParallel(
+                    input,
+                    tokenizer -> {simple_message_type}Parser.Parse(tokenizer, true),
+                    (result, chunk) -> result.mergeFrom(chunk.build()));
+        }}
+        catch (ParseException ex) {{
+        	throw ex;
+        }}
+        catch (IOException ex) {{
+            throw new ParseException("The input to Parse{simple_message_type}Parallel could not be read.", ex);
         }}
-        
-        return builder;
     }}
 """
 
-
 # Parameters:
-#   field_name
-#     The name of the field as it appears in the .asciipb files.
+#   message_type
+#     The qualified type of the proto message to parse, e.g. 'Model.Character'.
 #
-#   field_setter
-#     The name of the method that sets the field in the proto object.
-#     This could be a setter or an adder depending on whether the field is repeated.
+#   simple_message_type
+#     The unqualified type of the proto message to parse, e.g. 'Character'.
 #
-#   repeated
-#     'true' if the field is repeated, 'false' otherwise.
-#     Make sure to pass in strings - Java can't understand capitalized 'True' and 'False'.
-INT32_FIELD_TEMPLATE = """
-            fieldHandlers.put(
-                "{field_name}",
-                Pair.create(
-                    new FieldHandler() {{
-                        public void HandleField() throws IOException {{
-                            builder.{field_setter}(ConsumeInt32(tokenizer));
-                        }}
-                    }},
-                    {repeated}
-                )
-            );
-"""
-
-
-# Parameters:
-#   field_name
-#     The name of the field as it appears in the .asciipb files.
+#   message_fields
+#     An expression for the Set of names of the fields that hold nested messages.
 #
-#   field_setter
-#     The name of the method that sets the field in the proto object.
-#     This could be a setter or an adder depending on whether the field is repeated.
+#   repeated_fields
+#     An expression for the Set of names of the repeated fields.
 #
-#   repeated
-#     'true' if the field is repeated, 'false' otherwise.
-#     Make sure to pass in strings - Java can't understand capitalized 'True' and 'False'.
-INT64_FIELD_TEMPLATE = """
-            fieldHandlers.put(
-                "{field_name}",
-                Pair.create(
-                    new FieldHandler() {{
-                        public void HandleField() throws IOException {{
-                            builder.{field_setter}(ConsumeInt64(tokenizer));
-                        }}
-                    }},
-                    {repeated}
-                )
-            );
-"""
+#   field_cases
+#	  The switch cases responsible for parsing each individual field.
+MESSAGE_PARSER_FILE_TEMPLATE = """
+package ca.isupeene.charactersheet.cdk;
 
+import androidx.annotation.NonNull;
 
-# Parameters:
-#   field_name
-#     The name of the field as it appears in the .asciipb files.
-#
-#   field_setter
-#     The name of the method that sets the field in the proto object.
-#     This could be a setter or an adder depending on whether the field is repeated.
-#
-#   repeated
-#     'true' if the field is repeated, 'false' otherwise.
-#     Make sure to pass in strings - Java can't understand capitalized 'True' and 'False'.
-FLOAT_FIELD_TEMPLATE = """
-            fieldHandlers.put(
-                "{field_name}",
-                Pair.create(
-                    new FieldHandler() {{
-                        public void HandleField() throws IOException {{
-                            builder.{field_setter}(ConsumeFloat(tokenizer));
-                        }}
-                    }},
-                    {repeated}
-                )
-            );
-"""
+import java.io.IOException;
+import java.io.StreamTokenizer;
 
+import java.util.Arrays;
+import java.util.Collections;
+import java.util.HashSet;
+import java.util.Set;
 
-# Parameters:
-#   field_name
-#     The name of the field as it appears in the .asciipb files.
-#
-#   field_setter
-#     The name of the method that sets the field in the proto object.
-#     This could be a setter or an adder depending on whether the field is repeated.
-#
-#   repeated
-#     'true' if the field is repeated, 'false' otherwise.
-#     Make sure to pass in strings - Java can't understand capitalized 'True' and 'False'.
-DOUBLE_FIELD_TEMPLATE = """
-            fieldHandlers.put(
-                "{field_name}",
-                Pair.create(
-                    new FieldHandler() {{
-                        public void HandleField() throws IOException {{
-                            builder.{field_setter}(ConsumeDouble(tokenizer));
-                        }}
-                    }},
-                    {repeated}
-                )
-            );
-"""
+/**
+ * Parses a text-format {{@link {message_type} {simple_message_type}}}.
+ * Generated by the protoc-gen-text-parser plugin. Use {{@link Parser#Parse{simple_message_type} Parser.Parse{simple_message_type}}}
+ * to parse a message from an InputStream.
+ */
+final class {simple_message_type}Parser {{
+    private static final Set<String> MESSAGE_FIELDS = {message_fields};
+    private static final Set<String> REPEATED_FIELDS = {repeated_fields};
 
-# Parameters:
-#   field_name
-#     The name of the field as it appears in the .asciipb files.
-#
-#   field_setter
-#     The name of the method that sets the field in the proto object.
-#     This could be a setter or an adder depending on whether the field is repeated.
-#
-#   repeated
-#     'true' if the field is repeated, 'false' otherwise.
-#     Make sure to pass in strings - Java can't understand capitalized 'True' and 'False'.
-BOOL_FIELD_TEMPLATE = """
-            fieldHandlers.put(
-                "{field_name}",
-                Pair.create(
-                    new FieldHandler() {{
-                        public void HandleField() throws IOException {{
-                            builder.{field_setter}(ConsumeBool(tokenizer));
-                        }}
-                    }},
-                    {repeated}
-                )
-            );
+    private {simple_message_type}Parser() {{}}
+
+    static @NonNull {message_type}.Builder Parse(StreamTokenizer tokenizer, boolean isOutermostMessage) throws IOException {{
+        {message_type}.Builder builder = {message_type}.newBuilder();
+        Set<String> foundFieldNames = new HashSet<>();
+
+        for (String fieldName = Parser.ConsumeFieldNameOrEndOfMessage(tokenizer, MESSAGE_FIELDS, isOutermostMessage);
+            !fieldName.isEmpty();
+            fieldName = Parser.ConsumeFieldNameOrEndOfMessage(tokenizer, MESSAGE_FIELDS, isOutermostMessage))
+        {{
+            if (!foundFieldNames.add(fieldName) && !REPEATED_FIELDS.contains(fieldName)) {{
+                Parser.error(tokenizer.lineno(), "Parsed a duplicate field name for a non-repeated field: " + fieldName);
+            }}
+
+            switch (fieldName) {{{field_cases}
+                default:
+                    Parser.error(tokenizer.lineno(), "Parsed a bad field name: " + fieldName);
+            }}
+        }}
+
+        return builder;
+    }}
+}}
 """
 
+
 # Parameters:
 #   field_name
 #     The name of the field as it appears in the .asciipb files.
@@ -436,22 +629,12 @@ BOOL_FIELD_TEMPLATE = """
 #     The name of the method that sets the field in the proto object.
 #     This could be a setter or an adder depending on whether the field is repeated.
 #
-#   repeated
-#     'true' if the field is repeated, 'false' otherwise.
-#     Make sure to pass in strings - Java can't understand capitalized 'True' and 'False'.
-STRING_FIELD_TEMPLATE = """
-            fieldHandlers.put(
-                "{field_name}",
-                Pair.create(
-                    new FieldHandler() {{
-                        public void HandleField() throws IOException {{
-                            builder.{field_setter}(ConsumeString(tokenizer));
-                        }}
-                    }},
-                    {repeated}
-                )
-            );
-"""
+#   consume_function
+#     The Parser function that consumes a value of the field's type, e.g. 'ConsumeInt32'.
+SCALAR_FIELD_TEMPLATE = """
+                case "{field_name}":
+                    builder.{field_setter}(Parser.{consume_function}(tokenizer));
+                    break;"""
 
 
 # Parameters:
@@ -464,37 +647,25 @@ STRING_FIELD_TEMPLATE = """
 #
 #   field_type
 #	  The qualified type of the field, as in 'Model.Character' or 'Model.Item.Type'
-#
-#   repeated
-#     'true' if the field is repeated, 'false' otherwise.
-#     Make sure to pass in strings - Java can't understand capitalized 'True' and 'False'.
 ENUM_FIELD_TEMPLATE = """
-            fieldHandlers.put(
-                "{field_name}",
-                Pair.create(
-                    new FieldHandler() {{
-                        public void HandleField() throws IOException {{
-                            // Some of the logic that should properly be contained in ConsumeEnum is moved here
-                            // so that we can use the faster valueOf function associated with a specific enum type.
-                            String enumString = ConsumeEnum(tokenizer);
-                            if (!enumString.isEmpty()) {{
-                                try {{
-                                    builder.{field_setter}({field_type}.valueOf(enumString));
-                                    info(tokenizer.lineno(), "Parsed a {field_type}.");
-                                }}
-                                catch (IllegalArgumentException ex) {{
-                                    error(tokenizer.lineno(), "Failed to parse a {field_type}.");
-                                }}
-                            }}
-                            else {{
-                                error(tokenizer.lineno(), "Failed to parse a {field_type}.");
-                            }}
+                case "{field_name}": {{
+                    // Some of the logic that should properly be contained in ConsumeEnum is moved here
+                    // so that we can use the faster valueOf function associated with a specific enum type.
+                    String enumString = Parser.ConsumeEnum(tokenizer);
+                    if (!enumString.isEmpty()) {{
+                        try {{
+                            builder.{field_setter}({field_type}.valueOf(enumString));
+                            Parser.info(tokenizer.lineno(), "Parsed a {field_type}.");
                         }}
-                    }},
-                    {repeated}
-                )
-            );
-"""
+                        catch (IllegalArgumentException ex) {{
+                            Parser.error(tokenizer.lineno(), "Failed to parse a {field_type}.");
+                        }}
+                    }}
+                    else {{
+                        Parser.error(tokenizer.lineno(), "Failed to parse a {field_type}.");
+                    }}
+                    break;
+                }}"""
 
 
 # Parameters:
@@ -507,108 +678,148 @@ ENUM_FIELD_TEMPLATE = """
 #
 #   field_type
 #	  The simplified name of the field's type, as in 'Character' or 'Item_Type'
-#
-#   repeated
-#     'true' if the field is repeated, 'false' otherwise.
-#     Make sure to pass in strings - Java can't understand capitalized 'True' and 'False'.
 MESSAGE_FIELD_TEMPLATE = """
-            fieldHandlers.put(
-                "{field_name}",
-                Pair.create(
-                    new FieldHandler() {{
-                        public void HandleField() throws IOException {{
-                            builder.{field_setter}(Parse{field_type}Impl(tokenizer, false));
-                        }}
-                    }},
-                    {repeated}
-                )
-            );
-            messageFields.add("{field_name}");
-"""
+                case "{field_name}":
+                    builder.{field_setter}({field_type}Parser.Parse(tokenizer, false));
+                    break;"""
 
 
-def generate_field_handler(field):
+CONSUME_FUNCTIONS = {
+	descriptor.FieldDescriptorProto.TYPE_INT32: "ConsumeInt32",
+	descriptor.FieldDescriptorProto.TYPE_UINT32: "ConsumeInt32",
+	descriptor.FieldDescriptorProto.TYPE_INT64: "ConsumeInt64",
+	descriptor.FieldDescriptorProto.TYPE_UINT64: "ConsumeInt64",
+	descriptor.FieldDescriptorProto.TYPE_FLOAT: "ConsumeFloat",
+	descriptor.FieldDescriptorProto.TYPE_DOUBLE: "ConsumeDouble",
+	descriptor.FieldDescriptorProto.TYPE_BOOL: "ConsumeBool",
+	descriptor.FieldDescriptorProto.TYPE_STRING: "ConsumeString",
+	descriptor.FieldDescriptorProto.TYPE_BYTES: "ConsumeBytes",
+}
+
+
+def generate_field_case(field):
 	snake_case_name = field.name
 	# Convert proto field names to java names. Note that the generated java code treats the word 'class' as a special case.
 	CamelCaseName = string.capwords(snake_case_name, "_").replace("_", "") if field.name != "class" else "Class_"
 	simplified_type_name = field.type_name.replace(".ca.isupeene.charactersheet.cdk.", "")
 
 	repeated = field.label == descriptor.FieldDescriptorProto.LABEL_REPEATED
-	repeatedString = "true" if repeated else "false"
 	field_setter_string = "add{}".format(CamelCaseName) if repeated else "set{}".format(CamelCaseName)
-	
-	if field.type in {descriptor.FieldDescriptorProto.TYPE_INT32, descriptor.FieldDescriptorProto.TYPE_UINT32}:
-		return INT32_FIELD_TEMPLATE.format(field_name=snake_case_name, field_setter=field_setter_string, repeated=repeatedString)
-	elif field.type in {descriptor.FieldDescriptorProto.TYPE_INT64, descriptor.FieldDescriptorProto.TYPE_UINT64}:
-		return INT64_FIELD_TEMPLATE.format(field_name=snake_case_name, field_setter=field_setter_string, repeated=repeatedString)
-	elif field.type == descriptor.FieldDescriptorProto.TYPE_FLOAT:
-		return FLOAT_FIELD_TEMPLATE.format(field_name=snake_case_name, field_setter=field_setter_string, repeated=repeatedString)
-	elif field.type == descriptor.FieldDescriptorProto.TYPE_DOUBLE:
-		return DOUBLE_FIELD_TEMPLATE.format(field_name=snake_case_name, field_setter=field_setter_string, repeated=repeatedString)
-	elif field.type == descriptor.FieldDescriptorProto.TYPE_BOOL:
-		return BOOL_FIELD_TEMPLATE.format(field_name=snake_case_name, field_setter=field_setter_string, repeated=repeatedString)
-	elif field.type == descriptor.FieldDescriptorProto.TYPE_STRING:
-		return STRING_FIELD_TEMPLATE.format(field_name=snake_case_name, field_setter=field_setter_string, repeated=repeatedString)
+
+	if field.type in CONSUME_FUNCTIONS:
+		return SCALAR_FIELD_TEMPLATE.format(
+			field_name=snake_case_name,
+			field_setter=field_setter_string,
+			consume_function=CONSUME_FUNCTIONS[field.type]
+		)
 	elif field.type == descriptor.FieldDescriptorProto.TYPE_ENUM:
 		return ENUM_FIELD_TEMPLATE.format(
 			field_name=snake_case_name,
 			field_setter=field_setter_string,
-			field_type="Model.{}".format(simplified_type_name),
-			repeated=repeatedString
+			field_type="Model.{}".format(simplified_type_name)
 		)
 	elif field.type == descriptor.FieldDescriptorProto.TYPE_MESSAGE:
 		return MESSAGE_FIELD_TEMPLATE.format(
 			field_name=snake_case_name,
 			field_setter=field_setter_string,
-			field_type="_".join([s[0] + s[1:] for s in simplified_type_name.split(".")]),
-            repeated=repeatedString
+			field_type="_".join(simplified_type_name.split("."))
 		)
 	else:
 		raise Exception("Unhandled field type: " + str(field.type))
 
 
-def generate_outer_message_parser_function(message_type, parent_name):
+def field_name_set(field_names):
+	if not field_names:
+		return "Collections.emptySet()"
+	return "new HashSet<>(Arrays.asList({}))".format(", ".join('"{}"'.format(name) for name in field_names))
+
+
+# Top-level lists like SpellList can be split between their elements and parsed in parallel.
+# Any singular field would have to be checked for duplicates across the pieces, so only lists
+# whose fields are all repeated messages qualify.
+def is_parallelizable(message_type, parent_name):
+	return "." not in parent_name and message_type.name.endswith("List") and message_type.field and all(
+		field.label == descriptor.FieldDescriptorProto.LABEL_REPEATED and field.type == descriptor.FieldDescriptorProto.TYPE_MESSAGE
+		for field in message_type.field)
+
+
+# Returns a (message type, parser function, (java file name, message parser class)) tuple for the given message type.
+def generate_outer_message_parser(message_type, parent_name, java_package_path):
 	message_type_string = "{}.{}".format(parent_name, message_type.name)
 	simple_message_type_string = '_'.join(parent_name.split('.')[1:] + [message_type.name])
-	
-	field_handlers = []
-	
-	for field in message_type.field:
-		field_handlers.append(generate_field_handler(field))
-	
-	return FUNCTION_TEMPLATE.format(
+
+	writer = codegen.SourceWriter()
+	writer.write_template(
+		MESSAGE_PARSER_FILE_TEMPLATE,
 		message_type=message_type_string,
 		simple_message_type=simple_message_type_string,
-		field_handlers="\n".join(field_handlers)
+		message_fields=field_name_set([f.name for f in message_type.field if f.type == descriptor.FieldDescriptorProto.TYPE_MESSAGE]),
+		repeated_fields=field_name_set([f.name for f in message_type.field if f.label == descriptor.FieldDescriptorProto.LABEL_REPEATED]),
+		field_cases="".join(generate_field_case(field) for field in message_type.field)
 	)
-	
+	parser_function = FUNCTION_TEMPLATE.format(
+		message_type=message_type_string,
+		simple_message_type=simple_message_type_string
+	)
+	if is_parallelizable(message_type, parent_name):
+		parser_function += PARALLEL_FUNCTION_TEMPLATE.format(
+			message_type=message_type_string,
+			simple_message_type=simple_message_type_string
+		)
+	return message_type_string, parser_function, ("/".join([java_package_path, simple_message_type_string + "Parser.java"]), writer.getvalue())
+
 
-# Returns a list of strings - parser functions for the given message type and
-# each of its nested message types.
-def generate_parser_functions(message_type, parent_name):
+# Returns a list of (message type, parser function, (java file name, message parser class)) tuples for
+# the given message type and each of its nested message types.
+def generate_parsers(message_type, parent_name, java_package_path):
 	new_parent_name = "{}.{}".format(parent_name, message_type.name) if parent_name else message_type.name
 	return (
-		[generate_outer_message_parser_function(message_type, parent_name)] +
-		[function
+		[generate_outer_message_parser(message_type, parent_name, java_package_path)] +
+		[parser
 		 for nested_type
 		 in message_type.nested_type
-		 for function
-		 in generate_parser_functions(nested_type, new_parent_name)]
+		 for parser
+		 in generate_parsers(nested_type, new_parent_name, java_package_path)]
 	)
 
 
-def generate_code(request, response):
-	parser_functions = []
+def generate_message_code(request_file, top_level_message_type):
+	class_name = string.capwords(request_file.name.split("/")[-1].split(".")[0], '_')
+	return generate_parsers(top_level_message_type, class_name, "/".join(request_file.package.split(".")))
 
-	for request_file in request.proto_file:
-		java_file_path = "/".join(request_file.package.split(".") + ["Parser.java"])
-		class_name = string.capwords(request_file.name.split("/")[-1].split(".")[0], '_')
-		for message_type in request_file.message_type:
-			parser_functions += generate_parser_functions(message_type, class_name)
 
+def generate_code(request, response):
+	parameters = codegen.parse_parameters(request.parameter)
+	footprint = codegen.FootprintReport("text-parser", parameters)
+	parsers = [parser
+			   for message_parsers
+			   in codegen.generate_messages(request, generate_message_code, int(parameters.get("jobs", 0)))
+			   for parser
+			   in message_parsers]
+
+	# Stream Parser.java out piece by piece rather than formatting one large string.
+	java_package_path = codegen.java_package_path(request)
+	file_head, file_tail = FILE_TEMPLATE.split("{parser_functions}")
+	writer = codegen.SourceWriter()
+	writer.write_template(file_head)
+	for i, (_, parser_function, _) in enumerate(parsers):
+		if i:
+			writer.write("\n")
+		writer.write(parser_function)
+	writer.write_template(file_tail)
+
+	response_file = response.file.add()
+	response_file.name = "/".join([java_package_path, "Parser.java"])
+	response_file.content = writer.getvalue()
+
+	for message_type, parser_function, (file_name, content) in parsers:
 		response_file = response.file.add()
-		response_file.name = java_file_path
-		response_file.content = FILE_TEMPLATE.format(parser_functions="\n\n".join(parser_functions))
+		response_file.name = file_name
+		response_file.content = content
+		# Report message types by their proto name, e.g. 'Resource.Quantity' rather than 'Model.Resource.Quantity'.
+		footprint.add(message_type.split(".", 1)[1], parser_function)
+		footprint.add(message_type.split(".", 1)[1], content)
+	footprint.finish(response, java_package_path)
 
 
 if __name__ == '__main__':
@@ -623,4 +834,4 @@ if __name__ == '__main__':
 	generate_code(request, response)
 
 	# Serialize and write to stdout
-	sys.stdout.buffer.write(response.SerializeToString())
\ No newline at end of file
+	sys.stdout.buffer.write(response.SerializeToString())
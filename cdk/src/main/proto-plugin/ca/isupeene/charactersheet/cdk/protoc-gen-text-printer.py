@@ -0,0 +1,420 @@
+import string
+import sys
+
+from google.protobuf import descriptor_pb2 as descriptor
+from google.protobuf.compiler import plugin_pb2 as plugin
+
+import codegen
+
+# Parameters:
+#   jobs=N         Generate with N worker processes, as in protoc-gen-text-parser.
+# along with the footprint parameters described in codegen.FootprintReport.
+
+# Parameters:
+#   printer_functions
+#     The set of public Print<MessageType> functions, each of which delegates to the
+#     generated <MessageType>Printer class that actually does the printing.
+FILE_TEMPLATE = """
+package ca.isupeene.charactersheet.cdk;
+
+import androidx.annotation.NonNull;
+
+import com.google.protobuf.ByteString;
+
+import java.io.IOException;
+import java.io.Writer;
+import java.math.BigDecimal;
+
+/**
+ * A text proto printer generated by the protoc-gen-text-printer plugin.
+ * Print<i>MessageType</i> functions are generated for each message type in the input. These
+ * functions write a message to a Writer in the text format read by the {{@link Parser}}, one field
+ * at a time, so that printing a large message never holds more than one field's text in memory.
+ * The output is written in many small pieces, so pass a {{@link java.io.BufferedWriter BufferedWriter}},
+ * and flush it when you're done; the Printer doesn't.
+ *
+ * Fields are printed in declaration order, and fields holding their default value are left out.
+ * Numbers are printed without exponents, and strings are escaped, so that the Parser can read
+ * the output back. The Parser reads numbers as doubles, though, so 64-bit integers only round-trip
+ * if they are smaller than 2^53. NaN, infinite and unrecognized enum values can't be printed at all,
+ * and throw an IllegalArgumentException.
+ *
+ * The printing code for each message type lives in its own package-private class, so that
+ * printing one type of message only loads the code for the message types it contains.
+ */
+public abstract class Printer {{
+    private static final String INDENT = "  ";
+
+    static void Indent(Writer output, int depth) throws IOException {{
+        for (int i = 0; i < depth; ++i) {{
+            output.write(INDENT);
+        }}
+    }}
+
+    static void StartField(Writer output, int depth, String fieldName) throws IOException {{
+        Indent(output, depth);
+        output.write(fieldName);
+        output.write(": ");
+    }}
+
+    static void StartMessage(Writer output, int depth, String fieldName) throws IOException {{
+        Indent(output, depth);
+        output.write(fieldName);
+        output.write(" {{\\n");
+    }}
+
+    static void EndMessage(Writer output, int depth) throws IOException {{
+        Indent(output, depth);
+        output.write("}}\\n");
+    }}
+
+    // The Parser reads 32-bit unsigned integers as signed ones, so they're printed as signed too.
+    static void PrintInt32(Writer output, int depth, String fieldName, int value) throws IOException {{
+        StartField(output, depth, fieldName);
+        output.write(Integer.toString(value));
+        output.write('\\n');
+    }}
+
+    static void PrintInt64(Writer output, int depth, String fieldName, long value) throws IOException {{
+        StartField(output, depth, fieldName);
+        output.write(Long.toString(value));
+        output.write('\\n');
+    }}
+
+    static void PrintFloat(Writer output, int depth, String fieldName, float value) throws IOException {{
+        if (Float.isNaN(value) || Float.isInfinite(value)) {{
+            throw new IllegalArgumentException("The text format can't represent " + fieldName + ": " + value);
+        }}
+        StartField(output, depth, fieldName);
+        // The shortest representation that reads back as the same float, without an exponent.
+        output.write(PlainNumber(Float.toString(value)));
+        output.write('\\n');
+    }}
+
+    static void PrintDouble(Writer output, int depth, String fieldName, double value) throws IOException {{
+        if (Double.isNaN(value) || Double.isInfinite(value)) {{
+            throw new IllegalArgumentException("The text format can't represent " + fieldName + ": " + value);
+        }}
+        StartField(output, depth, fieldName);
+        output.write(PlainNumber(Double.toString(value)));
+        output.write('\\n');
+    }}
+
+    // The tokenizer the Parser uses can't read exponents, so 1.0E-5 has to be written as 0.000010.
+    private static String PlainNumber(String number) {{
+        return number.indexOf('E') < 0 ? number : new BigDecimal(number).toPlainString();
+    }}
+
+    static void PrintBool(Writer output, int depth, String fieldName, boolean value) throws IOException {{
+        StartField(output, depth, fieldName);
+        output.write(value ? "true\\n" : "false\\n");
+    }}
+
+    static void PrintString(Writer output, int depth, String fieldName, String value) throws IOException {{
+        StartField(output, depth, fieldName);
+        output.write('"');
+        // Write runs of characters that don't need escaping in one call.
+        int runStart = 0;
+        for (int i = 0; i < value.length(); ++i) {{
+            char c = value.charAt(i);
+            if (c >= 0x20 && c != 0x7f && c != '"' && c != '\\\\') continue;
+            output.write(value, runStart, i - runStart);
+            WriteEscaped(output, c);
+            runStart = i + 1;
+        }}
+        output.write(value, runStart, value.length() - runStart);
+        output.write("\\"\\n");
+    }}
+
+    // The Parser reads bytes as a string of chars from 0 to 255, so anything that isn't printable ASCII is escaped.
+    static void PrintBytes(Writer output, int depth, String fieldName, ByteString value) throws IOException {{
+        StartField(output, depth, fieldName);
+        output.write('"');
+        for (int i = 0; i < value.size(); ++i) {{
+            int b = value.byteAt(i) & 0xff;
+            if (b >= 0x20 && b < 0x7f && b != '"' && b != '\\\\') {{
+                output.write(b);
+            }}
+            else {{
+                WriteEscaped(output, (char)b);
+            }}
+        }}
+        output.write("\\"\\n");
+    }}
+
+    private static void WriteEscaped(Writer output, char c) throws IOException {{
+        switch (c) {{
+            case '"':
+                output.write("\\\\\\"");
+                break;
+            case '\\\\':
+                output.write("\\\\\\\\");
+                break;
+            case '\\n':
+                output.write("\\\\n");
+                break;
+            case '\\r':
+                output.write("\\\\r");
+                break;
+            case '\\t':
+                output.write("\\\\t");
+                break;
+            default:
+                // Always three octal digits, so that a digit following the escape isn't read as part of it.
+                output.write('\\\\');
+                output.write('0' + ((c >> 6) & 3));
+                output.write('0' + ((c >> 3) & 7));
+                output.write('0' + (c & 7));
+        }}
+    }}
+
+    static void PrintEnum(Writer output, int depth, String fieldName, Enum<?> value) throws IOException {{
+        if (value.name().equals("UNRECOGNIZED")) {{
+            throw new IllegalArgumentException("The text format can't represent unrecognized enum values in " + fieldName);
+        }}
+        StartField(output, depth, fieldName);
+        output.write(value.name());
+        output.write('\\n');
+    }}
+    {printer_functions}
+}}
+"""
+
+# Parameters:
+#   message_type
+#     The qualified type of the proto message to print, e.g. 'Model.Character'.
+#
+#   simple_message_type
+#     The unqualified type of the proto message to print, e.g. 'Character'.
+FUNCTION_TEMPLATE = """
+    /**
+     * Print a text-format {{@link {message_type} {simple_message_type}}} to a {{@link java.io.Writer Writer}}.
+     */
+    public static void Print{simple_message_type}(@NonNull {message_type} message, @NonNull Writer output) throws IOException {{
+        {simple_message_type}Printer.Print(message, output, 0);
+    }}
+"""
+
+# Parameters:
+#   message_type
+#     The qualified type of the proto message to print, e.g. 'Model.Character'.
+#
+#   simple_message_type
+#     The unqualified type of the proto message to print, e.g. 'Character'.
+#
+#   field_printers
+#     The statements that print each individual field.
+MESSAGE_PRINTER_FILE_TEMPLATE = """
+package ca.isupeene.charactersheet.cdk;
+
+import androidx.annotation.NonNull;
+
+import java.io.IOException;
+import java.io.Writer;
+
+/**
+ * Prints a text-format {{@link {message_type} {simple_message_type}}}.
+ * Generated by the protoc-gen-text-printer plugin. Use {{@link Printer#Print{simple_message_type} Printer.Print{simple_message_type}}}
+ * to print a message to a Writer.
+ */
+final class {simple_message_type}Printer {{
+    private {simple_message_type}Printer() {{}}
+
+    static void Print(@NonNull {message_type} message, Writer output, int depth) throws IOException {{{field_printers}
+    }}
+}}
+"""
+
+# Parameters:
+#   condition
+#     An expression that's true if the field should be printed.
+#
+#   value_type
+#     The java type of the field.
+#
+#   value
+#     An expression for the field's value.
+#
+#   print_statements
+#     The statements that print the field's value, 'value'.
+SINGULAR_FIELD_TEMPLATE = """
+        if ({condition}) {{
+            {value_type} value = {value};{print_statements}
+        }}"""
+
+# Parameters:
+#   value_type
+#     The java type of the field's elements.
+#
+#   list_getter
+#     The name of the method that returns the list of the field's elements.
+#
+#   print_statements
+#     The statements that print an element, 'value'.
+REPEATED_FIELD_TEMPLATE = """
+        for ({value_type} value : message.{list_getter}()) {{{print_statements}
+        }}"""
+
+# Parameters:
+#   print_function
+#     The Printer function that prints a value of the field's type, e.g. 'PrintInt32'.
+#
+#   field_name
+#     The name of the field as it appears in the .asciipb files.
+SCALAR_PRINT_TEMPLATE = """
+            Printer.{print_function}(output, depth, "{field_name}", value);"""
+
+# Parameters:
+#   field_name
+#     The name of the field as it appears in the .asciipb files.
+#
+#   field_type
+#     The simplified name of the field's type, as in 'Character' or 'Item_Type'
+MESSAGE_PRINT_TEMPLATE = """
+            Printer.StartMessage(output, depth, "{field_name}");
+            {field_type}Printer.Print(value, output, depth + 1);
+            Printer.EndMessage(output, depth);"""
+
+# The java type, the Printer function, and the default value check (formatted with the value) for each scalar type.
+# These are the types protoc-gen-text-parser can read.
+SCALAR_TYPES = {
+    descriptor.FieldDescriptorProto.TYPE_INT32: ("int", "PrintInt32", "{} != 0"),
+    descriptor.FieldDescriptorProto.TYPE_UINT32: ("int", "PrintInt32", "{} != 0"),
+    descriptor.FieldDescriptorProto.TYPE_INT64: ("long", "PrintInt64", "{} != 0L"),
+    descriptor.FieldDescriptorProto.TYPE_UINT64: ("long", "PrintInt64", "{} != 0L"),
+    # Compare the bits, so that -0.0 is printed, as it would be serialized.
+    descriptor.FieldDescriptorProto.TYPE_FLOAT: ("float", "PrintFloat", "Float.floatToRawIntBits({}) != 0"),
+    descriptor.FieldDescriptorProto.TYPE_DOUBLE: ("double", "PrintDouble", "Double.doubleToRawLongBits({}) != 0L"),
+    descriptor.FieldDescriptorProto.TYPE_BOOL: ("boolean", "PrintBool", "{}"),
+    descriptor.FieldDescriptorProto.TYPE_STRING: ("String", "PrintString", "!{}.isEmpty()"),
+    descriptor.FieldDescriptorProto.TYPE_BYTES: ("com.google.protobuf.ByteString", "PrintBytes", "!{}.isEmpty()"),
+}
+
+
+def camel_case(name):
+    # The generated java code treats the word 'class' as a special case.
+    return string.capwords(name, "_").replace("_", "") if name != "class" else "Class_"
+
+
+def generate_field_printer(field, message_type, message_name):
+    CamelCaseName = camel_case(field.name)
+    simplified_type_name = field.type_name.replace(".ca.isupeene.charactersheet.cdk.", "")
+    repeated = field.label == descriptor.FieldDescriptorProto.LABEL_REPEATED
+
+    if field.type in SCALAR_TYPES:
+        value_type, print_function, default_check = SCALAR_TYPES[field.type]
+        print_statements = SCALAR_PRINT_TEMPLATE.format(print_function=print_function, field_name=field.name)
+        value_check = default_check.format("message.get{}()".format(CamelCaseName))
+    elif field.type == descriptor.FieldDescriptorProto.TYPE_ENUM:
+        value_type = "Model.{}".format(simplified_type_name)
+        print_statements = SCALAR_PRINT_TEMPLATE.format(print_function="PrintEnum", field_name=field.name)
+        value_check = "message.get{}Value() != 0".format(CamelCaseName)
+    elif field.type == descriptor.FieldDescriptorProto.TYPE_MESSAGE:
+        value_type = "Model.{}".format(simplified_type_name)
+        print_statements = MESSAGE_PRINT_TEMPLATE.format(field_name=field.name, field_type="_".join(simplified_type_name.split(".")))
+        value_check = "message.has{}()".format(CamelCaseName)
+    else:
+        raise Exception("Unhandled field type: " + str(field.type))
+
+    if repeated:
+        return REPEATED_FIELD_TEMPLATE.format(
+            value_type=value_type,
+            list_getter="get{}List".format(CamelCaseName),
+            print_statements=print_statements)
+
+    # Members of a oneof are printed whenever they're set, even to their default value.
+    if field.HasField("oneof_index"):
+        oneof_name = camel_case(message_type.oneof_decl[field.oneof_index].name)
+        value_check = "message.get{oneof_name}Case() == Model.{message_name}.{oneof_name}Case.{case_name}".format(
+            oneof_name=oneof_name,
+            message_name=message_name,
+            case_name=field.name.upper())
+    return SINGULAR_FIELD_TEMPLATE.format(
+        condition=value_check,
+        value_type=value_type,
+        value="message.get{}()".format(CamelCaseName),
+        print_statements=print_statements)
+
+
+# Returns a (message type, printer function, (java file name, message printer class)) tuple for the given message type.
+def generate_outer_message_printer(message_type, parent_name, java_package_path):
+    message_type_string = "{}.{}".format(parent_name, message_type.name)
+    simple_message_type_string = '_'.join(parent_name.split('.')[1:] + [message_type.name])
+    message_name = message_type_string.split(".", 1)[1]
+
+    writer = codegen.SourceWriter()
+    writer.write_template(
+        MESSAGE_PRINTER_FILE_TEMPLATE,
+        message_type=message_type_string,
+        simple_message_type=simple_message_type_string,
+        field_printers="".join(generate_field_printer(field, message_type, message_name) for field in message_type.field)
+    )
+    printer_function = FUNCTION_TEMPLATE.format(
+        message_type=message_type_string,
+        simple_message_type=simple_message_type_string
+    )
+    return message_type_string, printer_function, ("/".join([java_package_path, simple_message_type_string + "Printer.java"]), writer.getvalue())
+
+
+# Returns a list of (message type, printer function, (java file name, message printer class)) tuples for
+# the given message type and each of its nested message types.
+def generate_printers(message_type, parent_name, java_package_path):
+    new_parent_name = "{}.{}".format(parent_name, message_type.name) if parent_name else message_type.name
+    return (
+        [generate_outer_message_printer(message_type, parent_name, java_package_path)] +
+        [printer
+         for nested_type
+         in message_type.nested_type
+         for printer
+         in generate_printers(nested_type, new_parent_name, java_package_path)]
+    )
+
+
+def generate_message_code(request_file, top_level_message_type):
+    class_name = string.capwords(request_file.name.split("/")[-1].split(".")[0], '_')
+    return generate_printers(top_level_message_type, class_name, "/".join(request_file.package.split(".")))
+
+
+def generate_code(request, response):
+    parameters = codegen.parse_parameters(request.parameter)
+    footprint = codegen.FootprintReport("text-printer", parameters)
+    printers = [printer
+                for message_printers
+                in codegen.generate_messages(request, generate_message_code, int(parameters.get("jobs", 0)))
+                for printer
+                in message_printers]
+
+    java_package_path = codegen.java_package_path(request)
+    file_head, file_tail = FILE_TEMPLATE.split("{printer_functions}")
+    writer = codegen.SourceWriter()
+    writer.write_template(file_head)
+    for i, (_, printer_function, _) in enumerate(printers):
+        if i:
+            writer.write("\n")
+        writer.write(printer_function)
+    writer.write_template(file_tail)
+
+    response_file = response.file.add()
+    response_file.name = "/".join([java_package_path, "Printer.java"])
+    response_file.content = writer.getvalue()
+
+    for message_type, printer_function, (file_name, content) in printers:
+        response_file = response.file.add()
+        response_file.name = file_name
+        response_file.content = content
+        footprint.add(message_type.split(".", 1)[1], printer_function)
+        footprint.add(message_type.split(".", 1)[1], content)
+    footprint.finish(response, java_package_path)
+
+
+if __name__ == '__main__':
+    # Parse request from stdin
+    request = plugin.CodeGeneratorRequest()
+    request.ParseFromString(sys.stdin.buffer.read())
+
+    # Create response and generate code
+    response = plugin.CodeGeneratorResponse()
+    generate_code(request, response)
+
+    # Serialize and write to stdout
+    sys.stdout.buffer.write(response.SerializeToString())
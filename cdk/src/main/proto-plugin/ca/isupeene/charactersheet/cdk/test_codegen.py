@@ -0,0 +1,95 @@
+"""
+Checks that the plugins generate the same code for model.proto whether or not they use worker processes.
+
+Run from this directory, with protoc on the path or named by the PROTOC environment variable:
+    python -m unittest test_codegen
+"""
+import importlib.util
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+from google.protobuf import descriptor_pb2 as descriptor
+from google.protobuf.compiler import plugin_pb2 as plugin
+
+import codegen
+
+PLUGIN_DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+PROTO_DIRECTORY = os.path.join(PLUGIN_DIRECTORY, *[os.pardir] * 5, "proto")
+MODEL_PROTO = "ca/isupeene/charactersheet/cdk/model.proto"
+PARALLEL_PLUGINS = [
+    "protoc-gen-text-parser",
+    "protoc-gen-text-printer",
+    "protoc-gen-mutable",
+    "protoc-gen-add-proto-or-builder",
+]
+
+
+def load_plugin(name):
+    # Registered under an importable name, so that worker processes can find its generate functions.
+    module_name = name.replace("-", "_")
+    if module_name not in sys.modules:
+        spec = importlib.util.spec_from_file_location(module_name, os.path.join(PLUGIN_DIRECTORY, name + ".py"))
+        sys.modules[module_name] = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(sys.modules[module_name])
+    return sys.modules[module_name]
+
+
+def message_name(request_file, message_type):
+    return message_type.name
+
+
+def generate(plugin_module, request):
+    # Some plugins build their own response, and some fill in one they're given.
+    if plugin_module.generate_code.__code__.co_argcount == 1:
+        return plugin_module.generate_code(request)
+    response = plugin.CodeGeneratorResponse()
+    plugin_module.generate_code(request, response)
+    return response
+
+
+class GenerateMessagesTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        protoc = os.environ.get("PROTOC") or shutil.which("protoc")
+        if not protoc:
+            raise unittest.SkipTest("protoc not found")
+        with tempfile.TemporaryDirectory() as directory:
+            descriptor_set = os.path.join(directory, "model.desc")
+            subprocess.run([protoc, "-I" + PROTO_DIRECTORY, "--include_imports", "--include_source_info",
+                            "--descriptor_set_out=" + descriptor_set, MODEL_PROTO], check=True)
+            with open(descriptor_set, "rb") as file:
+                files = descriptor.FileDescriptorSet.FromString(file.read()).file
+        cls.request = plugin.CodeGeneratorRequest(file_to_generate=[MODEL_PROTO], proto_file=files)
+
+    def test_jobs_spread_model_across_workers(self):
+        # model.proto is below the automatic cutoff, so only an explicit number of jobs uses worker processes.
+        for jobs, expected_pools in [(None, 0), (1, 0), (4, 1)]:
+            with self.subTest(jobs=jobs):
+                with mock.patch.object(codegen.concurrent.futures, "ProcessPoolExecutor",
+                                       wraps=codegen.concurrent.futures.ProcessPoolExecutor) as pool:
+                    names = codegen.generate_messages(self.request, message_name, jobs)
+                self.assertEqual(pool.call_count, expected_pools)
+                self.assertEqual(names, [message_type.name
+                                         for request_file in self.request.proto_file
+                                         for message_type in request_file.message_type])
+
+    def test_output_is_identical_for_any_number_of_jobs(self):
+        for name in PARALLEL_PLUGINS:
+            with self.subTest(plugin=name):
+                plugin_module = load_plugin(name)
+                outputs = []
+                for jobs in [1, 4]:
+                    request = plugin.CodeGeneratorRequest()
+                    request.CopyFrom(self.request)
+                    request.parameter = "jobs={}".format(jobs)
+                    outputs.append(generate(plugin_module, request).SerializeToString(deterministic=True))
+                self.assertEqual(outputs[0], outputs[1])
+
+
+if __name__ == '__main__':
+    unittest.main()